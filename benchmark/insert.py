@@ -0,0 +1,142 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file insert.py
+@brief 缓存写入基准测试
+@details 在临时的SQLite数据库（或 --url 指定的数据库）中比较三种写入缓存数据的方式：
+         逐条add并提交（原来详情页处理函数的方式）、add_all后一次提交（原来列表页和数据包导入的方式）、
+         insert_caches批量写入，输出每秒写入的行数
+
+用法：python -m benchmark.insert [--rows N] [--chunk-size N ...] [--url URL]
+"""
+
+from typing import Callable
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from datetime import date
+from time import perf_counter
+import sys
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+
+from database.model import Base, Cache, configure_engine
+from database.data import CacheData, Season, insert_caches
+
+
+def make_caches(rows: int) -> list[CacheData]:
+    """
+    @brief 生成测试用的缓存数据，字段长度与真实的季度页面相近
+    @param rows 行数
+    @return 缓存数据列表
+    """
+    return [
+        CacheData(
+            name=f'Anime Title {i}',
+            translation=f'动画译名 {i}',
+            all_data=[f'Anime Title {i}', f'动画译名 {i}', f'アニメ {i}'],
+            year=2025,
+            season=Season.AUTUMN,
+            time=date(2025, 10, 1),
+            tag=['Action', 'Fantasy', 'Adventure'],
+            description='description ' * 40,
+            score=8.5,
+            vote=12345,
+            date=date(2025, 10, 19),
+            web=4,
+            webId=i,
+            picture=f'https://cdn.myanimelist.net/images/anime/{i}.jpg'
+        )
+        for i in range(rows)
+    ]
+
+
+def add_each(session: Session, caches: list[CacheData]):
+    """
+    @brief 逐条创建ORM对象并提交
+    """
+    for cache in caches:
+        session.add(cache.to_orm())
+        session.commit()
+
+
+def add_all(session: Session, caches: list[CacheData]):
+    """
+    @brief 创建全部ORM对象后一次提交
+    """
+    session.add_all([cache.to_orm() for cache in caches])
+    session.commit()
+
+
+def bulk(chunk_size: int) -> Callable[[Session, list[CacheData]], None]:
+    """
+    @brief 生成指定块大小的批量写入函数
+    @param chunk_size 每条INSERT语句的行数
+    @return 写入函数
+    """
+    def write(session: Session, caches: list[CacheData]):
+        insert_caches(session, caches, chunk_size)
+        session.commit()
+
+    return write
+
+
+def measure(engine, write: Callable[[Session, list[CacheData]], None], caches: list[CacheData]) -> float:
+    """
+    @brief 测量一种写入方式
+    @param engine 数据库引擎
+    @param write 写入函数
+    @param caches 缓存数据
+    @return 每秒写入的行数
+    """
+    with Session(engine) as session:
+        session.execute(delete(Cache))
+        session.commit()
+
+        start: float = perf_counter()
+        write(session, caches)
+        cost: float = perf_counter() - start
+
+        assert session.query(Cache).count() == len(caches)
+
+    return len(caches) / cost
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    @brief 命令行入口
+    @param argv 命令行参数
+    @return 进程退出码
+    """
+    parser: ArgumentParser = ArgumentParser(description='Compare cache insertion paths')
+    parser.add_argument('--rows', type=int, default=5000, help='rows written by each path')
+    parser.add_argument('--chunk-size', type=int, action='append', help='bulk chunk sizes, may be repeated')
+    parser.add_argument('--url', help='database url, a temporary SQLite file is used by default')
+    args = parser.parse_args(argv)
+
+    caches: list[CacheData] = make_caches(args.rows)
+    # 逐条提交的方式很慢，只用部分数据测量
+    each: list[CacheData] = caches[:max(1, args.rows // 10)]
+
+    with TemporaryDirectory() as directory:
+        engine = configure_engine(create_engine(args.url or f'sqlite:///{directory}/insert.db'))
+        Base.metadata.create_all(engine, tables=[Cache.__table__])
+
+        paths: list[tuple[str, Callable, list[CacheData]]] = [
+            ('add + commit each', add_each, each),
+            ('add_all', add_all, caches),
+        ]
+        paths.extend((f'insert_caches({size})', bulk(size), caches) for size in args.chunk_size or [100, 500, 1000])
+
+        print(f'{"path":<24}{"rows":>8}{"rows/s":>12}')
+        for name, write, data in paths:
+            print(f'{name:<24}{len(data):>8}{measure(engine, write, data):>12.0f}')
+
+        engine.dispose()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,393 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file run.py
+@brief 解析函数基准测试
+@details 使用 fixtures 目录中录制的页面逐个运行爬虫的 handle_* 函数，数据库写入、重抓策略和评分刷新
+         均替换为不访问数据库的桩对象，只测量解析本身的吞吐量和内存，并与 baseline.json 中的基线比较
+
+用法：python -m benchmark.run [--case NAME] [--iterations N] [--repeat N] [--retry N] [--tolerance 0.2] [--fields] [--save]
+"""
+
+from typing import Any, Callable, Iterator
+from dataclasses import dataclass, asdict
+from contextlib import contextmanager
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+from json import loads, dumps
+from statistics import median
+from types import ModuleType
+from inspect import iscoroutinefunction
+from asyncio import new_event_loop, AbstractEventLoop
+import gc
+import sys
+import tracemalloc
+import logging
+
+from httpx import Request, Response
+from lxml import etree
+
+from frame.extract import extractors
+
+FIXTURE_PATH = Path(__file__).parent / 'fixtures'
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+
+
+class SinkSession(object):
+    """
+    @brief 丢弃全部写入的数据库会话
+    """
+    #: 累计写入的对象数量，用于确认解析函数确实产生了数据
+    added: int = 0
+
+    def __enter__(self) -> 'SinkSession':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def add(self, instance: Any):
+        SinkSession.added += 1
+
+    def add_all(self, instances: list):
+        SinkSession.added += len(instances)
+
+    def commit(self):
+        pass
+
+
+async def sink_caches(caches) -> int:
+    """
+    @brief 丢弃全部缓存数据的异步写入
+    """
+    number: int = len(list(caches))
+    SinkSession.added += number
+    return number
+
+
+class DuePolicy(object):
+    """
+    @brief 所有详情页都到期的重抓策略
+    """
+
+    def __init__(self, web: int, today=None):
+        self.web: int = web
+
+    def filter(self, items: list[tuple[int, Any]]) -> list:
+        return [item for _, item in items]
+
+
+class UnknownRefresh(object):
+    """
+    @brief 所有动画都未收录的评分刷新
+    """
+
+    def __init__(self, web: int, resolve=None):
+        self.web: int = web
+
+    def apply(self, ratings: dict[int, Any], today=None) -> list[int]:
+        return list(ratings.keys())
+
+
+class EmptyTitleIndex(object):
+    """
+    @brief 没有任何数据的名称索引
+    """
+
+    def details(self, aids, session) -> dict:
+        return {}
+
+
+#: 替换到爬虫模块中的桩对象
+STUBS: dict[str, Any] = {
+    'SessionFactory': SinkSession,
+    'add_caches': sink_caches,
+    'RecrawlPolicy': DuePolicy,
+    'ScoreRefresh': UnknownRefresh,
+    'TitleIndex': EmptyTitleIndex,
+}
+
+
+@dataclass
+class Case(object):
+    """
+    @brief 单个基准测试用例
+    """
+    #: 用例名称
+    name: str
+    #: 爬虫模块名
+    module: str
+    #: 解析函数名
+    handle: str
+    #: 页面URL
+    url: str
+    #: 页面文件名
+    fixture: str
+    #: 页面的Content-Type
+    content_type: str = 'text/html; charset=utf-8'
+
+
+CASES: list[Case] = [
+    Case('mal_season', 'spider.MAL', 'handle_season', 'https://myanimelist.net/anime/season/2025/fall', 'mal_season.html'),
+    Case('mal_season_score', 'spider.MAL', 'handle_season_score', 'https://myanimelist.net/anime/season/2025/fall', 'mal_season.html'),
+    Case('mal_detail', 'spider.MAL', 'handle_detail', 'https://myanimelist.net/anime/52991/Sousou_no_Frieren', 'mal_detail.html'),
+    Case('mal_api_season', 'spider.MAL_API', 'handle_season', 'https://api.myanimelist.net/v2/anime/season/2025/fall', 'mal_api_season.json', 'application/json'),
+    Case('anidb_season', 'spider.AniDB', 'handle_season', 'https://anidb.net/anime/season/2025/autumn/?do=calendar&h=1', 'anidb_season.html'),
+    Case('anidb_detail', 'spider.AniDB', 'handle_detail', 'https://anidb.net/anime/17617', 'anidb_detail.html'),
+    Case('anidb_api_detail', 'spider.AniDB_API', 'handle_detail', 'http://api.anidb.net:9001/httpapi?client=animescrapy&clientver=1&protover=1&request=anime&aid=17617', 'anidb_api.xml', 'text/xml'),
+    Case('bangumi_calendar', 'spider.Bagumi', 'handle_calender', 'https://api.bgm.tv/calendar', 'bangumi_calendar.json', 'application/json'),
+    Case('bangumi_calendar_score', 'spider.Bagumi', 'handle_calender_score', 'https://api.bgm.tv/calendar', 'bangumi_calendar.json', 'application/json'),
+    Case('bangumi_subject', 'spider.Bagumi', 'handle_subject', 'https://api.bgm.tv/v0/subjects/400602', 'bangumi_subject.json', 'application/json'),
+    Case('anikore_chronicle', 'spider.Anikore', 'handle_chronicle', 'https://www.anikore.jp/chronicle/2025/autumn/', 'anikore_chronicle.html'),
+]
+
+
+@dataclass
+class Result(object):
+    """
+    @brief 单个用例的测试结果
+    """
+    #: 每秒解析的页面数
+    pages_per_second: float
+    #: 单页解析过程中Python分配器的峰值内存（KiB）
+    peak_kib: float
+    #: 单页解析结束后仍未释放的内存（KiB）
+    retained_kib: float
+    #: 单页解析结束后比解析前多出的内存块数量，即净保留的块数，不是解析过程中的分配次数
+    retained_blocks: int
+    #: 各轮耗时的中位数相对最快一轮的偏差，反映本次测量的噪声
+    noise: float = 0.0
+
+
+def calibrate(repeat: int) -> float:
+    """
+    @brief 测量当前机器的参考速度
+    @details 反复解析固定的HTML和JSON页面，结果用于在不同机器或负载下换算基线
+    @param repeat 计时的轮数
+    @return 每秒完成的参考任务数
+    """
+    html: bytes = (FIXTURE_PATH / 'mal_detail.html').read_bytes()
+    json: bytes = (FIXTURE_PATH / 'bangumi_subject.json').read_bytes()
+
+    cost: float = float('inf')
+    for _ in range(repeat):
+        start: float = perf_counter()
+        for _ in range(50):
+            etree.HTML(html)
+            loads(json)
+        cost = min(cost, perf_counter() - start)
+
+    return 50 / cost
+
+
+@contextmanager
+def stubbed(module: ModuleType) -> Iterator[None]:
+    """
+    @brief 在上下文中将爬虫模块的数据库相关对象替换为桩对象
+    @param module 爬虫模块
+    """
+    original: dict[str, Any] = {}
+    for name, stub in STUBS.items():
+        if hasattr(module, name):
+            original[name] = getattr(module, name)
+            setattr(module, name, stub)
+
+    try:
+        yield
+    finally:
+        for name, value in original.items():
+            setattr(module, name, value)
+
+
+def load(case: Case) -> tuple[Callable[[Response], Any], Callable[[], Response]]:
+    """
+    @brief 加载用例的解析函数和页面
+    @param case 用例
+    @return (解析函数, 每次调用构造新响应的函数)
+    """
+    module: ModuleType = __import__(case.module, fromlist=[case.handle])
+    handle: Callable[[Response], Any] = getattr(module, case.handle)
+    content: bytes = (FIXTURE_PATH / case.fixture).read_bytes()
+
+    if iscoroutinefunction(handle):
+        # 协程处理函数在同一个事件循环中逐个运行，桩对象不会真正等待，计时中只多出事件循环的调度开销
+        loop: AbstractEventLoop = new_event_loop()
+        coroutine_handle = handle
+
+        def handle(item: Response) -> Any:
+            return loop.run_until_complete(coroutine_handle(item))
+
+    def response() -> Response:
+        return Response(
+            200,
+            headers={'content-type': case.content_type},
+            content=content,
+            request=Request('GET', case.url)
+        )
+
+    return handle, response
+
+
+def measure(case: Case, iterations: int, repeat: int) -> Result:
+    """
+    @brief 运行单个用例
+    @details 先预热，再计时运行指定次数，最后在tracemalloc下单独运行一次统计内存，
+             避免内存跟踪影响吞吐量的测量；lxml在C层分配的内存不在统计范围内
+    @param case 用例
+    @param iterations 每轮计时运行的次数
+    @param repeat 计时的轮数
+    @return 测试结果
+    """
+    handle, response = load(case)
+    module: ModuleType = sys.modules[case.module]
+
+    with stubbed(module):
+        for _ in range(max(1, iterations // 10)):
+            handle(response())
+
+        # 与timeit相同，取多轮中最快的一轮，减少其他进程带来的噪声
+        costs: list[float] = []
+        for _ in range(repeat):
+            responses: list[Response] = [response() for _ in range(iterations)]
+            gc.collect()
+            start: float = perf_counter()
+            for item in responses:
+                handle(item)
+            costs.append(perf_counter() - start)
+        cost: float = min(costs)
+
+        item = response()
+        gc.collect()
+        tracemalloc.start()
+        before: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        handle(item)
+        del item
+        current, peak = tracemalloc.get_traced_memory()
+        after: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    retained_blocks: int = sum(max(0, stat.count_diff) for stat in after.compare_to(before, 'lineno'))
+
+    return Result(
+        pages_per_second=iterations / cost,
+        peak_kib=(peak - base) / 1024,
+        retained_kib=(current - base) / 1024,
+        retained_blocks=retained_blocks,
+        noise=median(costs) / cost - 1
+    )
+
+
+def expected(name: str, baseline: dict[str, dict], calibration: float) -> float | None:
+    """
+    @brief 按参考速度将基线吞吐量换算到当前机器
+    @param name 用例名称
+    @param baseline 基线数据
+    @param calibration 当前机器的参考速度
+    @return 换算后的基线吞吐量，没有基线时返回None
+    """
+    if name not in baseline:
+        return None
+
+    reference: dict = baseline[name]
+    return reference['pages_per_second'] * calibration / reference['calibration']
+
+
+def compare(name: str, result: Result, baseline: dict[str, dict], calibration: float, tolerance: float) -> list[str]:
+    """
+    @brief 将结果与基线比较
+    @param name 用例名称
+    @param result 测试结果
+    @param baseline 基线数据
+    @param calibration 当前机器的参考速度
+    @param tolerance 允许的相对偏差
+    @return 退化描述列表，没有退化时为空
+    """
+    if name not in baseline:
+        return []
+
+    reference: dict = baseline[name]
+    speed: float = expected(name, baseline, calibration)
+    regressions: list[str] = []
+    # 本次测量的噪声越大，允许的偏差越大，避免负载波动被当作退化
+    if result.pages_per_second < speed * (1 - tolerance - result.noise):
+        regressions.append(f'{name}: {result.pages_per_second:.1f} pages/s, baseline {speed:.1f} pages/s, '
+                           f'noise {result.noise:.0%}')
+    if result.peak_kib > reference['peak_kib'] * (1 + tolerance):
+        regressions.append(f'{name}: peak {result.peak_kib:.1f} KiB, baseline {reference["peak_kib"]:.1f} KiB')
+
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    @brief 命令行入口
+    @param argv 命令行参数
+    @return 进程退出码，出现退化时返回1
+    """
+    parser: ArgumentParser = ArgumentParser(description='Benchmark spider parsers against recorded pages')
+    parser.add_argument('--case', action='append', help='run only the named case, may be repeated')
+    parser.add_argument('--iterations', type=int, default=200, help='timed iterations per round')
+    parser.add_argument('--repeat', type=int, default=7, help='timed rounds per case, the fastest round is reported')
+    parser.add_argument('--retry', type=int, default=2, help='re-measure a case this many times before reporting a regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help='baseline file')
+    parser.add_argument('--fields', action='store_true', help='print the per-field extraction time of each case')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+
+    baseline: dict[str, dict] = loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    results: dict[str, Result] = {}
+    calibrations: dict[str, float] = {}
+    regressions: list[str] = []
+
+    print(f'{"case":<24}{"pages/s":>12}{"peak KiB":>12}{"retained KiB":>14}{"blocks":>10}{"vs base":>10}')
+    for case in CASES:
+        if args.case and case.name not in args.case:
+            continue
+
+        # 每个用例前重新测量参考速度，跟随机器负载的变化
+        calibration: float = calibrate(args.repeat)
+        result: Result = measure(case, args.iterations, args.repeat)
+        # 低于基线时重新测量，偶发的负载波动不会在每次测量中都出现，真实的退化会
+        for _ in range(args.retry):
+            if not compare(case.name, result, baseline, calibration, args.tolerance):
+                break
+            calibration = calibrate(args.repeat)
+            result = measure(case, args.iterations, args.repeat)
+        results[case.name] = result
+        calibrations[case.name] = calibration
+
+        change: str = ''
+        if case.name in baseline:
+            change = f'{result.pages_per_second / expected(case.name, baseline, calibration) - 1:+.1%}'
+        print(f'{case.name:<24}{result.pages_per_second:>12.1f}{result.peak_kib:>12.1f}'
+              f'{result.retained_kib:>14.1f}{result.retained_blocks:>10}{change:>10}')
+
+        regressions.extend(compare(case.name, result, baseline, calibration, args.tolerance))
+
+        # 同一模块的提取器被多个用例共用，每个用例之后清空统计
+        for name, extractor in extractors(sys.modules[case.module]).items():
+            if args.fields and extractor._count:
+                for field, cost in sorted(extractor.timing().items(), key=lambda i: i[1], reverse=True):
+                    print(f'  {name}.{field:<30}{cost:>10.3f} ms/page')
+            extractor.reset()
+
+    if args.save:
+        baseline.update({name: asdict(result) | {'calibration': calibrations[name]} for name, result in results.items()})
+        args.baseline.write_text(dumps(baseline, indent=4, sort_keys=True) + '\n')
+        print(f'baseline saved to {args.baseline}')
+        return 0
+
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
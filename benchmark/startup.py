@@ -0,0 +1,134 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file startup.py
+@brief 启动开销检查
+@details 在新的解释器进程中逐个导入入口模块，测量导入耗时和进程常驻内存，并检查导入过程没有副作用：
+         不创建数据库引擎、不加载数据库驱动、不导入未使用的爬虫模块。耗时只统计导入语句本身，不含解释器的启动时间，
+         超出预算或出现副作用时以非零状态退出
+
+用法：python -m benchmark.startup [--repeat N] [--scale 1.0]
+"""
+
+from dataclasses import dataclass, field
+from argparse import ArgumentParser
+from pathlib import Path
+from json import loads
+import subprocess
+import sys
+
+ROOT_PATH = Path(__file__).parent.parent
+
+#: 子进程中执行的测量脚本，输出导入耗时（毫秒）、常驻内存峰值（KiB）和导入后已加载的模块
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+{statement}
+cost = (time.perf_counter() - start) * 1000
+model = sys.modules.get('database.model')
+print(json.dumps({{
+    'ms': cost,
+    'rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+    'engine': getattr(model, '_engine', None) is not None,
+}}))
+'''
+
+
+@dataclass
+class Budget(object):
+    """
+    @brief 单个入口的启动预算
+    """
+    #: 入口名称
+    name: str
+    #: 在子进程中执行的导入语句
+    statement: str
+    #: 导入耗时上限（毫秒），不含解释器自身的启动时间
+    ms: float
+    #: 进程常驻内存上限（MiB）
+    rss_mib: float
+    #: 导入后不允许出现的模块
+    forbidden: list[str] = field(default_factory=list)
+
+
+#: 数据库驱动和其他爬虫模块都不应该被入口导入
+DRIVERS: list[str] = ['pymysql']
+OTHER_SPIDERS: list[str] = ['spider.Bagumi', 'spider.MAL_API', 'spider.AniDB', 'spider.AniDB_API', 'spider.Anikore']
+
+BUDGETS: list[Budget] = [
+    Budget('registry', 'import spider', 50, 20, DRIVERS + OTHER_SPIDERS + ['spider.MAL', 'sqlalchemy', 'lxml']),
+    Budget('model', 'import database.model', 900, 70, DRIVERS),
+    Budget('single spider', 'from spider import get_spider; get_spider("mal")', 1100, 80, DRIVERS + OTHER_SPIDERS),
+    Budget('scheduler', 'import main', 1300, 90, DRIVERS + OTHER_SPIDERS + ['spider.MAL']),
+]
+
+
+def probe(statement: str) -> dict:
+    """
+    @brief 在新的解释器进程中执行导入语句并收集结果
+    @param statement 导入语句
+    @return 测量结果
+    """
+    completed = subprocess.run(
+        [sys.executable, '-c', PROBE.format(statement=statement)],
+        cwd=ROOT_PATH, capture_output=True, text=True, check=True
+    )
+    return loads(completed.stdout.splitlines()[-1])
+
+
+def check(budget: Budget, repeat: int, scale: float) -> tuple[dict, list[str]]:
+    """
+    @brief 检查单个入口
+    @details 耗时取多次运行中最短的一次，减少其他进程带来的噪声
+    @param budget 启动预算
+    @param repeat 运行次数
+    @param scale 预算的放大倍数，用于较慢的机器
+    @return (测量结果, 违反预算的描述列表)
+    """
+    results: list[dict] = [probe(budget.statement) for _ in range(repeat)]
+    result: dict = min(results, key=lambda i: i['ms'])
+
+    failures: list[str] = []
+    if result['ms'] > budget.ms * scale:
+        failures.append(f'{budget.name}: import took {result["ms"]:.0f} ms, budget {budget.ms * scale:.0f} ms')
+    if result['rss_kib'] / 1024 > budget.rss_mib * scale:
+        failures.append(f'{budget.name}: RSS {result["rss_kib"] / 1024:.1f} MiB, budget {budget.rss_mib * scale:.1f} MiB')
+    if result['engine']:
+        failures.append(f'{budget.name}: database engine created at import')
+    for module in budget.forbidden:
+        if module in result['modules']:
+            failures.append(f'{budget.name}: {module} imported')
+
+    return result, failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    @brief 命令行入口
+    @param argv 命令行参数
+    @return 进程退出码，超出预算时返回1
+    """
+    parser: ArgumentParser = ArgumentParser(description='Check import time, RSS and import side effects of entry points')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per entry point, the fastest run is reported')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every budget, for slower machines')
+    args = parser.parse_args(argv)
+
+    failures: list[str] = []
+
+    print(f'{"entry":<16}{"import ms":>12}{"budget":>10}{"RSS MiB":>10}{"budget":>10}')
+    for budget in BUDGETS:
+        result, problems = check(budget, args.repeat, args.scale)
+        failures.extend(problems)
+        print(f'{budget.name:<16}{result["ms"]:>12.0f}{budget.ms * args.scale:>10.0f}'
+              f'{result["rss_kib"] / 1024:>10.1f}{budget.rss_mib * args.scale:>10.1f}')
+
+    for failure in failures:
+        print(f'OVER BUDGET {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
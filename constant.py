@@ -11,13 +11,31 @@ def set_constant[T](env_name: str, default: T) -> T:
     else:
         raise Exception('Unsupported OS')
 
-USERNAME = set_constant('USERNAME', 'root')
-PASSWORD = set_constant('PASSWORD', '123456')
-HOST = set_constant('HOST', 'localhost')
-PORT = set_constant('PORT', '3306')
+#: 常量名及其默认值，常量在第一次被访问时才读取环境变量
+DEFAULTS: dict[str, str] = {
+    'USERNAME': 'root',
+    'PASSWORD': '123456',
+    'HOST': 'localhost',
+    'PORT': '3306',
 
-LOG_PATH = set_constant('LOG_PATH', 'log.txt')
-PICTURE_PATH = set_constant('PICTURE_PATH', './examples')
+    'DB_BACKEND': 'mysql',
+    'SQLITE_PATH': 'anime.db',
+    'SCORE_STORAGE': 'daily',
+    'SCORE_RETENTION_DAYS': '',
+
+    'LOG_PATH': 'log.txt',
+    'PICTURE_PATH': './examples',
+
+    'MAL_CLIENT_ID': '',
+}
+
+def __getattr__(key: str):
+    if key not in DEFAULTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {key!r}')
+
+    value = set_constant(key, DEFAULTS[key])
+    globals()[key] = value
+    return value
 
 if __name__ == '__main__':
     pass
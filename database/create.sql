@@ -53,6 +53,36 @@ PARTITION BY RANGE (YEAR(`date`) * 10 + QUARTER(`date`)) (
     PARTITION pFUTURE VALUES LESS THAN MAXVALUE
 );
 
+-- Table: score_week
+CREATE TABLE IF NOT EXISTS score_week (
+    `detailId` INT NOT NULL,
+    `start` DATE NOT NULL,
+
+    `score` DECIMAL(4, 2),
+    `scoreMin` DECIMAL(4, 2),
+    `scoreMax` DECIMAL(4, 2),
+    `vote` INT,
+    `days` SMALLINT NOT NULL,
+
+    PRIMARY KEY (`detailId`, `start`),
+    INDEX idx_score_week_rank (`start`, `score` DESC)
+);
+
+-- Table: score_month
+CREATE TABLE IF NOT EXISTS score_month (
+    `detailId` INT NOT NULL,
+    `start` DATE NOT NULL,
+
+    `score` DECIMAL(4, 2),
+    `scoreMin` DECIMAL(4, 2),
+    `scoreMax` DECIMAL(4, 2),
+    `vote` INT,
+    `days` SMALLINT NOT NULL,
+
+    PRIMARY KEY (`detailId`, `start`),
+    INDEX idx_score_month_rank (`start`, `score` DESC)
+);
+
 -- Table: name_map
 CREATE TABLE name_map (
     `id` INT AUTO_INCREMENT PRIMARY KEY,
@@ -105,6 +135,82 @@ CREATE TABLE IF NOT EXISTS cache(
     INDEX idx_cache_web (`web`)
 );
 
+-- Table: anidb_title
+CREATE TABLE IF NOT EXISTS anidb_title(
+    `id` INT NOT NULL AUTO_INCREMENT,
+
+    `aid` INT NOT NULL,
+    `type` VARCHAR(16),
+    `lang` VARCHAR(16),
+    `title` VARCHAR(256) NOT NULL,
+
+    PRIMARY KEY (`id`),
+    INDEX idx_anidb_title_aid (`aid`),
+    INDEX idx_anidb_title_title (`title`)
+);
+
+-- Table: crawl_state
+CREATE TABLE IF NOT EXISTS crawl_state(
+    `web` TINYINT NOT NULL,
+    `webId` INT NOT NULL,
+
+    `lastFetch` DATE NOT NULL,
+    `airDate` DATE,
+    `score` DECIMAL(4, 2),
+    `volatility` FLOAT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (`web`, `webId`)
+);
+
+-- Table: frontier
+CREATE TABLE IF NOT EXISTS frontier(
+    `id` INT NOT NULL AUTO_INCREMENT,
+
+    `spider` VARCHAR(32) NOT NULL,
+    `fingerprint` CHAR(40) NOT NULL,
+
+    `method` VARCHAR(8) NOT NULL,
+    `url` VARCHAR(512) NOT NULL,
+    `headers` JSON,
+    `host` VARCHAR(64) NOT NULL,
+
+    `state` ENUM('pending', 'leased', 'done', 'failed') NOT NULL,
+    `worker` VARCHAR(64),
+    `attempts` INT NOT NULL DEFAULT 0,
+    `leaseUntil` DATETIME,
+    `created` DATETIME NOT NULL,
+
+    PRIMARY KEY (`id`),
+    INDEX idx_frontier_spider_state (`spider`, `state`),
+    UNIQUE INDEX idx_frontier_fingerprint (`spider`, `fingerprint`)
+);
+
+-- Table: source_link
+CREATE TABLE IF NOT EXISTS source_link(
+    `web` TINYINT NOT NULL,
+    `webId` INT NOT NULL,
+    `detailId` INT NOT NULL,
+
+    PRIMARY KEY (`web`, `webId`)
+);
+
+-- Table: collect_mark
+CREATE TABLE IF NOT EXISTS collect_mark(
+    `web` TINYINT NOT NULL,
+    `cacheId` INT NOT NULL,
+    `updated` DATETIME NOT NULL,
+
+    PRIMARY KEY (`web`)
+);
+
+-- Table: frontier_host
+CREATE TABLE IF NOT EXISTS frontier_host(
+    `host` VARCHAR(64) NOT NULL,
+    `nextTime` DATETIME NOT NULL,
+
+    PRIMARY KEY (`host`)
+);
+
 INSERT INTO web (`name`, `host`, `format`, `priority`) VALUE
 ('Bangumi', 'bangumi.tv', '/subject/{}', 10),
 ('Anikore', 'www.anikore.jp', '/anime/{}', 40),
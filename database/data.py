@@ -1,15 +1,21 @@
 # -*- coding:utf-8 -*-
 # AUTHOR: Sun
 
+from typing import Iterable, Iterator
 from datetime import date as date_type
 from dataclasses import dataclass, field
+from itertools import islice
 from enum import Enum
 
 from pytz import timezone
+from sqlalchemy import insert
 
 from database.model import Cache, Detail, Score, Web
 
 DEFAULT_TZ = timezone('Asia/Shanghai')  # 默认时区设置为上海时区
+BULK_CHUNK_SIZE = 500  # 批量写入缓存时每条INSERT语句的行数
+IN_CHUNK_SIZE = 500  # IN查询每次携带的参数数量，避免超出数据库的参数数量限制
+ARCHIVE_DATE = 'archive_date'  # 重解析归档时响应的extensions中保存抓取时间的键
 
 
 class Season(Enum):
@@ -18,6 +24,41 @@ class Season(Enum):
     AUTUMN = 'autumn'   # 秋季
     WINTER = 'winter'   # 冬季
 
+    @classmethod
+    def from_month(cls, month: int) -> 'Season':
+        # 根据月份获取所属季度，1-3月为冬季，4-6月为春季，7-9月为夏季，10-12月为秋季
+        if 1 <= month <= 3:
+            return cls.WINTER
+        elif 4 <= month <= 6:
+            return cls.SPRING
+        elif 7 <= month <= 9:
+            return cls.SUMMER
+        elif 10 <= month <= 12:
+            return cls.AUTUMN
+
+        raise ValueError(f'Invalid month: {month}')
+
+
+def current_season(today: date_type | None = None) -> tuple[int, Season]:
+    # 获取当前所在的年份和季度，默认使用默认时区的当前日期
+    from datetime import datetime
+
+    today = today if today else datetime.now(DEFAULT_TZ).date()
+    return today.year, Season.from_month(today.month)
+
+
+def response_date(response) -> date_type:
+    # 获取响应对应的评分日期，重解析归档时为归档中的抓取日期，否则为默认时区的当前日期
+    from datetime import datetime
+
+    archived: str | None = response.extensions.get(ARCHIVE_DATE)
+    if not archived:
+        return datetime.now(DEFAULT_TZ).date()
+
+    # 旧的归档记录保存的是不带时区的本地时间，直接取日期
+    time: datetime = datetime.fromisoformat(archived)
+    return (time.astimezone(DEFAULT_TZ) if time.tzinfo else time).date()
+
 
 @dataclass
 class DetailData:
@@ -193,6 +234,25 @@ class CacheData:
             picture=self.picture
         )
 
+    def to_row(self) -> dict:
+        # 将CacheData对象转换为Core INSERT语句的参数字典，字段与to_orm一致
+        return {
+            'name': self.name,
+            'translation': self.translation,
+            'all': self.all_data,
+            'year': self.year,
+            'season': self.season.value,
+            'time': self.time,
+            'tag': self.tag,
+            'description': self.description,
+            'score': self.score,
+            'vote': self.vote,
+            'date': self.date,
+            'web': self.web,
+            'webId': self.webId,
+            'picture': self.picture
+        }
+
     @classmethod
     def from_orm(cls, cache: Cache) -> 'CacheData':
         # 从Cache ORM对象创建CacheData对象
@@ -214,5 +274,26 @@ class CacheData:
             picture=cache.picture
         )
 
+
+def chunked[T](values: Iterable[T], size: int = IN_CHUNK_SIZE) -> Iterator[list[T]]:
+    # 将参数按固定大小分块，用于分批执行IN查询
+    values = iter(values)
+    while chunk := list(islice(values, size)):
+        yield chunk
+
+
+def insert_caches(connection, caches: Iterable[CacheData], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    # 批量写入缓存数据，connection可以是Session或Connection，由调用方提交事务
+    # 直接对表执行Core INSERT，每块只有一条多行语句，不创建ORM对象，也不经过会话的标识映射和flush
+    statement = insert(Cache.__table__)
+
+    number: int = 0
+    for chunk in chunked(caches, chunk_size):
+        connection.execute(statement, [cache.to_row() for cache in chunk])
+        number += len(chunk)
+
+    return number
+
+
 if __name__ == '__main__':
     pass
@@ -1,18 +1,157 @@
 # -*- coding:utf-8 -*-
 # AUTHOR: Sun
 
-from sqlalchemy import create_engine, Index
-from sqlalchemy import Column, Integer, String, Text, Date, JSON, Enum, DECIMAL
-from sqlalchemy.dialects.mysql import TINYINT, YEAR
-from sqlalchemy.orm import sessionmaker, declarative_base
+from threading import Lock
 
-from constant import USERNAME, PASSWORD, HOST, PORT
+from sqlalchemy import create_engine, event, Index
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, Date, DateTime, JSON, Enum, DECIMAL, Float
+from sqlalchemy.engine import Engine as EngineType
+from sqlalchemy.dialects.mysql import TINYINT, YEAR
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
+import constant
 
-DB_URI: str = f'mysql+pymysql://{USERNAME}:{PASSWORD}@{HOST}:{PORT}/anime'
 Base = declarative_base()
-Engine = create_engine(DB_URI, pool_pre_ping=True)
-SessionFactory = sessionmaker(bind=Engine, autoflush=False)
+
+#: 年份和小整数类型，MySQL中保持原来的YEAR和TINYINT，其他数据库使用SMALLINT
+Year = SmallInteger().with_variant(YEAR(), 'mysql')
+TinyInt = SmallInteger().with_variant(TINYINT(), 'mysql')
+
+#: SQLite模式下数据库文件的默认路径
+DEFAULT_SQLITE_PATH = 'anime.db'
+
+#: SQLite连接建立时设置的参数：WAL模式允许读写并发，NORMAL同步级别在WAL模式下不会损坏数据，
+#: busy_timeout让多个爬虫线程同时写入时等待锁而不是立即报错
+SQLITE_PRAGMAS: dict[str, str | int] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+}
+
+#: 网站表的初始数据，与create.sql一致
+WEB_ROWS: list[tuple[str, str, str, int]] = [
+    ('Bangumi', 'bangumi.tv', '/subject/{}', 10),
+    ('Anikore', 'www.anikore.jp', '/anime/{}', 40),
+    ('aniDB', 'anidb.net', '/anime/{}', 20),
+    ('MyAnimeList', 'myanimelist.net', '/anime/{}', 30),
+]
+
+#: 延迟创建的数据库引擎，第一次打开会话或调用get_engine时创建
+_engine: EngineType | None = None
+_engine_lock: Lock = Lock()
+
+
+def get_backend() -> str:
+    """
+    @brief 获取配置的数据库后端
+    @return mysql 或 sqlite，未配置时为mysql
+    """
+    backend: str = (constant.DB_BACKEND or 'mysql').lower()
+    if backend not in ('mysql', 'sqlite'):
+        raise ValueError(f'Unsupported database backend: {backend}')
+
+    return backend
+
+
+def get_db_uri() -> str:
+    """
+    @brief 按当前的配置生成数据库连接地址
+    @return 数据库连接地址
+    """
+    if get_backend() == 'sqlite':
+        return f'sqlite:///{constant.SQLITE_PATH or DEFAULT_SQLITE_PATH}'
+
+    return f'mysql+pymysql://{constant.USERNAME}:{constant.PASSWORD}@{constant.HOST}:{constant.PORT}/anime'
+
+
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    """
+    @brief 在新的SQLite连接上设置参数
+    @param dbapi_connection DBAPI连接
+    @param connection_record 连接池记录
+    """
+    cursor = dbapi_connection.cursor()
+    for key, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {key}={value}')
+    cursor.close()
+
+
+def configure_engine(engine: EngineType) -> EngineType:
+    """
+    @brief 按数据库类型配置引擎
+    @details SQLite引擎在每个新连接上设置参数；SQLite没有单独的建表脚本，第一次使用时按模型建表
+    @param engine 同步引擎，异步引擎传入其sync_engine
+    @return 传入的引擎
+    """
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', set_sqlite_pragma)
+
+    return engine
+
+
+def initialize(engine: EngineType):
+    """
+    @brief 按模型建表并写入网站数据
+    @details 与create.sql的作用相同，用于没有建表脚本的SQLite数据库，已经存在的表和数据不会改变
+    @param engine 同步引擎
+    """
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        if session.query(Web).first() is None:
+            session.add_all([Web(name=name, host=host, format=format_, priority=priority)
+                             for name, host, format_, priority in WEB_ROWS])
+            session.commit()
+
+
+def get_engine() -> EngineType:
+    """
+    @brief 获取数据库引擎
+    @details 导入本模块时不再创建引擎和加载数据库驱动，第一次需要连接数据库时才创建，
+             只解析数据或只运行单个爬虫的短进程因此不需要承担这部分启动开销
+    @return 数据库引擎
+    """
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine: EngineType = configure_engine(create_engine(get_db_uri(), pool_pre_ping=True))
+                if engine.dialect.name == 'sqlite':
+                    initialize(engine)
+                _engine = engine
+
+    return _engine
+
+
+class LazySessionFactory(sessionmaker):
+    """
+    @brief 第一次打开会话时才绑定数据库引擎的会话工厂
+    @details 通过configure(bind=...)显式绑定的引擎优先，不会再创建默认引擎
+    """
+
+    def __call__(self, **local_kw) -> Session:
+        if self.kw.get('bind') is None and local_kw.get('bind') is None:
+            self.configure(bind=get_engine())
+
+        return super().__call__(**local_kw)
+
+
+SessionFactory = LazySessionFactory(autoflush=False)
+
+
+def __getattr__(name: str):
+    # 兼容原来的模块属性，访问时才生成连接地址或创建引擎
+    if name == 'DB_URI':
+        return get_db_uri()
+    if name == 'Engine':
+        return get_engine()
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 class Detail(Base):
@@ -24,14 +163,14 @@ class Detail(Base):
     translation = Column(String(64))  # 动画译名
     all = Column(JSON)  # 所有名称组成的JSON字符串数组
 
-    year = Column(YEAR)  # 发布年份
+    year = Column(Year)  # 发布年份
     season = Column(Enum('spring', 'summer', 'autumn', 'winter'))  # 发布季节
 
     time = Column(Date)  # 发布日期
     tag = Column(JSON)  # 标签信息，以JSON字符串数组格式存储
     description = Column(Text)  # 动画描述信息
 
-    web = Column(TINYINT)  # 来源网站ID
+    web = Column(TinyInt)  # 来源网站ID
     webId = Column(Integer)  # 在来源网站的ID
 
     picture = Column(String(128))  # 封面图片URL
@@ -60,6 +199,40 @@ class Score(Base):
     )
 
 
+class ScoreWeek(Base):
+    __tablename__ = 'score_week'
+
+    detailId = Column(Integer, primary_key=True)  # 关联的Detail表ID
+    start = Column(Date, primary_key=True)  # 周一的日期
+
+    score = Column(DECIMAL(4, 2))  # 有评分的日期的平均总评分
+    scoreMin = Column(DECIMAL(4, 2))  # 最低总评分
+    scoreMax = Column(DECIMAL(4, 2))  # 最高总评分
+    vote = Column(Integer)  # 最后一天的投票人数
+    days = Column(SmallInteger, nullable=False)  # 有评分的天数
+
+    __table_args__ = (
+        Index('idx_score_week_rank', start, score.desc()),
+    )
+
+
+class ScoreMonth(Base):
+    __tablename__ = 'score_month'
+
+    detailId = Column(Integer, primary_key=True)  # 关联的Detail表ID
+    start = Column(Date, primary_key=True)  # 每月一日的日期
+
+    score = Column(DECIMAL(4, 2))  # 有评分的日期的平均总评分
+    scoreMin = Column(DECIMAL(4, 2))  # 最低总评分
+    scoreMax = Column(DECIMAL(4, 2))  # 最高总评分
+    vote = Column(Integer)  # 最后一天的投票人数
+    days = Column(SmallInteger, nullable=False)  # 有评分的天数
+
+    __table_args__ = (
+        Index('idx_score_month_rank', start, score.desc()),
+    )
+
+
 class Web(Base):
     __tablename__ = 'web'
 
@@ -70,7 +243,7 @@ class Web(Base):
 
     format = Column(String(16))  # 网站URL格式
 
-    priority = Column(TINYINT)  # 网站优先级
+    priority = Column(TinyInt)  # 网站优先级
 
 
 class NameMap(Base):
@@ -94,7 +267,7 @@ class Cache(Base):
     translation = Column(String(64))  # 动画译名
     all = Column(JSON)  # 所有相关信息的JSON格式存储
 
-    year = Column(YEAR)  # 发布年份
+    year = Column(Year)  # 发布年份
     season = Column(Enum('spring', 'summer', 'autumn', 'winter'))  # 发布季节
 
     time = Column(Date)  # 发布日期
@@ -105,7 +278,7 @@ class Cache(Base):
     vote = Column(Integer)  # 投票人数
     date = Column(Date, nullable=False)  # 缓存日期
 
-    web = Column(TINYINT)  # 来源网站ID
+    web = Column(TinyInt)  # 来源网站ID
     webId = Column(Integer)  # 在来源网站的ID
 
     picture = Column(String(128))  # 封面图片URL
@@ -115,5 +288,81 @@ class Cache(Base):
     )
 
 
+class AniDBTitle(Base):
+    __tablename__ = 'anidb_title'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 主键ID，自增
+
+    aid = Column(Integer, nullable=False)  # AniDB动画ID
+    type = Column(String(16))  # 名称类型，例如 main、official、syn、short
+    lang = Column(String(16))  # 名称语言
+    title = Column(String(256), nullable=False)  # 名称
+
+    __table_args__ = (
+        Index('idx_anidb_title_aid', 'aid'),
+        Index('idx_anidb_title_title', 'title'),
+    )
+
+
+class CrawlState(Base):
+    __tablename__ = 'crawl_state'
+
+    web = Column(TinyInt, primary_key=True)  # 来源网站ID
+    webId = Column(Integer, primary_key=True)  # 在来源网站的ID
+
+    lastFetch = Column(Date, nullable=False)  # 最近一次抓取日期
+    airDate = Column(Date)  # 放送日期
+    score = Column(DECIMAL(4, 2))  # 最近一次抓取的评分
+    volatility = Column(Float, nullable=False, default=0)  # 评分波动的指数移动平均值
+
+
+class SourceLink(Base):
+    __tablename__ = 'source_link'
+
+    web = Column(TinyInt, primary_key=True)  # 来源网站ID
+    webId = Column(Integer, primary_key=True)  # 在来源网站的ID
+    detailId = Column(Integer, nullable=False)  # 关联的Detail表ID
+
+
+class CollectMark(Base):
+    __tablename__ = 'collect_mark'
+
+    web = Column(TinyInt, primary_key=True)  # 来源网站ID
+    cacheId = Column(Integer, nullable=False)  # 已经合并并提交的最大缓存ID，删除缓存后清除
+    updated = Column(DateTime, nullable=False)  # 最近一次更新时间
+
+
+class Frontier(Base):
+    __tablename__ = 'frontier'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 主键ID，自增
+
+    spider = Column(String(32), nullable=False)  # 爬虫名称
+    fingerprint = Column(String(40), nullable=False)  # 请求指纹，用于去重
+
+    method = Column(String(8), nullable=False)  # 请求方法
+    url = Column(String(512), nullable=False)  # 请求URL
+    headers = Column(JSON)  # 请求头，以JSON对象格式存储
+    host = Column(String(64), nullable=False)  # 请求的主机名
+
+    state = Column(Enum('pending', 'leased', 'done', 'failed'), nullable=False)  # 请求状态
+    worker = Column(String(64))  # 租用该请求的工作节点
+    attempts = Column(Integer, nullable=False, default=0)  # 租用次数
+    leaseUntil = Column(DateTime)  # 租约到期时间
+    created = Column(DateTime, nullable=False)  # 创建时间
+
+    __table_args__ = (
+        Index('idx_frontier_spider_state', 'spider', 'state'),
+        Index('idx_frontier_fingerprint', 'spider', 'fingerprint', unique=True),
+    )
+
+
+class FrontierHost(Base):
+    __tablename__ = 'frontier_host'
+
+    host = Column(String(64), primary_key=True)  # 主机名
+    nextTime = Column(DateTime, nullable=False)  # 该主机下一次允许请求的时间
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,189 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file session.py
+@brief 异步数据库访问模块
+@details 基于SQLAlchemy的asyncio扩展为爬虫的处理函数提供可等待的写入接口，等待数据库的时间可以与
+         同一事件循环中的HTTP请求重叠。每个爬虫在自己线程的事件循环中运行，异步引擎的连接不能跨事件循环使用，
+         因此引擎按事件循环分别创建。没有安装异步驱动时，写入在线程池中使用同步的SessionFactory完成，
+         同样不会阻塞事件循环
+"""
+
+from typing import Any, Iterable
+from asyncio import AbstractEventLoop, get_running_loop, to_thread
+from importlib.util import find_spec
+from threading import Lock
+from weakref import WeakKeyDictionary
+from logging import getLogger
+
+from sqlalchemy.engine import URL
+
+from database.model import SessionFactory, get_engine, configure_engine
+from database.data import CacheData, DetailData, ScoreData, insert_caches, BULK_CHUNK_SIZE
+
+logger = getLogger(__name__)
+
+#: 同步方言对应的异步驱动
+ASYNC_DRIVERS: dict[str, str] = {
+    'mysql': 'aiomysql',
+    'sqlite': 'aiosqlite',
+}
+
+#: 每个事件循环的异步引擎
+_engines: WeakKeyDictionary = WeakKeyDictionary()
+_engines_lock: Lock = Lock()
+
+
+def get_sync_url() -> URL:
+    """
+    @brief 获取同步会话工厂实际使用的连接地址
+    @details SessionFactory通过configure绑定了其他引擎时使用该引擎的地址
+    @return 连接地址
+    """
+    bind = SessionFactory.kw.get('bind')
+    return (bind if bind is not None else get_engine()).url
+
+
+def get_async_url() -> URL | None:
+    """
+    @brief 获取异步引擎的连接地址
+    @return 连接地址，没有安装对应的异步驱动时返回None
+    """
+    url: URL = get_sync_url()
+    driver: str | None = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return None
+
+    missing: list[str] = [name for name in (driver, 'greenlet') if find_spec(name) is None]
+    if missing:
+        logger.warning(f'{", ".join(missing)} not installed, {url.get_backend_name()} writes use the thread pool')
+        return None
+
+    return url.set(drivername=f'{url.get_backend_name()}+{driver}')
+
+
+def get_async_engine():
+    """
+    @brief 获取当前事件循环的异步引擎
+    @return 异步引擎，没有安装异步驱动时返回None
+    """
+    loop: AbstractEventLoop = get_running_loop()
+
+    with _engines_lock:
+        if loop not in _engines:
+            url: URL | None = get_async_url()
+            if url is None:
+                logger.debug('no async database driver, use thread pool instead')
+                _engines[loop] = None
+            else:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                engine = create_async_engine(url, pool_pre_ping=True)
+                configure_engine(engine.sync_engine)
+                _engines[loop] = engine
+
+        return _engines[loop]
+
+
+async def dispose_async_engine():
+    """
+    @brief 关闭当前事件循环的异步引擎
+    @details 事件循环结束前调用，避免连接在事件循环关闭后才被回收
+    """
+    with _engines_lock:
+        engine = _engines.pop(get_running_loop(), None)
+
+    if engine is not None:
+        await engine.dispose()
+
+
+def write(instances: list) -> list:
+    """
+    @brief 使用同步会话写入ORM对象
+    @param instances ORM对象列表
+    @return 写入后的ORM对象列表，主键已经填充
+    """
+    with SessionFactory(expire_on_commit=False) as session:
+        session.add_all(instances)
+        session.commit()
+
+    return instances
+
+
+async def add_all(instances: Iterable[Any]) -> list:
+    """
+    @brief 在一个事务中写入ORM对象
+    @param instances ORM对象
+    @return 写入后的ORM对象列表，主键已经填充
+    """
+    instances = list(instances)
+    if not instances:
+        return instances
+
+    engine = get_async_engine()
+    if engine is None:
+        return await to_thread(write, instances)
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async with AsyncSession(engine, autoflush=False, expire_on_commit=False) as session:
+        session.add_all(instances)
+        await session.commit()
+
+    return instances
+
+
+def write_caches(caches: list[CacheData], chunk_size: int) -> int:
+    """
+    @brief 使用同步会话批量写入缓存数据
+    @param caches 缓存数据
+    @param chunk_size 每条INSERT语句的行数
+    @return 写入的数量
+    """
+    with SessionFactory() as session:
+        number: int = insert_caches(session, caches, chunk_size)
+        session.commit()
+
+    return number
+
+
+async def add_caches(caches: Iterable[CacheData], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """
+    @brief 批量写入缓存数据
+    @details 缓存行写入后不需要再读取，因此不创建ORM对象，直接使用多行INSERT语句
+    @param caches 缓存数据
+    @param chunk_size 每条INSERT语句的行数
+    @return 写入的数量
+    """
+    caches = list(caches)
+    if not caches:
+        return 0
+
+    engine = get_async_engine()
+    if engine is None:
+        return await to_thread(write_caches, caches, chunk_size)
+
+    async with engine.begin() as connection:
+        return await connection.run_sync(insert_caches, caches, chunk_size)
+
+
+async def add_details(details: Iterable[DetailData]) -> list[int]:
+    """
+    @brief 写入动画详情
+    @param details 动画详情数据
+    @return 新详情的主键ID列表，顺序与输入一致
+    """
+    return [detail.id for detail in await add_all(detail.to_orm() for detail in details)]
+
+
+async def add_scores(scores: Iterable[ScoreData]) -> int:
+    """
+    @brief 写入评分数据
+    @param scores 评分数据
+    @return 写入的数量
+    """
+    return len(await add_all(score.to_orm() for score in scores))
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,321 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file archive.py
+@brief 原始响应归档与离线重解析模块
+@details 将抓取到的响应以追加写入的方式保存到分段归档文件中（类似WARC），
+         并支持在不访问网络的情况下把归档重新送入爬虫的路由处理函数
+"""
+
+from typing import Iterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from struct import Struct
+from json import dumps, loads
+from gzip import compress as gzip_compress, decompress as gzip_decompress
+from uuid import uuid4
+from asyncio import run
+from logging import getLogger
+
+from httpx import Request, Response
+
+from frame.config import ArchiveConfig
+from frame.handle import Spider, MethodDict
+from database.session import dispose_async_engine
+from database.data import ARCHIVE_DATE, DEFAULT_TZ
+
+try:
+    from zstandard import ZstdCompressor, ZstdDecompressor
+except ImportError:
+    ZstdCompressor = ZstdDecompressor = None
+
+logger = getLogger(__name__)
+
+#: 记录头部结构：魔数、元数据长度、响应体长度
+RECORD_HEADER = Struct('>4sII')
+RECORD_MAGIC = b'ASRC'
+SEGMENT_SUFFIX = '.arc'
+
+#: 归档时丢弃的响应头，归档中保存的是已解码的响应体
+DROP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+def compress(data: bytes, method: str) -> bytes:
+    """
+    @brief 按指定方式压缩数据
+    @param data 原始数据
+    @param method 压缩方式，'gzip' 或 'zstd'
+    @return 压缩后的数据
+    @exception ValueError 压缩方式不受支持时抛出
+    @exception RuntimeError 未安装zstandard却使用zstd时抛出
+    """
+    if method == 'gzip':
+        return gzip_compress(data)
+
+    if method == 'zstd':
+        if ZstdCompressor is None:
+            raise RuntimeError('zstandard is not installed, zstd compression is unavailable')
+        return ZstdCompressor().compress(data)
+
+    raise ValueError(f'Unsupported compression: {method}')
+
+
+def decompress(data: bytes, method: str) -> bytes:
+    """
+    @brief 按指定方式解压数据
+    @param data 压缩后的数据
+    @param method 压缩方式，'gzip' 或 'zstd'
+    @return 解压后的数据
+    @exception ValueError 压缩方式不受支持时抛出
+    @exception RuntimeError 未安装zstandard却读取zstd记录时抛出
+    """
+    if method == 'gzip':
+        return gzip_decompress(data)
+
+    if method == 'zstd':
+        if ZstdDecompressor is None:
+            raise RuntimeError('zstandard is not installed, zstd record can not be read')
+        return ZstdDecompressor().decompress(data)
+
+    raise ValueError(f'Unsupported compression: {method}')
+
+
+@dataclass
+class Record(object):
+    """
+    @brief 归档记录数据类
+    @details 保存一次响应的URL、请求方法、状态码、响应头和响应体
+    """
+    #: 请求的URL
+    url: str
+    #: 请求方法
+    method: str = 'GET'
+    #: 响应状态码
+    status: int = 200
+    #: 响应头列表
+    headers: list[tuple[str, str]] = field(default_factory=list)
+    #: 已解码的响应体
+    body: bytes = b''
+    #: 抓取时间
+    date: str = ''
+
+    @classmethod
+    def from_response(cls, response: Response) -> 'Record':
+        """
+        @brief 从httpx响应创建归档记录
+        @param response 已读取响应体的HTTP响应对象
+        @return 归档记录
+        """
+        headers: list[tuple[str, str]] = [
+            (key, value) for key, value in response.headers.multi_items() if key.lower() not in DROP_HEADERS
+        ]
+
+        return cls(
+            url=str(response.url),
+            method=response.request.method,
+            status=response.status_code,
+            headers=headers,
+            body=response.content,
+            date=datetime.now(DEFAULT_TZ).isoformat(timespec='seconds')
+        )
+
+    def to_response(self) -> Response:
+        """
+        @brief 将归档记录还原为httpx响应
+        @details 抓取时间保存在 extensions['archive_date'] 中，处理函数以此作为评分日期
+        @return 带有对应请求对象的HTTP响应
+        """
+        request: Request = Request(self.method, self.url)
+        return Response(
+            self.status,
+            headers=self.headers,
+            content=self.body,
+            request=request,
+            extensions={ARCHIVE_DATE: self.date} if self.date else None
+        )
+
+
+class ArchiveWriter(object):
+    """
+    @brief 归档写入器
+    @details 以追加方式写入分段归档文件，单个分段超过配置大小后自动切换到新文件
+    """
+
+    def __init__(self, config: ArchiveConfig):
+        """
+        @brief 初始化归档写入器
+        @param config 归档配置对象
+        """
+        self.config: ArchiveConfig = config
+        # 提前检查压缩方式，避免在抓取过程中才发现配置错误
+        compress(b'', self.config.COMPRESSION)
+
+        self._path: Path = Path(self.config.PATH)
+        # 同一写入器的分段共享前缀并按序号递增，保证按文件名排序即为写入顺序
+        self._name: str = f'{self.config.PREFIX}-{datetime.now():%Y%m%d%H%M%S}-{uuid4().hex[:8]}'
+        self._sequence: int = 0
+        self._file = None
+        self._size: int = 0
+
+    def write(self, response: Response):
+        """
+        @brief 追加写入一条响应记录
+        @param response 已读取响应体的HTTP响应对象
+        """
+        record: Record = Record.from_response(response)
+
+        meta: bytes = dumps({
+            'url': record.url,
+            'method': record.method,
+            'status': record.status,
+            'headers': record.headers,
+            'compression': self.config.COMPRESSION,
+            'date': record.date,
+        }, ensure_ascii=False).encode('utf-8')
+        body: bytes = compress(record.body, self.config.COMPRESSION)
+
+        if self._file is None or self._size >= self.config.SEGMENT_SIZE:
+            self.rotate()
+
+        self._file.write(RECORD_HEADER.pack(RECORD_MAGIC, len(meta), len(body)))
+        self._file.write(meta)
+        self._file.write(body)
+        self._file.flush()
+
+        self._size += RECORD_HEADER.size + len(meta) + len(body)
+        logger.debug(f'{record.url} archived, {len(body)} bytes')
+
+    def rotate(self):
+        """
+        @brief 关闭当前分段并打开新的分段文件
+        """
+        self.close()
+
+        self._path.mkdir(parents=True, exist_ok=True)
+        name: str = f'{self._name}-{self._sequence:05d}{SEGMENT_SUFFIX}'
+        self._sequence += 1
+
+        self._file = (self._path / name).open('ab')
+        self._size = 0
+        logger.info(f'Open archive segment {name}')
+
+    def close(self):
+        """
+        @brief 关闭当前分段文件
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ArchiveReader(object):
+    """
+    @brief 归档读取器
+    @details 按文件名顺序流式读取一个分段文件或目录下的全部分段文件
+    """
+
+    def __init__(self, path: str):
+        """
+        @brief 初始化归档读取器
+        @param path 分段文件路径或归档目录
+        """
+        self._path: Path = Path(path)
+
+    def segments(self) -> list[Path]:
+        """
+        @brief 获取需要读取的分段文件列表
+        @return 按名称排序的分段文件路径列表
+        """
+        if self._path.is_file():
+            return [self._path]
+
+        return sorted(self._path.glob(f'*{SEGMENT_SUFFIX}'))
+
+    def __iter__(self) -> Iterator[Record]:
+        """
+        @brief 逐条读取归档记录
+        @return 归档记录迭代器
+        """
+        for segment in self.segments():
+            yield from self.read_segment(segment)
+
+    @staticmethod
+    def read_segment(segment: Path) -> Iterator[Record]:
+        """
+        @brief 读取单个分段文件中的全部记录
+        @details 遇到被截断的尾部记录（例如写入时进程退出）会记录警告并停止读取该分段
+        @param segment 分段文件路径
+        @return 归档记录迭代器
+        """
+        with segment.open('rb') as f:
+            while True:
+                head: bytes = f.read(RECORD_HEADER.size)
+                if not head:
+                    break
+
+                if len(head) < RECORD_HEADER.size:
+                    logger.warning(f'{segment.name} has a truncated record, stop reading')
+                    break
+
+                magic, meta_length, body_length = RECORD_HEADER.unpack(head)
+                if magic != RECORD_MAGIC:
+                    logger.error(f'{segment.name} is corrupted at offset {f.tell() - RECORD_HEADER.size}')
+                    break
+
+                meta_bytes: bytes = f.read(meta_length)
+                body: bytes = f.read(body_length)
+                if len(meta_bytes) < meta_length or len(body) < body_length:
+                    logger.warning(f'{segment.name} has a truncated record, stop reading')
+                    break
+
+                meta: dict = loads(meta_bytes)
+                yield Record(
+                    url=meta['url'],
+                    method=meta['method'],
+                    status=meta['status'],
+                    headers=[(key, value) for key, value in meta['headers']],
+                    body=decompress(body, meta['compression']),
+                    date=meta['date']
+                )
+
+
+def reparse(spider: Spider, path: str) -> tuple[int, int]:
+    """
+    @brief 离线重解析归档
+    @details 将归档中的响应依次送入爬虫的路由处理函数，不发起任何网络请求，
+             处理函数返回的新请求会被丢弃（归档中已包含后续页面的响应）
+    @param spider 爬虫实例
+    @param path 分段文件路径或归档目录
+    @return (处理成功数量, 处理失败数量)
+    """
+    methods: MethodDict = spider.construct()
+
+    async def replay() -> tuple[int, int]:
+        # 处理函数可能是协程函数，全部记录在同一个事件循环中处理
+        success: int = 0
+        failure: int = 0
+
+        for record in ArchiveReader(path):
+            response: Response = record.to_response()
+
+            try:
+                await methods.handle(response)
+            except Exception as e:
+                logger.error(f'Error occur when reparse {record.url}: {e}', exc_info=True)
+                failure += 1
+            else:
+                success += 1
+
+        await dispose_async_engine()
+        return success, failure
+
+    success, failure = run(replay())
+
+    logger.info(f'Reparse finished, {success} succeeded, {failure} failed')
+    return success, failure
+
+
+if __name__ == '__main__':
+    pass
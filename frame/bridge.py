@@ -127,6 +127,15 @@ class Client[T, S]:
             logger.warning(f'Queue has been shutdown', exc_info=True)
             return None
 
+    def task_done(self, msg, success: bool = True):
+        """
+        @brief 标记一个任务已处理完成
+        @details 内存队列不需要额外处理，供基于数据库的队列等实现覆盖
+        @param msg 已处理完成的任务（请求对象）
+        @param success 任务是否处理成功
+        """
+        pass
+
     def receive_is_empty(self) -> bool:
         """
         @brief 检查接收队列是否为空
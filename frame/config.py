@@ -26,6 +26,65 @@ class RequestConfig(object):
     # 最大延迟时间（秒），请求延迟的上限值
     MAX_DELAY: int = 60
 
+    # 是否启用HTTP/2多路复用（需要安装 httpx[http2]）
+    HTTP2: bool = False
+
+    # 连接池最大连接数
+    MAX_CONNECTIONS: int = 100
+
+    # 连接池最大保持连接数
+    MAX_KEEPALIVE_CONNECTIONS: int = 20
+
+    # 空闲连接保持时间（秒）
+    KEEPALIVE_EXPIRY: float = 5.0
+
+    # DNS解析缓存有效期（秒），为0时不缓存
+    DNS_CACHE_TTL: int = 0
+
+    # 启动时预先建立连接的主机列表
+    PREWARM_HOSTS: list[str] = field(default_factory=list)
+
+    # 是否以流式方式读取响应体，启用后可以在下载过程中提前终止过大的响应
+    STREAM: bool = False
+
+    # 流式读取的分块大小（字节）
+    CHUNK_SIZE: int = 64 * 1024
+
+    # 响应体最大字节数（按传输字节计算），为0时不限制，可以被路由级别的限制覆盖
+    MAX_BODY_SIZE: int = 0
+
+    # 允许的Content-Type列表，为空时不限制，可以被路由级别的限制覆盖
+    ALLOWED_CONTENT_TYPES: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ProxyConfig(object):
+    """代理池配置类，用于配置代理轮换和每个代理的请求频率"""
+
+    # 代理地址列表，例如 'http://127.0.0.1:8080'，为空时不使用代理
+    PROXIES: list[str] = field(default_factory=list)
+
+    # 同一代理两次请求之间的最小间隔（秒）
+    PROXY_DELAY: float = 0
+
+    # 同一代理访问同一主机的最小间隔（秒），启用代理后取代 DOWNLOAD_DELAY，为None时使用 DOWNLOAD_DELAY
+    HOST_DELAY: float | None = None
+
+    # 是否按主机保持代理粘性，同一主机的请求始终使用同一代理（代理被剔除时除外）
+    STICKY: bool = False
+
+    # 连续失败次数上限，达到后代理会被暂时剔除
+    MAX_FAILURE: int = 3
+
+    # 代理被剔除的时长（秒）
+    EJECT_TIME: int = 600
+
+    # 健康检查地址，为空时不进行健康检查
+    HEALTH_CHECK_URL: str = ''
+
+    # 健康检查间隔（秒）
+    HEALTH_CHECK_INTERVAL: int = 300
+
 
 @dataclass
 class HandleConfig(object):
@@ -41,16 +100,71 @@ class HandleConfig(object):
     INIT_URL_FUNCTION: Callable[[], Iterable[Request]] | None = None
 
 
+@dataclass
+class ArchiveConfig(object):
+    """归档配置类，用于配置原始响应归档相关参数"""
+
+    # 是否启用归档，启用后每个成功的响应都会追加写入归档文件
+    ENABLE: bool = False
+
+    # 归档文件保存目录
+    PATH: str = './archive'
+
+    # 归档文件名前缀，用于区分不同爬虫的归档
+    PREFIX: str = 'archive'
+
+    # 响应体压缩方式，可选 'gzip' 或 'zstd'（需要安装 zstandard）
+    COMPRESSION: str = 'gzip'
+
+    # 单个归档分段文件的最大字节数，超过后切换到新的分段文件
+    SEGMENT_SIZE: int = 64 * 1024 * 1024
+
+
+@dataclass
+class FrontierConfig(object):
+    """待抓取队列配置类，用于配置基于数据库的分布式待抓取队列"""
+
+    # 是否启用数据库队列，启用后多个进程可以共同完成同一个爬虫的任务
+    ENABLE: bool = False
+
+    # 爬虫名称，同一爬虫的所有工作节点必须一致
+    NAME: str = ''
+
+    # 数据库连接地址，为空时使用主数据库，也可以使用 'sqlite:///frontier.db' 作为本地替代
+    DB_URI: str = ''
+
+    # 请求租约时长（秒），超时未完成的请求会被其他节点重新租用
+    LEASE_TIME: int = 600
+
+    # 同一主机两次请求之间的最小间隔（秒），在所有工作节点之间共享，为None时使用 DOWNLOAD_DELAY
+    HOST_DELAY: float | None = None
+
+    # 没有可租用请求时的轮询间隔（秒）
+    POLL_INTERVAL: int = 5
+
+    # 请求去重的时间窗口（秒），窗口内相同的请求只会入队一次
+    DEDUPE_TIME: int = 12 * 3600
+
+
 @dataclass
 class Config(object):
     """主配置类，整合所有配置项"""
     
     # 请求配置实例
     REQUEST: RequestConfig = field(default_factory=RequestConfig)
+
+    # 代理池配置实例
+    PROXY: ProxyConfig = field(default_factory=ProxyConfig)
     
     # 处理器配置实例
     HANDLE: HandleConfig = field(default_factory=HandleConfig)
 
+    # 归档配置实例
+    ARCHIVE: ArchiveConfig = field(default_factory=ArchiveConfig)
+
+    # 待抓取队列配置实例
+    FRONTIER: FrontierConfig = field(default_factory=FrontierConfig)
+
 
 if __name__ == '__main__':
     pass
\ No newline at end of file
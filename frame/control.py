@@ -7,6 +7,7 @@
 @details 爬虫控制器模块，负责启动多个爬虫实例并等待它们完成
 """
 
+import sys
 from typing import Iterable, Sized
 from threading import Thread
 from asyncio import gather, run, sleep, create_task
@@ -16,8 +17,11 @@ from httpx import Request
 
 from frame.request import Requester
 from frame.bridge import Bridge
+from frame.frontier import FrontierStore, FrontierBridge
 from frame.handle import Spider, MethodDict, Handle
 from frame.counter import AsyncCounter
+from frame.extract import report
+from database.session import dispose_async_engine
 
 logger = getLogger(__name__)
 
@@ -36,9 +40,15 @@ class Manager(object):
         
         @param spider 爬虫实例
         """
-        self.bridge = Bridge()
-
         self.spider: Spider = spider
+
+        self.frontier: FrontierStore | None = None
+        if self.spider.config.FRONTIER.ENABLE:
+            self.frontier = FrontierStore(self.spider.config.FRONTIER, self.spider.config.REQUEST.DOWNLOAD_DELAY)
+            self.bridge = FrontierBridge(self.frontier, self.spider.config.FRONTIER)
+        else:
+            self.bridge = Bridge()
+
         methods: MethodDict = spider.construct()
 
         init_url_count: int = len(self.spider.config.HANDLE.INIT_URLS)
@@ -59,7 +69,7 @@ class Manager(object):
         self.counter = AsyncCounter(init_url_count)
 
         self.handle = Handle(self.bridge.A, self.spider.config, self.counter, methods)
-        self.request = Requester(self.bridge.B, self.spider.config, self.counter)
+        self.request = Requester(self.bridge.B, self.spider.config, self.counter, methods)
 
     def loop(self):
         """!
@@ -92,15 +102,38 @@ class Manager(object):
             handle_task = create_task(self.handle.loop())
             request_task = create_task(self.request.loop())
 
-            while await self.counter.value() != 0:
+            while not await self.finished():
                 await sleep(1)
 
             await self.bridge.stop()
 
             logger.debug('send stop signal, wait for tasks to complete')
             await gather(handle_task, request_task)
+
+            if self.frontier is not None:
+                logger.debug(f'clean {self.frontier.clean()} finished requests in frontier')
+
+            for module in sorted(self.spider.modules):
+                report(sys.modules[module])
         except Exception as e:
             logger.error(f'An error occurred: {e}', exc_info=True)
+        finally:
+            # 异步引擎的连接属于当前事件循环，需要在事件循环结束前关闭
+            await dispose_async_engine()
+
+    async def finished(self) -> bool:
+        """!
+        @brief 判断爬虫任务是否全部完成
+
+        使用数据库队列时以队列中未完成的请求数为准，否则以本地计数器为准
+
+        @return bool 全部完成返回True
+        """
+        if self.frontier is None:
+            return await self.counter.value() == 0
+
+        await sleep(self.spider.config.FRONTIER.POLL_INTERVAL)
+        return self.frontier.remaining() == 0
 
 
 class Control(object):
@@ -0,0 +1,185 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file extract.py
+@brief 声明式字段提取模块
+@details 以字段描述声明页面中需要提取的数据，XPath表达式在定义时一次性编译为 etree.XPath 对象，
+         解析页面时只执行已编译的表达式，并负责类型转换、默认值以及按字段统计提取耗时
+"""
+
+from types import ModuleType
+from typing import Any, Callable
+from dataclasses import dataclass
+from time import perf_counter
+from logging import getLogger
+
+from lxml import etree
+
+from database.data import CacheData
+
+logger = getLogger(__name__)
+
+
+def text(element) -> str | None:
+    """
+    @brief 获取元素去除首尾空白后的文本
+    @param element lxml元素
+    @return 元素文本，没有文本时返回None
+    """
+    return element.text.strip() if element.text is not None else None
+
+
+def strip(value: str) -> str:
+    """
+    @brief 去除字符串首尾空白
+    @param value 字符串
+    @return 处理后的字符串
+    """
+    return value.strip()
+
+
+@dataclass
+class Field(object):
+    """
+    @brief 字段描述
+    """
+    #: 字段名称，使用extract时对应CacheData的属性名
+    name: str
+    #: XPath表达式
+    path: str
+    #: 类型转换函数，many为True时作用于结果列表中的每一项
+    convert: Callable[[Any], Any] | None = None
+    #: 没有匹配结果时使用的默认值
+    default: Any = None
+    #: 是否保留全部匹配结果，为False时只取第一个
+    many: bool = False
+    #: 是否必须存在，为True时没有匹配结果会抛出ValueError
+    required: bool = False
+
+
+class Extractor(object):
+    """
+    @brief 字段提取器
+    @details 一个提取器对应一类页面，通常在模块级别创建，所有页面共用同一组已编译的表达式
+    """
+
+    def __init__(self, *fields: Field, **constants: Any):
+        """
+        @brief 初始化提取器并编译全部XPath表达式
+        @param fields 字段描述
+        @param constants 每次提取时直接写入结果的常量，例如 web=4
+        @exception etree.XPathSyntaxError 表达式语法错误时抛出
+        """
+        self.fields: tuple[Field, ...] = fields
+        self.constants: dict[str, Any] = constants
+
+        # 关闭smart_strings，返回的字符串不再引用整棵文档树
+        self._compiled: list[tuple[Field, etree.XPath]] = [
+            (field, etree.XPath(field.path, smart_strings=False)) for field in fields
+        ]
+
+        self._time: dict[str, float] = {field.name: 0.0 for field in fields}
+        self._count: int = 0
+
+    def evaluate(self, field: Field, xpath: etree.XPath, root) -> Any:
+        """
+        @brief 执行单个字段的表达式
+        @param field 字段描述
+        @param xpath 已编译的表达式
+        @param root 文档根节点或上下文元素
+        @return 转换后的字段值
+        @exception ValueError 必须存在的字段没有匹配结果时抛出
+        """
+        result = xpath(root)
+
+        if isinstance(result, list):
+            if field.many:
+                return [field.convert(i) for i in result] if field.convert else result
+            result = result[0] if result else None
+
+        if result is None:
+            if field.required:
+                raise ValueError(f'Field {field.name} not found: {field.path}')
+            return field.default
+
+        return field.convert(result) if field.convert else result
+
+    def values(self, root) -> dict[str, Any]:
+        """
+        @brief 提取全部字段
+        @param root 文档根节点或上下文元素
+        @return 以字段名称为键的字典
+        """
+        values: dict[str, Any] = {}
+        for field, xpath in self._compiled:
+            start: float = perf_counter()
+            values[field.name] = self.evaluate(field, xpath, root)
+            self._time[field.name] += perf_counter() - start
+
+        self._count += 1
+        return values
+
+    def extract(self, root, target: CacheData | None = None) -> CacheData:
+        """
+        @brief 提取全部字段并写入缓存数据对象
+        @param root 文档根节点或上下文元素
+        @param target 写入的缓存数据对象，为None时新建
+        @return 缓存数据对象
+        """
+        target = target if target is not None else CacheData()
+
+        for key, value in self.constants.items():
+            setattr(target, key, value)
+        for key, value in self.values(root).items():
+            setattr(target, key, value)
+
+        return target
+
+    def timing(self) -> dict[str, float]:
+        """
+        @brief 获取每个字段的平均提取耗时
+        @return 以字段名称为键，平均耗时（毫秒）为值的字典
+        """
+        if not self._count:
+            return {name: 0.0 for name in self._time}
+
+        return {name: total * 1000 / self._count for name, total in self._time.items()}
+
+    def reset(self):
+        """
+        @brief 清空耗时统计
+        """
+        self._time = {name: 0.0 for name in self._time}
+        self._count = 0
+
+    def report(self, label: str = 'extractor'):
+        """
+        @brief 以DEBUG级别记录每个字段的平均提取耗时
+        @param label 日志中提取器的名称
+        """
+        for name, cost in sorted(self.timing().items(), key=lambda i: i[1], reverse=True):
+            logger.debug(f'{label} field {name}: {cost:.3f} ms/page over {self._count} pages')
+
+
+def extractors(module: ModuleType) -> dict[str, Extractor]:
+    """
+    @brief 查找模块级别创建的提取器
+    @param module 爬虫模块
+    @return 以模块中的变量名为键的提取器字典
+    """
+    return {name: value for name, value in vars(module).items() if isinstance(value, Extractor)}
+
+
+def report(module: ModuleType):
+    """
+    @brief 记录模块中提取过页面的提取器的字段耗时
+    @param module 爬虫模块
+    """
+    for name, extractor in extractors(module).items():
+        if extractor._count:
+            extractor.report(f'{module.__name__}.{name}')
+
+
+if __name__ == '__main__':
+    pass
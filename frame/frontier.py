@@ -0,0 +1,365 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file frontier.py
+@brief 基于数据库的分布式待抓取队列模块
+@details 将待抓取的请求保存在共享数据表中，多个工作节点通过租约机制领取请求，
+         并通过主机表协调各主机的请求间隔，使多个容器可以共同完成同一个爬虫的任务
+"""
+
+from datetime import datetime, timedelta
+from hashlib import sha1
+from socket import gethostname
+from os import getpid
+from uuid import uuid4
+from asyncio import Queue, Event, sleep
+from logging import getLogger
+
+from httpx import Request
+from sqlalchemy import create_engine, update, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from frame.bridge import Client
+from frame.config import FrontierConfig
+from database.model import Frontier, FrontierHost, SessionFactory
+
+logger = getLogger(__name__)
+
+#: 每次租用时最多检查的候选请求数量
+LEASE_BATCH = 16
+
+
+class FrontierStore(object):
+    """
+    @brief 待抓取队列的数据库访问类
+    @details 负责请求的入队、租用、完成和统计，所有状态变更都使用带条件的UPDATE，
+             在MySQL下配合 FOR UPDATE SKIP LOCKED，在SQLite下依靠条件更新保证同一请求只被一个节点租用
+    """
+
+    def __init__(self, config: FrontierConfig, download_delay: float = 0):
+        """
+        @brief 初始化待抓取队列
+        @param config 待抓取队列配置对象
+        @param download_delay 爬虫的请求间隔，没有配置HOST_DELAY时作为所有工作节点访问同一主机的间隔
+        @exception ValueError 未配置爬虫名称时抛出
+        """
+        if not config.NAME:
+            raise ValueError('FRONTIER.NAME is required when frontier is enabled')
+
+        self.config: FrontierConfig = config
+        self.host_delay: float = config.HOST_DELAY if config.HOST_DELAY is not None else download_delay
+        self.worker: str = f'{gethostname()}-{getpid()}-{uuid4().hex[:6]}'
+
+        if self.config.DB_URI:
+            engine = create_engine(self.config.DB_URI, pool_pre_ping=True)
+            Frontier.metadata.create_all(engine, tables=[Frontier.__table__, FrontierHost.__table__])
+            self._session_factory: sessionmaker[Session] = sessionmaker(bind=engine, autoflush=False)
+        else:
+            self._session_factory: sessionmaker[Session] = SessionFactory
+
+    @staticmethod
+    def fingerprint(request: Request) -> str:
+        """
+        @brief 计算请求指纹
+        @param request HTTP请求对象
+        @return 请求方法和URL的SHA1摘要
+        """
+        return sha1(f'{request.method} {request.url}'.encode('utf-8')).hexdigest()
+
+    def push(self, request: Request) -> bool:
+        """
+        @brief 将请求加入队列
+        @details 去重时间窗口内已存在相同指纹的请求时不会重复入队，
+                 超出窗口的已完成请求会被重新置为待处理
+        @param request HTTP请求对象
+        @return 入队或已存在返回True
+        """
+        now: datetime = datetime.now()
+        fingerprint: str = self.fingerprint(request)
+
+        with self._session_factory() as session:
+            row: Frontier | None = session.query(Frontier).filter(
+                Frontier.spider == self.config.NAME,
+                Frontier.fingerprint == fingerprint
+            ).first()
+
+            if row is not None:
+                if row.state in ('pending', 'leased') or row.created >= now - timedelta(seconds=self.config.DEDUPE_TIME):
+                    logger.debug(f'{request.url} already in frontier, skipped')
+                    return True
+
+                row.state = 'pending'
+                row.worker = None
+                row.attempts = 0
+                row.leaseUntil = None
+                row.created = now
+                session.commit()
+                return True
+
+            session.add(Frontier(
+                spider=self.config.NAME,
+                fingerprint=fingerprint,
+                method=request.method,
+                url=str(request.url),
+                headers=dict(request.headers),
+                host=request.url.host,
+                state='pending',
+                attempts=0,
+                created=now
+            ))
+
+            try:
+                session.commit()
+            except IntegrityError:
+                # 其他节点同时写入了相同的请求
+                session.rollback()
+                logger.debug(f'{request.url} pushed by another worker')
+
+        return True
+
+    def lease(self) -> Request | None:
+        """
+        @brief 租用一个可执行的请求
+        @details 选择待处理或租约已过期的请求，且其主机已到达允许请求的时间
+        @return 租用成功返回带有frontier_id扩展的请求对象，否则返回None
+        """
+        now: datetime = datetime.now()
+
+        with self._session_factory() as session:
+            candidates: list[Frontier] = session.query(Frontier).filter(
+                Frontier.spider == self.config.NAME,
+                or_(
+                    Frontier.state == 'pending',
+                    and_(Frontier.state == 'leased', Frontier.leaseUntil < now)
+                )
+            ).order_by(Frontier.id).limit(LEASE_BATCH).with_for_update(skip_locked=True).all()
+
+            for row in candidates:
+                if not self.acquire_host(session, row.host, now):
+                    continue
+
+                result = session.execute(
+                    update(Frontier).where(
+                        Frontier.id == row.id,
+                        Frontier.state == row.state,
+                        Frontier.attempts == row.attempts
+                    ).values(
+                        state='leased',
+                        worker=self.worker,
+                        attempts=row.attempts + 1,
+                        leaseUntil=now + timedelta(seconds=self.config.LEASE_TIME)
+                    )
+                )
+
+                if result.rowcount != 1:
+                    session.rollback()
+                    continue
+
+                session.commit()
+                logger.debug(f'{self.worker} leased {row.url}')
+                return Request(row.method, row.url, headers=row.headers, extensions={'frontier_id': row.id})
+
+            session.commit()
+
+        return None
+
+    def acquire_host(self, session: Session, host: str, now: datetime) -> bool:
+        """
+        @brief 尝试占用主机的下一次请求时间
+        @param session 数据库会话对象
+        @param host 主机名
+        @param now 当前时间
+        @return 主机当前允许请求则返回True
+        """
+        next_time: datetime = now + timedelta(seconds=self.host_delay)
+
+        result = session.execute(
+            update(FrontierHost).where(
+                FrontierHost.host == host,
+                FrontierHost.nextTime <= now
+            ).values(nextTime=next_time)
+        )
+        if result.rowcount == 1:
+            return True
+
+        if session.get(FrontierHost, host) is not None:
+            return False
+
+        try:
+            with session.begin_nested():
+                session.add(FrontierHost(host=host, nextTime=next_time))
+        except IntegrityError:
+            logger.debug(f'{host} registered by another worker')
+            return False
+
+        return True
+
+    def complete(self, request: Request | None, success: bool):
+        """
+        @brief 标记请求已完成
+        @param request 租用得到的请求对象
+        @param success 请求是否处理成功
+        """
+        if request is None or 'frontier_id' not in request.extensions:
+            return
+
+        with self._session_factory() as session:
+            session.execute(
+                update(Frontier).where(
+                    Frontier.id == request.extensions['frontier_id'],
+                    Frontier.worker == self.worker
+                ).values(state='done' if success else 'failed', leaseUntil=None)
+            )
+            session.commit()
+
+    def remaining(self) -> int:
+        """
+        @brief 统计尚未完成的请求数量
+        @return 待处理和已租用的请求数量之和
+        """
+        with self._session_factory() as session:
+            return session.query(Frontier).filter(
+                Frontier.spider == self.config.NAME,
+                Frontier.state.in_(['pending', 'leased'])
+            ).count()
+
+    def clean(self) -> int:
+        """
+        @brief 清理超出去重窗口的已完成请求
+        @return 删除的记录数量
+        """
+        expired: datetime = datetime.now() - timedelta(seconds=self.config.DEDUPE_TIME)
+
+        with self._session_factory() as session:
+            number: int = session.query(Frontier).filter(
+                Frontier.spider == self.config.NAME,
+                Frontier.state.in_(['done', 'failed']),
+                Frontier.created < expired
+            ).delete(synchronize_session=False)
+            session.commit()
+
+        return number
+
+
+class HandleClient(Client):
+    """
+    @brief 处理端通信客户端
+    @details 新请求写入数据库队列，响应仍然通过进程内队列接收
+    """
+
+    def __init__(self, store: FrontierStore, receive_channel: Queue):
+        """
+        @brief 初始化处理端客户端
+        @param store 待抓取队列
+        @param receive_channel 接收响应的进程内队列
+        """
+        super().__init__(Queue(), receive_channel)
+        self._store: FrontierStore = store
+
+    def put_nowait(self, msg: Request) -> bool:
+        """
+        @brief 将请求写入数据库队列
+        @param msg 要发送的请求
+        @return 写入成功返回True
+        """
+        return self._store.push(msg)
+
+    async def put(self, msg: Request) -> bool:
+        """
+        @brief 将请求写入数据库队列
+        @param msg 要发送的请求
+        @return 写入成功返回True
+        """
+        return self._store.push(msg)
+
+    def task_done(self, msg: Request, success: bool = True):
+        """
+        @brief 响应处理完成后标记请求的处理结果
+        @param msg 已处理完成的请求
+        @param success 处理函数是否成功完成
+        """
+        self._store.complete(msg, success)
+
+
+class RequesterClient(Client):
+    """
+    @brief 请求端通信客户端
+    @details 从数据库队列租用请求，响应通过进程内队列发送给处理端
+    """
+
+    def __init__(self, store: FrontierStore, send_channel: Queue, config: FrontierConfig):
+        """
+        @brief 初始化请求端客户端
+        @param store 待抓取队列
+        @param send_channel 发送响应的进程内队列
+        @param config 待抓取队列配置对象
+        """
+        super().__init__(send_channel, Queue())
+        self._store: FrontierStore = store
+        self._config: FrontierConfig = config
+        self.stopped: Event = Event()
+
+    def get_nowait(self) -> Request | None:
+        """
+        @brief 立即尝试租用一个请求
+        @return 租用成功返回请求对象，否则返回None
+        """
+        if self.stopped.is_set():
+            return None
+
+        return self._store.lease()
+
+    async def get(self) -> Request | None:
+        """
+        @brief 等待并租用一个请求
+        @details 没有可租用的请求时按配置的间隔轮询，收到停止信号后返回None
+        @return 租用到的请求对象，停止时返回None
+        """
+        while not self.stopped.is_set():
+            request: Request | None = self._store.lease()
+            if request is not None:
+                return request
+
+            await sleep(self._config.POLL_INTERVAL)
+
+        return None
+
+    def task_done(self, msg: Request, success: bool = False):
+        """
+        @brief 请求达到最大重试次数或被拒绝后标记失败
+        @param msg 失败的请求
+        @param success 请求端只在请求失败时调用，默认为失败
+        """
+        self._store.complete(msg, success)
+
+
+class FrontierBridge(object):
+    """
+    @brief 基于数据库队列的桥接类
+    @details 与Bridge提供相同的A、B客户端和stop接口，A为处理端，B为请求端
+    """
+
+    def __init__(self, store: FrontierStore, config: FrontierConfig):
+        """
+        @brief 初始化桥接对象
+        @param store 待抓取队列
+        @param config 待抓取队列配置对象
+        """
+        self._channel_B_to_A: Queue = Queue()
+
+        self.A = HandleClient(store, self._channel_B_to_A)
+        self.B = RequesterClient(store, self._channel_B_to_A, config)
+
+    async def stop(self):
+        """
+        @brief 停止桥接通信
+        @details 通知请求端停止租用，并向处理端发送停止信号(None)
+        """
+        self.B.stopped.set()
+        await self._channel_B_to_A.put(None)
+
+
+if __name__ == '__main__':
+    pass
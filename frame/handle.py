@@ -7,12 +7,13 @@
 @details 该模块包含处理HTTP响应、路由匹配、请求生成等功能，是爬虫框架的核心组件之一
 """
 
-from typing import Callable, Iterable
+from typing import Awaitable, Callable, Iterable
+from inspect import isawaitable
 from dataclasses import dataclass, field
 from re import compile, Pattern
 from logging import getLogger
 
-from httpx import Request, Response
+from httpx import Request, Response, URL
 
 from frame.config import Config, HandleConfig
 from frame.bridge import Client
@@ -21,6 +22,18 @@ from frame.counter import AsyncCounter
 logger = getLogger(__name__)
 
 
+@dataclass
+class RouteLimit(object):
+    """
+    @brief 路由级别的响应限制
+    @details 用于在读取响应体之前或读取过程中拒绝过大或类型不符合预期的响应
+    """
+    #: 响应体最大字节数，为None时使用全局配置
+    max_size: int | None = None
+    #: 允许的Content-Type列表（不含参数部分），为None时使用全局配置
+    content_types: tuple[str, ...] | None = None
+
+
 @dataclass
 class Methods(object):
     """
@@ -31,6 +44,8 @@ class Methods(object):
     FIX: dict[str, Callable[[Response], Request | Iterable[Request] | None]] = field(default_factory=dict)
     #: 正则表达式路由映射，键为正则表达式模式，值为处理函数
     REGEX: dict[str, Callable[[Response], Request | Iterable[Request] | None]] = field(default_factory=dict)
+    #: 路由响应限制映射，键为URL路径或正则表达式模式，值为限制条件
+    LIMIT: dict[str, RouteLimit] = field(default_factory=dict)
 
 
 class MethodDict(object):
@@ -49,7 +64,33 @@ class MethodDict(object):
         for regex, func in methods.REGEX.items():
             self._regex_path.append((compile(regex), func))
 
-    def handle(self, response: Response) -> list[Request]:
+        self._fix_limit: dict[str, RouteLimit] = {url: methods.LIMIT[url] for url in methods.FIX if url in methods.LIMIT}
+        self._regex_limit: list[tuple[Pattern, RouteLimit]] = [
+            (compile(regex), methods.LIMIT[regex]) for regex in methods.REGEX if regex in methods.LIMIT
+        ]
+
+    def limit(self, url: URL) -> RouteLimit | None:
+        """
+        @brief 获取URL对应路由的响应限制
+        @param url 请求的URL
+        @return 路由设置了限制时返回RouteLimit，否则返回None
+        """
+        path: str = f'{url.host}{url.path}'
+
+        if path in self._fix_limit:
+            return self._fix_limit[path]
+
+        # 固定路径优先于正则表达式，与handle的匹配顺序一致
+        if path in self._fix_path:
+            return None
+
+        for regex, limit in self._regex_limit:
+            if regex.match(path):
+                return limit
+
+        return None
+
+    async def handle(self, response: Response) -> list[Request]:
         """
         @brief 根据响应的URL匹配处理方法并执行
         @param response HTTP响应对象
@@ -60,26 +101,29 @@ class MethodDict(object):
         if url in self._fix_path.keys():
             method = self._fix_path[url]
             logger.debug(f'{url} match fix path: {url}, handle with {method.__name__}')
-            return self.handle_method(response, method)
+            return await self.handle_method(response, method)
 
         for regex, method in self._regex_path:
             if regex.match(url):
                 logger.debug(f'{url} match regex: {regex}, handle with {method.__name__}')
-                return self.handle_method(response, method)
+                return await self.handle_method(response, method)
 
         logger.warning(f'{url} not match any route, dropped')
         return []
 
     @staticmethod
-    def handle_method(response: Response, method: Callable[[Response], Request | Iterable[Request] | None]) -> list[Request]:
+    async def handle_method(response: Response, method: Callable[[Response], Request | Iterable[Request] | None | Awaitable]) -> list[Request]:
         """
         @brief 执行具体的处理方法并规范化返回结果
+        @details 处理函数可以是协程函数，例如需要等待数据库写入的处理函数，其结果会在当前事件循环中等待
         @param response HTTP响应对象
         @param method 处理函数
         @return 标准化后的请求列表
         @exception TypeError 当处理函数返回不支持的类型时抛出
         """
         result: Request | Iterable[Request] | None = method(response)
+        if isawaitable(result):
+            result = await result
 
         if result is None:
             return []
@@ -106,12 +150,16 @@ class Spider(object):
         """
         self._methods: Methods = Methods()
         self.config: Config = Config()
+        # 注册过处理函数的模块，爬虫结束时从中查找提取器
+        self.modules: set[str] = set()
 
-    def route(self, url: str, regex: bool = False):
+    def route(self, url: str, regex: bool = False, max_size: int | None = None, content_types: Iterable[str] | None = None):
         """
         @brief 路由装饰器，用于注册URL处理函数
         @param url URL路径或正则表达式
         @param regex 是否使用正则表达式匹配，默认为False
+        @param max_size 该路由响应体的最大字节数，为None时使用全局配置
+        @param content_types 该路由允许的Content-Type列表，为None时使用全局配置
         @return 装饰器函数
         """
         def decorator(func: Callable[[Response], Request | Iterable[Request] | None]):
@@ -120,10 +168,17 @@ class Spider(object):
             @param func 处理函数
             @return 原始处理函数
             """
+            self.modules.add(func.__module__)
             if regex:
                 self._methods.REGEX[url] = func
             else:
                 self._methods.FIX[url] = func
+
+            if max_size is not None or content_types is not None:
+                self._methods.LIMIT[url] = RouteLimit(
+                    max_size,
+                    tuple(i.lower() for i in content_types) if content_types is not None else None
+                )
             return func
 
         return decorator
@@ -197,7 +252,7 @@ class Handle(object):
                 break
 
             logger.debug(f'handle response: {response.url}')
-            requests: list[Request] = self.handle_response(response)
+            requests, success = await self.handle_response(response)
 
             logger.debug(f'add requests: {requests}')
             await self.handle_number(requests)
@@ -205,21 +260,24 @@ class Handle(object):
             for request in requests:
                 self._channel.put_nowait(request)
 
+            # 新请求写入队列之后才标记完成，否则其他节点可能在这之间看到队列为空而提前结束
+            self._channel.task_done(response.request, success)
+
 
-    def handle_response(self, response: Response) -> list[Request]:
+    async def handle_response(self, response: Response) -> tuple[list[Request], bool]:
         """
         @brief 处理单个响应
         @param response HTTP响应对象
-        @return 生成的请求列表
+        @return 生成的请求列表和处理函数是否成功完成
         """
         try:
-            requests: list[Request] = self._methods.handle(response)
+            requests: list[Request] = await self._methods.handle(response)
         except Exception as e:
             logger.error(f'Error occur when handle response {response.url}: {e}', exc_info=True)
         else:
-            return requests
+            return requests, True
 
-        return []
+        return [], False
 
     async def handle_number(self, requests: list[Request]):
         """
@@ -0,0 +1,205 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file parse.py
+@brief HTML解析模块
+@details 直接把响应的字节交给lxml解析，避免先将整个响应体解码为字符串；
+         对于只需要少数几个容器的大页面，可以只截取这些容器对应的字节片段拼成一个小文档再解析，
+         减少建树的开销。找不到任何一个片段，或者片段中缺少预期的内容时退回解析完整页面，保证结果正确
+"""
+
+from typing import Sequence
+from dataclasses import dataclass
+from threading import local
+from re import compile, Pattern, IGNORECASE, DOTALL
+from logging import getLogger
+
+from httpx import Response
+from lxml import etree
+
+logger = getLogger(__name__)
+
+META_CHARSET_PATTERN = compile(rb'<meta[^>]+charset=["\']?([\w-]+)', IGNORECASE)
+
+#: 没有结束标签的元素
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'
+))
+
+#: 每个线程按编码缓存的解析器，lxml的解析器不能在线程间共享
+_parsers = local()
+
+#: 按标签名缓存的配对表达式
+_tag_patterns: dict[str, Pattern] = {}
+#: 按表达式文本缓存的已编译的预期内容表达式
+_expect_xpaths: dict[str, etree.XPath] = {}
+
+
+@dataclass(frozen=True)
+class Fragment(object):
+    """
+    @brief 页面片段描述
+    @details 片段从第一个带有指定特征的指定元素开始，到该元素对应的结束标签为止
+    """
+    #: 元素标签名，例如 div
+    tag: str
+    #: 元素开始标签中必须包含的文本，例如 class="leftside"
+    marker: str
+    #: 片段解析后必须能匹配到结果的XPath表达式，通常指向容器末尾的内容，用于发现被提前截断的片段
+    expect: str | None = None
+
+
+def get_parser(encoding: str) -> etree.HTMLParser:
+    """
+    @brief 获取当前线程中指定编码的解析器
+    @param encoding 文档编码
+    @return HTML解析器
+    """
+    parsers: dict[str, etree.HTMLParser] | None = getattr(_parsers, 'parsers', None)
+    if parsers is None:
+        parsers = _parsers.parsers = {}
+
+    if encoding not in parsers:
+        parsers[encoding] = etree.HTMLParser(encoding=encoding)
+
+    return parsers[encoding]
+
+
+def detect_encoding(response: Response) -> str:
+    """
+    @brief 获取响应的编码
+    @details 优先使用Content-Type中的charset，其次使用页面开头meta标签中的charset，
+             都没有时与httpx的默认行为一致，使用utf-8
+    @param response 响应对象
+    @return 编码名称
+    """
+    if response.charset_encoding:
+        return response.charset_encoding
+
+    match = META_CHARSET_PATTERN.search(response.content, 0, 2048)
+    return match.group(1).decode('ascii') if match else 'utf-8'
+
+
+def tag_pattern(tag: str) -> Pattern:
+    """
+    @brief 获取查找同名开闭标签的表达式
+    @details 注释以及script、style元素作为整体匹配，其中的同名标签不参与配对
+    @param tag 元素标签名
+    @return 编译后的表达式，第2组为 / 时是结束标签，为空时是开始标签，为None时是需要跳过的内容
+    """
+    if tag not in _tag_patterns:
+        _tag_patterns[tag] = compile(
+            rb'<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(/?)' + tag.encode('ascii') + rb'[\s>/]',
+            IGNORECASE | DOTALL
+        )
+
+    return _tag_patterns[tag]
+
+
+def element_end(content: bytes, start: int, tag: str) -> int:
+    """
+    @brief 查找元素结束的位置
+    @details 从开始标签起按同名标签的开闭数量配对，跳过注释和脚本，找不到结束标签时返回文档末尾
+    @param content 页面字节
+    @param start 开始标签的位置
+    @param tag 元素标签名
+    @return 结束标签之后的位置
+    """
+    position: int = content.find(b'>', start) + 1
+    if not position or tag in VOID_ELEMENTS:
+        return position if position else len(content)
+
+    depth: int = 1
+    for match in tag_pattern(tag).finditer(content, position):
+        closing: bytes | None = match.group(2)
+        if closing is None:
+            continue
+
+        if not closing:
+            depth += 1
+            continue
+
+        depth -= 1
+        if not depth:
+            return content.find(b'>', match.end() - 1) + 1 or len(content)
+
+    return len(content)
+
+
+def find_fragment(content: bytes, fragment: Fragment) -> tuple[int, int] | None:
+    """
+    @brief 查找片段在页面中的字节范围
+    @param content 页面字节
+    @param fragment 片段描述
+    @return (开始位置, 结束位置)，找不到时返回None
+    """
+    marker: bytes = fragment.marker.encode('utf-8')
+    open_tag: bytes = b'<' + fragment.tag.encode('ascii')
+
+    position: int = content.find(marker)
+    while position >= 0:
+        start: int = content.rfind(b'<', 0, position)
+        if start >= 0 and content.startswith(open_tag, start) and content.find(b'>', start, position) < 0:
+            return start, element_end(content, start, fragment.tag)
+
+        position = content.find(marker, position + len(marker))
+
+    return None
+
+
+def expect_xpath(path: str) -> etree.XPath:
+    """
+    @brief 获取编译后的预期内容表达式
+    @param path XPath表达式
+    @return 已编译的表达式
+    """
+    if path not in _expect_xpaths:
+        _expect_xpaths[path] = etree.XPath(path)
+
+    return _expect_xpaths[path]
+
+
+def parse_html(response: Response, fragments: Sequence[Fragment] | None = None):
+    """
+    @brief 解析HTML响应
+    @details 指定片段时只解析这些片段，片段按在页面中的顺序放入同一个body中，
+             因此以 // 开头的XPath表达式仍然可以使用；片段缺少预期内容时解析完整页面
+    @param response 响应对象
+    @param fragments 需要解析的片段，为None时解析完整页面
+    @return 文档根节点
+    """
+    content: bytes = response.content
+    encoding: str = detect_encoding(response)
+
+    if fragments:
+        ranges: list[tuple[int, int]] = []
+        for fragment in fragments:
+            found: tuple[int, int] | None = find_fragment(content, fragment)
+            if found is None:
+                logger.debug(f'fragment {fragment} not found in {response.url}, parse the whole page')
+                break
+            ranges.append(found)
+        else:
+            # 嵌套在其他片段中的片段已经包含在外层片段里，不再重复截取
+            parts: list[bytes] = []
+            last: int = 0
+            for start, end in sorted(ranges):
+                if start >= last:
+                    parts.append(content[start:end])
+                    last = end
+            root = etree.HTML(b'<html><body>' + b''.join(parts) + b'</body></html>', parser=get_parser(encoding))
+
+            # 属性值等位置中的同名标签会使片段提前结束，缺少预期内容时说明片段被截断
+            for fragment in fragments:
+                if fragment.expect is not None and not expect_xpath(fragment.expect)(root):
+                    logger.debug(f'fragment {fragment} truncated in {response.url}, parse the whole page')
+                    break
+            else:
+                return root
+
+    return etree.HTML(content, parser=get_parser(encoding))
+
+
+if __name__ == '__main__':
+    pass
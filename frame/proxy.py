@@ -0,0 +1,152 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file proxy.py
+@brief 代理池模块
+@details 管理多个出口代理，按代理和主机分别控制请求频率，剔除连续失败的代理，
+         并支持按主机或会话保持代理粘性，使吞吐量可以随出口IP数量扩展
+"""
+
+from dataclasses import dataclass, field
+from time import monotonic
+from asyncio import sleep
+from logging import getLogger
+
+from frame.config import ProxyConfig
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class Proxy(object):
+    """
+    @brief 单个代理的状态
+    """
+    #: 代理地址
+    url: str
+    #: 连续失败次数
+    failures: int = 0
+    #: 剔除截止时间（monotonic时间），为0表示未被剔除
+    ejected_until: float = 0
+    #: 最近一次使用时间
+    last_used: float = 0
+    #: 每个主机最近一次使用时间
+    host_last_used: dict[str, float] = field(default_factory=dict)
+
+    def available(self, now: float) -> bool:
+        """
+        @brief 判断代理当前是否可用
+        @param now 当前monotonic时间
+        @return 未被剔除返回True
+        """
+        return self.ejected_until <= now
+
+
+class ProxyPool(object):
+    """
+    @brief 代理池
+    @details 为每个请求挑选最早可用的代理，同一代理的请求间隔和同一代理对同一主机的请求间隔分别受限
+    """
+
+    def __init__(self, config: ProxyConfig, download_delay: float = 0):
+        """
+        @brief 初始化代理池
+        @param config 代理池配置对象
+        @param download_delay 爬虫的请求间隔，没有配置HOST_DELAY时作为同一代理访问同一主机的间隔，不会比不使用代理时更频繁
+        """
+        self.config: ProxyConfig = config
+        self.host_delay: float = config.HOST_DELAY if config.HOST_DELAY is not None else download_delay
+        self.proxies: list[Proxy] = [Proxy(url) for url in self.config.PROXIES]
+        self._sticky: dict[str, Proxy] = {}
+
+    def ready_time(self, proxy: Proxy, host: str) -> float:
+        """
+        @brief 计算代理可以再次访问指定主机的时间
+        @param proxy 代理状态
+        @param host 主机名
+        @return monotonic时间
+        """
+        return max(
+            proxy.last_used + self.config.PROXY_DELAY,
+            proxy.host_last_used.get(host, 0) + self.host_delay
+        )
+
+    async def acquire(self, host: str, session: str | None = None) -> Proxy:
+        """
+        @brief 获取一个可以访问指定主机的代理
+        @details 如果所有代理都在冷却中则等待最早可用的代理，全部被剔除时等待最早恢复的代理
+        @param host 请求的主机名
+        @param session 粘性会话键，相同的键优先使用同一代理；为None且启用STICKY时使用主机名
+        @return 选中的代理
+        """
+        key: str | None = session if session is not None else (host if self.config.STICKY else None)
+
+        while True:
+            now: float = monotonic()
+            candidates: list[Proxy] = [proxy for proxy in self.proxies if proxy.available(now)]
+
+            if not candidates:
+                wait: float = min(proxy.ejected_until for proxy in self.proxies) - now
+                logger.warning(f'All proxies are ejected, wait {wait:.1f} seconds')
+                await sleep(wait)
+                continue
+
+            if key is not None and key in self._sticky and self._sticky[key] in candidates:
+                candidates = [self._sticky[key]]
+
+            proxy: Proxy = min(candidates, key=lambda i: self.ready_time(i, host))
+            ready: float = self.ready_time(proxy, host)
+
+            if ready > now:
+                await sleep(ready - now)
+                continue
+
+            proxy.last_used = now
+            proxy.host_last_used[host] = now
+            if key is not None:
+                self._sticky[key] = proxy
+
+            return proxy
+
+    def report(self, proxy: Proxy, success: bool):
+        """
+        @brief 报告代理的请求结果
+        @details 连续失败达到上限后将代理剔除一段时间
+        @param proxy 代理状态
+        @param success 请求是否成功
+        """
+        if success:
+            proxy.failures = 0
+            return
+
+        proxy.failures += 1
+        if proxy.failures >= self.config.MAX_FAILURE:
+            self.eject(proxy)
+
+    def eject(self, proxy: Proxy):
+        """
+        @brief 剔除代理
+        @param proxy 代理状态
+        """
+        proxy.ejected_until = monotonic() + self.config.EJECT_TIME
+        proxy.failures = 0
+        for key in [key for key, value in self._sticky.items() if value is proxy]:
+            del self._sticky[key]
+
+        logger.warning(f'Proxy {proxy.url} ejected for {self.config.EJECT_TIME} seconds')
+
+    def restore(self, proxy: Proxy):
+        """
+        @brief 恢复被剔除的代理
+        @param proxy 代理状态
+        """
+        if proxy.ejected_until:
+            logger.info(f'Proxy {proxy.url} restored')
+
+        proxy.ejected_until = 0
+        proxy.failures = 0
+
+
+if __name__ == '__main__':
+    pass
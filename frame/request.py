@@ -8,16 +8,32 @@
 """
 
 from logging import getLogger
-from asyncio import sleep
+from asyncio import sleep, create_task, CancelledError
+from contextlib import AsyncExitStack
 
-from httpx import Request, Response, AsyncClient, HTTPError
+from httpx import Request, Response, AsyncClient, URL, HTTPError
 
 from frame.bridge import Client, QUEUE_MAX_WAIT_TIME
 from frame.config import Config, RequestConfig
+from frame.archive import ArchiveWriter
+from frame.proxy import Proxy, ProxyPool
+from frame.transport import create_client, prewarm
 from frame.counter import AsyncCounter
+from frame.handle import MethodDict, RouteLimit
 
 logger = getLogger(__name__)
 
+#: 视为代理被限制或代理自身故障的状态码，计入代理失败次数
+PROXY_FAILURE_STATUS = (403, 407, 429, 502, 504)
+
+
+class ResponseRejected(Exception):
+    """
+    @brief 响应类型或大小不符合限制，被主动丢弃
+    @details 与网络错误不同，重试不会得到不同的结果，因此不再重试
+    """
+    pass
+
 
 class Requester(object):
     """
@@ -26,16 +42,25 @@ class Requester(object):
     该类封装了异步HTTP请求的处理逻辑，包括请求重试、错误处理和响应处理等功能
     """
     
-    def __init__(self, client: Client[Response | None, Request | None], config: Config, counter: AsyncCounter):
+    def __init__(self, client: Client[Response | None, Request | None], config: Config, counter: AsyncCounter,
+                 methods: MethodDict | None = None):
         """
         @brief 初始化Requester实例
         
         @param client 用于获取请求和发送响应的客户端通道
         @param config 包含请求相关配置的配置对象
+        @param counter 异步计数器
+        @param methods 方法字典对象，用于查询路由级别的响应限制
         """
         self.config: RequestConfig = config.REQUEST
         self._channel: Client[Response | None, Request | None] = client
         self._counter: AsyncCounter = counter
+        self._methods: MethodDict | None = methods
+
+        self._archive: ArchiveWriter | None = ArchiveWriter(config.ARCHIVE) if config.ARCHIVE.ENABLE else None
+
+        self._proxy_pool: ProxyPool | None = ProxyPool(config.PROXY, self.config.DOWNLOAD_DELAY) if config.PROXY.PROXIES else None
+        self._proxy_clients: dict[str, AsyncClient] = {}
 
         if self.config.DOWNLOAD_DELAY * 5 > QUEUE_MAX_WAIT_TIME:
             logger.warning(f'{QUEUE_MAX_WAIT_TIME = } is too short, it may cause the handle coroutine stop automatically')
@@ -50,7 +75,20 @@ class Requester(object):
         user_agent: dict[str, str] = self.config.DEFAULT_REQUEST_HEADERS
         user_agent['user-agent'] = self.config.USER_AGENT
 
-        async with AsyncClient(headers=user_agent, timeout=self.config.MAX_DELAY, follow_redirects=True) as client:
+        async with AsyncExitStack() as stack:
+            client: AsyncClient = await stack.enter_async_context(self.create_client(user_agent))
+
+            if self._proxy_pool is not None:
+                for proxy in self._proxy_pool.proxies:
+                    self._proxy_clients[proxy.url] = await stack.enter_async_context(self.create_client(user_agent, proxy.url))
+
+                if self._proxy_pool.config.HEALTH_CHECK_URL:
+                    health_task = create_task(self.health_check())
+                    stack.callback(health_task.cancel)
+
+            if self.config.PREWARM_HOSTS:
+                await prewarm(client, self.config.PREWARM_HOSTS)
+
             while True:
                 request: Request | None = await self._channel.get()
 
@@ -59,11 +97,45 @@ class Requester(object):
                     break
 
                 logger.debug(f'requesting {request.url} ...')
-                response: Response | None = await self.handle_request(request, client)
-                await  self.handle_response(response, request.url)
+                try:
+                    response: Response | None = await self.handle_request(request, client)
+                except ResponseRejected as e:
+                    logger.warning(f'{request.url} rejected: {e}')
+                    await self._counter.decrement()
+                    self._channel.task_done(request)
+                else:
+                    self.handle_archive(response)
+                    await  self.handle_response(response, request.url)
 
-                logger.debug(f'sleeping for {self.config.DOWNLOAD_DELAY} seconds...')
-                await sleep(self.config.DOWNLOAD_DELAY)
+                    if response is None:
+                        self._channel.task_done(request)
+
+                # 使用代理池时由代理池控制每个代理访问每个主机的间隔
+                if self._proxy_pool is None:
+                    logger.debug(f'sleeping for {self.config.DOWNLOAD_DELAY} seconds...')
+                    await sleep(self.config.DOWNLOAD_DELAY)
+
+        if self._archive is not None:
+            self._archive.close()
+
+    def create_client(self, headers: dict[str, str], proxy: str | None = None) -> AsyncClient:
+        """
+        @brief 按配置创建异步HTTP客户端
+
+        @param headers 默认请求头
+        @param proxy 代理地址，为None时直连
+        @return AsyncClient 异步HTTP客户端
+        """
+        return create_client(
+            headers,
+            self.config.MAX_DELAY,
+            http2=self.config.HTTP2,
+            max_connections=self.config.MAX_CONNECTIONS,
+            max_keepalive_connections=self.config.MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=self.config.KEEPALIVE_EXPIRY,
+            dns_cache_ttl=self.config.DNS_CACHE_TTL,
+            proxy=proxy
+        )
 
     async def handle_request(self, request: Request, client: AsyncClient) -> Response | None:
         """
@@ -72,6 +144,7 @@ class Requester(object):
         @param request 需要发送的HTTP请求对象
         @param client 用于发送请求的异步HTTP客户端
         @return Response|None 成功时返回响应对象，失败时返回None
+        @exception ResponseRejected 响应类型或大小不符合限制时抛出，不会重试
         """
         for key, value in self.config.DEFAULT_REQUEST_HEADERS.items():
             if key in request.headers:
@@ -80,17 +153,158 @@ class Requester(object):
             request.headers[key] = value
 
         for i in range(self.config.MAX_RETRY):
+            response: Response | None = None
             try:
-                response: Response = await client.send(request)
+                response = await self.send(request, client)
                 response.raise_for_status()
+                # 流式模式下在这里读取响应体，读取失败与请求失败一样重试
+                return await self.check_body(response)
             except HTTPError as e:
                 logger.warning(f'{request.url} failed because of {e}, retrying...')
                 await sleep(self.config.DOWNLOAD_DELAY)
-            else:
-                return  response
+            finally:
+                if response is not None:
+                    await response.aclose()
 
         return None
 
+    async def check_body(self, response: Response) -> Response:
+        """
+        @brief 检查响应类型和大小，流式模式下同时读取响应体
+
+        类型不在允许列表中或响应体超过大小上限的响应会被丢弃且不再重试。
+        流式模式下会在读取响应体之前检查响应头，并在累计字节数超过上限时立即中止下载，
+        处理函数可以通过 response.iter_bytes() 分块消费返回的响应体
+
+        @param response 已通过状态检查的响应对象
+        @return Response 通过检查的响应对象
+        @exception ResponseRejected 响应被拒绝时抛出
+        """
+        max_size, content_types = self.response_limit(response.request.url)
+        content_type: str = response.headers.get('content-type', '').split(';')[0].strip().lower()
+
+        if content_types and content_type not in content_types:
+            await response.aclose()
+            raise ResponseRejected(f'content type {content_type!r} is not allowed')
+
+        if not self.config.STREAM:
+            if max_size and len(response.content) > max_size:
+                raise ResponseRejected(f'body is larger than {max_size} bytes')
+
+            return response
+
+        length: str | None = response.headers.get('content-length')
+        if max_size and length and length.isdigit() and int(length) > max_size:
+            await response.aclose()
+            raise ResponseRejected(f'declares {length} bytes, larger than {max_size}')
+
+        chunks: list[bytes] = []
+        size: int = 0
+        try:
+            async for chunk in response.aiter_raw(self.config.CHUNK_SIZE):
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise ResponseRejected(f'body exceeds {max_size} bytes')
+
+                chunks.append(chunk)
+        finally:
+            await response.aclose()
+
+        # 使用原始字节和原始响应头重建响应，由httpx按Content-Encoding解码
+        return Response(
+            response.status_code,
+            headers=response.headers,
+            content=b''.join(chunks),
+            request=response.request,
+            extensions=response.extensions
+        )
+
+    def response_limit(self, url: URL) -> tuple[int, tuple[str, ...]]:
+        """
+        @brief 获取URL适用的响应体大小上限和允许的类型
+
+        @param url 请求的URL
+        @return tuple 大小上限（0表示不限制）和允许的Content-Type元组（为空表示不限制）
+        """
+        max_size: int = self.config.MAX_BODY_SIZE
+        content_types: tuple[str, ...] = tuple(i.lower() for i in self.config.ALLOWED_CONTENT_TYPES)
+
+        limit: RouteLimit | None = self._methods.limit(url) if self._methods is not None else None
+        if limit is not None:
+            if limit.max_size is not None:
+                max_size = limit.max_size
+            if limit.content_types is not None:
+                content_types = limit.content_types
+
+        return max_size, content_types
+
+    async def send(self, request: Request, client: AsyncClient) -> Response:
+        """
+        @brief 发送HTTP请求，启用代理池时通过选中的代理发送并报告结果
+
+        请求可以通过 extensions['proxy_session'] 指定粘性会话键
+
+        @param request 需要发送的HTTP请求对象
+        @param client 不使用代理时的异步HTTP客户端
+        @return Response 响应对象
+        @exception HTTPError 请求失败时抛出
+        """
+        if self._proxy_pool is None:
+            return await client.send(request, stream=self.config.STREAM)
+
+        proxy: Proxy = await self._proxy_pool.acquire(request.url.host, request.extensions.get('proxy_session'))
+        logger.debug(f'{request.url} via proxy {proxy.url}')
+
+        try:
+            response: Response = await self._proxy_clients[proxy.url].send(request, stream=self.config.STREAM)
+        except HTTPError:
+            self._proxy_pool.report(proxy, False)
+            raise
+
+        self._proxy_pool.report(proxy, response.status_code not in PROXY_FAILURE_STATUS)
+        return response
+
+    async def health_check(self):
+        """
+        @brief 定期检查所有代理的可用性
+
+        检查失败的代理会被剔除，检查成功的被剔除代理会被恢复
+        """
+        config = self._proxy_pool.config
+
+        try:
+            while True:
+                for proxy in self._proxy_pool.proxies:
+                    try:
+                        response: Response = await self._proxy_clients[proxy.url].get(config.HEALTH_CHECK_URL)
+                        response.raise_for_status()
+                    except HTTPError as e:
+                        logger.warning(f'Proxy {proxy.url} health check failed: {e}')
+                        self._proxy_pool.eject(proxy)
+                    else:
+                        self._proxy_pool.restore(proxy)
+
+                await sleep(config.HEALTH_CHECK_INTERVAL)
+        except CancelledError:
+            logger.debug('proxy health check stopped')
+            raise
+
+    def handle_archive(self, response: Response | None):
+        """
+        @brief 将成功的响应写入归档
+
+        归档写入失败只记录错误，不影响正常的抓取流程
+
+        @param response HTTP响应对象，如果请求失败则为None
+        """
+        if self._archive is None or response is None:
+            return
+
+        try:
+            self._archive.write(response)
+        except Exception as e:
+            logger.error(f'{response.url} archive failed: {e}', exc_info=True)
+
     async def handle_response(self, response: Response | None, url: str):
         """
         @brief 处理HTTP响应结果
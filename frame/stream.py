@@ -0,0 +1,100 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file stream.py
+@brief 流式解析模块
+@details 为大体积的XML和JSON响应提供增量解析：XML只保留需要的子元素，其余子树在解析后立即清理，
+         需要的元素全部出现后停止解析；JSON按路径逐个产出数组元素，不构建完整的对象树
+"""
+
+from typing import Any, Iterable, Iterator
+from io import BytesIO
+from json import loads
+from logging import getLogger
+
+from lxml import etree
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = getLogger(__name__)
+
+
+def iterparse_children(content: bytes, wanted: Iterable[str], chunk_size: int = 16384) -> tuple[Any, dict[str, Any]]:
+    """
+    @brief 增量解析XML文档根元素下需要的子元素
+    @details 按块把文档交给XMLPullParser，只对需要的标签产生事件，避免逐个元素回到Python；
+             每块解析后清理已经结束的不需要的子元素，需要的子元素全部出现后停止，文档剩余部分不再解析；
+             缺少某个子元素时会解析到文档末尾
+    @param content XML文档字节
+    @param wanted 需要的子元素标签名
+    @param chunk_size 每次交给解析器的字节数
+    @return (根元素, 以标签名为键的子元素字典)，同名子元素只保留第一个
+    """
+    wanted = set(wanted)
+    found: dict[str, Any] = {}
+    root = None
+
+    parser: etree.XMLPullParser = etree.XMLPullParser(events=('end',), tag=wanted)
+    for offset in range(0, len(content), chunk_size):
+        parser.feed(content[offset:offset + chunk_size])
+
+        for _, element in parser.read_events():
+            if root is None:
+                root = element.getroottree().getroot()
+            # 同名标签也可能出现在更深的层级中，例如角色中的picture
+            if element.getparent() is root and element.tag not in found:
+                found[element.tag] = element
+
+        if len(found) == len(wanted):
+            return root, found
+
+        # 最后一个子元素可能还没有解析完，不能清理
+        if root is not None:
+            for child in root[:-1]:
+                if child.tag not in wanted and len(child):
+                    child.clear()
+
+    root = parser.close() if root is None else root
+    return root, found
+
+
+def walk_json(data: Any, path: list[str]) -> Iterator[Any]:
+    """
+    @brief 按ijson格式的路径遍历已解码的JSON数据
+    @param data JSON数据
+    @param path 路径分段，item表示数组中的每个元素
+    @return 路径对应的值迭代器
+    """
+    if not path:
+        yield data
+        return
+
+    key, rest = path[0], path[1:]
+    if key == 'item' and isinstance(data, list):
+        for item in data:
+            yield from walk_json(item, rest)
+    elif isinstance(data, dict) and key in data:
+        yield from walk_json(data[key], rest)
+
+
+def iter_json(content: bytes, prefix: str) -> Iterator[Any]:
+    """
+    @brief 流式产出JSON文档中指定路径的值
+    @details 安装ijson时逐个构建路径对应的对象，否则退回一次性解码后遍历，两种方式产出的结果相同
+    @param content JSON文档字节
+    @param prefix ijson格式的路径，例如 item.items.item 表示顶层数组中每个元素的items数组的每个元素
+    @return 路径对应的值迭代器
+    """
+    if ijson is None:
+        yield from walk_json(loads(content), prefix.split('.') if prefix else [])
+        return
+
+    yield from ijson.items(BytesIO(content), prefix, use_float=True)
+
+
+if __name__ == '__main__':
+    pass
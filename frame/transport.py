@@ -0,0 +1,177 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file transport.py
+@brief HTTP客户端构建模块
+@details 为爬虫和图片下载器构建异步HTTP客户端，支持HTTP/2多路复用、连接池参数、
+         带TTL的DNS解析缓存以及对已知主机的连接预热
+"""
+
+from typing import Iterable
+from importlib.util import find_spec
+from ipaddress import ip_address
+from socket import SOCK_STREAM
+from time import monotonic
+from asyncio import get_running_loop
+from logging import getLogger
+
+from httpx import AsyncClient, AsyncHTTPTransport, Limits, HTTPError
+from httpcore import AsyncNetworkBackend, AsyncNetworkStream, ConnectError
+
+logger = getLogger(__name__)
+
+
+class DNSCache(object):
+    """
+    @brief 带TTL的DNS解析缓存
+    """
+
+    def __init__(self, ttl: float):
+        """
+        @brief 初始化DNS缓存
+        @param ttl 缓存有效期（秒）
+        """
+        self._ttl: float = ttl
+        self._cache: dict[tuple[str, int], tuple[float, list[str]]] = {}
+
+    async def resolve(self, host: str, port: int) -> list[str]:
+        """
+        @brief 解析主机名，缓存有效时直接返回缓存结果
+        @param host 主机名
+        @param port 端口
+        @return 解析得到的IP地址列表
+        """
+        key: tuple[str, int] = (host, port)
+        cached: tuple[float, list[str]] | None = self._cache.get(key)
+        if cached is not None and cached[0] > monotonic():
+            return cached[1]
+
+        infos = await get_running_loop().getaddrinfo(host, port, type=SOCK_STREAM)
+
+        addresses: list[str] = []
+        for info in infos:
+            if info[4][0] not in addresses:
+                addresses.append(info[4][0])
+
+        self._cache[key] = (monotonic() + self._ttl, addresses)
+        logger.debug(f'resolve {host} to {addresses}')
+        return addresses
+
+    def invalidate(self, host: str, port: int):
+        """
+        @brief 使主机的缓存失效
+        @param host 主机名
+        @param port 端口
+        """
+        self._cache.pop((host, port), None)
+
+
+class CachedNetworkBackend(AsyncNetworkBackend):
+    """
+    @brief 使用DNS缓存的网络后端
+    @details 包装httpcore原有的网络后端，建立TCP连接前先通过缓存解析主机名，
+             TLS的SNI仍使用原始主机名，因此不影响证书校验
+    """
+
+    def __init__(self, backend: AsyncNetworkBackend, cache: DNSCache):
+        """
+        @brief 初始化网络后端
+        @param backend 被包装的网络后端
+        @param cache DNS缓存
+        """
+        self._backend: AsyncNetworkBackend = backend
+        self._cache: DNSCache = cache
+
+    async def connect_tcp(self, host: str, port: int, timeout: float | None = None,
+                          local_address: str | None = None, socket_options: Iterable | None = None) -> AsyncNetworkStream:
+        """
+        @brief 建立TCP连接，依次尝试解析得到的每个地址
+        @exception ConnectError 所有地址都无法连接时抛出
+        """
+        try:
+            ip_address(host)
+        except ValueError:
+            pass
+        else:
+            return await self._backend.connect_tcp(host, port, timeout, local_address, socket_options)
+
+        error: Exception | None = None
+        for address in await self._cache.resolve(host, port):
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except ConnectError as e:
+                error = e
+
+        self._cache.invalidate(host, port)
+        raise error if error is not None else ConnectError(f'{host} has no address')
+
+    async def connect_unix_socket(self, path: str, timeout: float | None = None,
+                                  socket_options: Iterable | None = None) -> AsyncNetworkStream:
+        """
+        @brief 建立Unix套接字连接
+        """
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float):
+        """
+        @brief 休眠指定秒数
+        """
+        await self._backend.sleep(seconds)
+
+
+def create_client(headers: dict[str, str], timeout: float, http2: bool = False,
+                  max_connections: int | None = 100, max_keepalive_connections: int | None = 20,
+                  keepalive_expiry: float | None = 5.0, dns_cache_ttl: float = 0,
+                  proxy: str | None = None) -> AsyncClient:
+    """
+    @brief 构建异步HTTP客户端
+    @param headers 默认请求头
+    @param timeout 超时时间（秒）
+    @param http2 是否启用HTTP/2，未安装h2时自动退回HTTP/1.1
+    @param max_connections 最大连接数
+    @param max_keepalive_connections 最大保持连接数
+    @param keepalive_expiry 空闲连接保持时间（秒）
+    @param dns_cache_ttl DNS缓存有效期（秒），为0时不缓存
+    @param proxy 代理地址
+    @return 异步HTTP客户端
+    """
+    if http2 and find_spec('h2') is None:
+        logger.warning('h2 is not installed, fall back to HTTP/1.1, install httpx[http2] to enable HTTP/2')
+        http2 = False
+
+    limits: Limits = Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+    transport: AsyncHTTPTransport = AsyncHTTPTransport(http2=http2, limits=limits, proxy=proxy)
+
+    if dns_cache_ttl > 0:
+        # httpx没有公开网络后端参数，这里替换连接池使用的后端
+        pool = transport._pool
+        pool._network_backend = CachedNetworkBackend(pool._network_backend, DNSCache(dns_cache_ttl))
+
+    return AsyncClient(headers=headers, timeout=timeout, follow_redirects=True, transport=transport)
+
+
+async def prewarm(client: AsyncClient, hosts: Iterable[str]):
+    """
+    @brief 预先建立到已知主机的连接
+    @details 对每个主机发送一次HEAD请求，使连接进入连接池，失败时只记录警告
+    @param client 异步HTTP客户端
+    @param hosts 主机名或URL列表，主机名默认使用https
+    """
+    for host in hosts:
+        url: str = host if '://' in host else f'https://{host}/'
+
+        try:
+            await client.head(url)
+        except HTTPError as e:
+            logger.warning(f'prewarm {url} failed: {e}')
+        else:
+            logger.debug(f'prewarm {url} successfully')
+
+
+if __name__ == '__main__':
+    pass
@@ -7,14 +7,11 @@ from pytz import timezone
 from frame.control import Control as SpiderControl
 from scheduler.schedule import Schedule, RunType, Every
 from summarize.collect import Collect
+from summarize.titles import TitleIndex
 from picture.control import Control as PictureControl
 from picture.control import Config, Task
-from constant import LOG_PATH, PICTURE_PATH
-
-from spider.Bagumi import BagumiSpider
-from spider.MAL import MALSpider
-from spider.AniDB_API import AniDBAPISpider
-from spider.Anikore import AnikoreSpider
+from constant import LOG_PATH, PICTURE_PATH, MAL_CLIENT_ID
+from spider import get_spider
 
 tz = timezone('Asia/Shanghai')
 schedule: Schedule = Schedule(tz)
@@ -36,12 +33,19 @@ logging.getLogger('httpx').setLevel(logging.WARNING)
 
 @schedule.repeat(Every().hour(2))
 def task():
+    try:
+        TitleIndex().update()
+    except Exception as e:
+        logging.error(f'Update AniDB titles failed: {e}', exc_info=True)
+
     spider_control: SpiderControl = SpiderControl()
 
-    spider_control.add(BagumiSpider)
-    spider_control.add(MALSpider)
-    spider_control.add(AniDBAPISpider)
-    # spider_control.add(AnikoreSpider)
+    # 爬虫模块在这里按名称导入，只导入本次需要运行的爬虫
+    spider_control.add(get_spider('bangumi'))
+    # 配置了MAL的client id时使用JSON接口，否则抓取网页
+    spider_control.add(get_spider('mal_api' if MAL_CLIENT_ID else 'mal'))
+    spider_control.add(get_spider('anidb_api'))
+    # spider_control.add(get_spider('anikore'))
 
     spider_control.start()
 
@@ -50,6 +54,8 @@ def task():
 
     config: Config = Config()
     config.REQUEST.USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+    config.REQUEST.DNS_CACHE_TTL = 600
+    config.REQUEST.PREWARM_HOSTS = ['lain.bgm.tv', 'cdn.myanimelist.net', 'cdn-eu.anidb.net']
     config.SAVE.DEFAULT_PATH = PICTURE_PATH
 
     picture_control: PictureControl = PictureControl(config)
@@ -32,6 +32,24 @@ class RequestConfig(object):
     # 最大延迟时间（秒），请求延迟的上限值
     MAX_DELAY: int = 60
 
+    # 是否启用HTTP/2多路复用（需要安装 httpx[http2]）
+    HTTP2: bool = False
+
+    # 连接池最大连接数
+    MAX_CONNECTIONS: int = 100
+
+    # 连接池最大保持连接数
+    MAX_KEEPALIVE_CONNECTIONS: int = 20
+
+    # 空闲连接保持时间（秒）
+    KEEPALIVE_EXPIRY: float = 5.0
+
+    # DNS解析缓存有效期（秒），为0时不缓存
+    DNS_CACHE_TTL: int = 0
+
+    # 启动时预先建立连接的主机列表
+    PREWARM_HOSTS: list[str] = field(default_factory=list)
+
 
 @dataclass
 class SaveConfig(object):
@@ -8,6 +8,7 @@ from re import compile, Match
 
 from httpx import AsyncClient, Response, HTTPError
 
+from frame.transport import create_client, prewarm
 from picture.bridge import Task, Package, Middle
 from picture.config import Config, RequestConfig
 
@@ -108,7 +109,20 @@ class Requester(object):
         user_agent: dict[str, str] = self.config.DEFAULT_REQUEST_HEADERS
         user_agent['user-agent'] = self.config.USER_AGENT
 
-        async with AsyncClient(headers=user_agent, timeout=self.config.MAX_DELAY, follow_redirects=True) as client:
+        client: AsyncClient = create_client(
+            user_agent,
+            self.config.MAX_DELAY,
+            http2=self.config.HTTP2,
+            max_connections=self.config.MAX_CONNECTIONS,
+            max_keepalive_connections=self.config.MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=self.config.KEEPALIVE_EXPIRY,
+            dns_cache_ttl=self.config.DNS_CACHE_TTL
+        )
+
+        async with client:
+            if self.config.PREWARM_HOSTS:
+                await prewarm(client, self.config.PREWARM_HOSTS)
+
             tasks: list[CoroutineTask] = []
 
             while True:
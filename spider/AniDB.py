@@ -10,8 +10,11 @@ from lxml import etree
 from re import compile
 
 from frame.handle import Spider
-from database.model import Cache, SessionFactory
-from database.data import CacheData, Season, DEFAULT_TZ
+from frame.parse import Fragment, parse_html
+from frame.extract import Extractor, Field, strip
+from database.session import add_caches
+from database.data import CacheData, Season, current_season, response_date
+from summarize.recrawl import RecrawlPolicy
 
 
 logger = getLogger(__name__)
@@ -25,6 +28,29 @@ class NameType(Enum):
     SYNONYM = 'Synonym'
 
 
+# 详情页字段以及逐行解析使用的表达式，均在导入时编译一次
+DETAIL_EXTRACTOR = Extractor(
+    Field('names', r'(//div[@id="tabbed_pane"])[1]//div[@id="tab_2_pane"]//tr', many=True),
+    Field('details', r'//div[@id="tab_1_pane"]//tr', many=True),
+    Field('description', r'string(//div[@itemprop="description"])', convert=strip),
+    Field('picture', r'//meta[@property="og:image"]/@content', required=True),
+)
+# 详情页只解析封面meta标签、信息标签页和简介三个容器
+DETAIL_FRAGMENTS = (
+    Fragment('meta', 'property="og:image"'),
+    Fragment('div', 'id="tabbed_pane"', expect=r'(//div[@id="tabbed_pane"])[1]//div[@id="tab_2_pane"]'),
+    Fragment('div', 'itemprop="description"'),
+)
+SEASON_LINK_XPATH = etree.XPath(r'//div[@class="g_bubblewrap g_bubble container"]/div/div/a')
+LANGUAGE_XPATH = etree.XPath(r'.//span[contains(@class, "i_icon") and position() = 1]/span')
+MAIN_NAME_XPATH = etree.XPath(r'.//span[@itemprop="name"]')
+LABEL_XPATH = etree.XPath(r'.//label')
+START_DATE_XPATH = etree.XPath(r'.//span[@itemprop="startDate"]')
+PUBLISHED_DATE_XPATH = etree.XPath(r'.//span[@itemprop="datePublished"]')
+TAG_XPATH = etree.XPath(r'.//span[@class="tagname"]')
+RATING_VALUE_XPATH = etree.XPath(r'.//*[@itemprop="ratingValue"]')
+RATING_COUNT_XPATH = etree.XPath(r'.//span[@itemprop="ratingCount"]')
+
 AniDBSpider = Spider()
 
 AniDBSpider.config.REQUEST.USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36'
@@ -45,45 +71,34 @@ AniDBSpider.config.REQUEST.DEFAULT_REQUEST_HEADERS = {
 AniDBSpider.config.REQUEST.DOWNLOAD_DELAY = 300
 
 def init_request() -> list[Request]:
-    today: date = datetime.now(DEFAULT_TZ).date()
-
-    season: str = ''
-    if 1 <= today.month <= 3:
-        season = 'winter'
-    elif 4 <= today.month <= 6:
-        season = 'spring'
-    elif 7 <= today.month <= 9:
-        season = 'summer'
-    elif 10 <= today.month <= 12:
-        season = 'autumn'
+    year, season = current_season()
 
-    return [Request('GET', f'https://anidb.net/anime/season/{today.year}/{season}/?do=calendar&h=1')]
+    return [Request('GET', f'https://anidb.net/anime/season/{year}/{season.value}/?do=calendar&h=1')]
 
 AniDBSpider.config.HANDLE.INIT_URL_FUNCTION = init_request
 
 
 @AniDBSpider.route('anidb.net/anime/season/\d+/.+/$', regex=True)
 def handle_season(response: Response)  -> list[Request]:
-    root = etree.HTML(response.text)
+    root = parse_html(response)
 
-    following: list[str] = []
-    for a_element in root.xpath(r'//div[@class="g_bubblewrap g_bubble container"]/div/div/a'):
-        following.append(a_element.get('href'))
+    following: list[tuple[int, str]] = []
+    for a_element in SEASON_LINK_XPATH(root):
+        url: str = a_element.get('href')
+        following.append((int(ANIME_PATTERN.match(url).group(1)), url))
 
-    return [Request('GET', 'https://anidb.net' + url) for url in following]
+    return [Request('GET', 'https://anidb.net' + url) for url in RecrawlPolicy(3).filter(following)]
 
 
 @AniDBSpider.route(r'anidb.net/anime/\d+', regex=True)
-def handle_detail(response: Response):
+async def handle_detail(response: Response):
     cache_object: CacheData = CacheData()
 
-    root = etree.HTML(response.text)
-
-    information_table = root.xpath(r'//div[@id="tabbed_pane"]')[0]
+    root = parse_html(response, DETAIL_FRAGMENTS)
+    values: dict = DETAIL_EXTRACTOR.values(root)
 
     name_dict: dict[str | None, str] = {}
-    name_table = information_table.xpath(r'.//div[@id="tab_2_pane"]//tr')
-    for tr_element in name_table:
+    for tr_element in values['names']:
         key: NameType = NameType.UNKNOWN
         if 'romaji' in tr_element.get('class'):
             key = NameType.MAIN
@@ -100,14 +115,14 @@ def handle_detail(response: Response):
 
         language: str | None = None
         if key == NameType.OFFICIAL:
-            icon_element = tr_element.xpath(r'.//span[contains(@class, "i_icon") and position() = 1]/span')[0]
+            icon_element = LANGUAGE_XPATH(tr_element)[0]
             language = icon_element.text.strip()
 
         name_string: str = ''
         if key == NameType.MAIN:
-            name_string: str = tr_element.xpath(r'.//span[@itemprop="name"]')[0].text.strip()
+            name_string: str = MAIN_NAME_XPATH(tr_element)[0].text.strip()
         elif key == NameType.OFFICIAL or key == NameType.SYNONYM:
-            name_string: str = tr_element.xpath(r'.//label')[0].text.strip()
+            name_string: str = LABEL_XPATH(tr_element)[0].text.strip()
         name_dict[language] = name_string
 
     if 'ja' in name_dict.keys():
@@ -124,42 +139,31 @@ def handle_detail(response: Response):
     cache_object.all_data = list(name_dict.values())
     logger.debug('name analysis successfully')
 
-    cache_object.description = root.xpath(r'string(//div[@itemprop="description"])').strip()
+    cache_object.description = values['description']
 
     cache_object.tag = []
-    detail_table: list = information_table.xpath(r'//div[@id="tab_1_pane"]//tr')
-    for tr_element in detail_table:
+    for tr_element in values['details']:
         class_type: str = tr_element.get('class').strip()
 
         if 'year' in class_type:
-            if tr_element.xpath(r'.//span[@itemprop="startDate"]'):
-                time_element = tr_element.xpath(r'.//span[@itemprop="startDate"]')[0]
-            elif tr_element.xpath(r'.//span[@itemprop="datePublished"]'):
-                time_element = tr_element.xpath(r'.//span[@itemprop="datePublished"]')[0]
-            else:
+            time_elements: list = START_DATE_XPATH(tr_element) or PUBLISHED_DATE_XPATH(tr_element)
+            if not time_elements:
                 logger.warning(f'time element not found in {response.url}')
                 continue
 
+            time_element = time_elements[0]
+
             time: str = time_element.get('content').strip()
             release_date: date = datetime.strptime(time, '%Y-%m-%d').date()
 
             cache_object.year = release_date.year
-            if 1 <= release_date.month <= 3:
-                cache_object.season = Season.WINTER
-            elif 4 <= release_date.month <= 6:
-                cache_object.season = Season.SPRING
-            elif 7 <= release_date.month <= 9:
-                cache_object.season = Season.SUMMER
-            elif 10 <= release_date.month <= 12:
-                cache_object.season = Season.AUTUMN
-            else:
-                raise ValueError(f'Invalid date: {release_date}')
+            cache_object.season = Season.from_month(release_date.month)
 
             cache_object.time = release_date
             logger.debug('time analysis successfully')
 
         elif 'tags' in class_type:
-            tag_elements: list = tr_element.xpath(r'.//span[@class="tagname"]')
+            tag_elements: list = TAG_XPATH(tr_element)
             for tag_element in tag_elements:
                 cache_object.tag.append(tag_element.text)
 
@@ -167,13 +171,14 @@ def handle_detail(response: Response):
             if 'tmprating' in class_type:
                 continue
 
-            if not tr_element.xpath(r'.//*[@itemprop="ratingValue"]'):
+            score_elements: list = RATING_VALUE_XPATH(tr_element)
+            if not score_elements:
                 cache_object.score = 0
                 cache_object.vote = 0
                 continue
 
-            score_element = tr_element.xpath(r'.//*[@itemprop="ratingValue"]')[0]
-            vote_element = tr_element.xpath(r'.//span[@itemprop="ratingCount"]')[0]
+            score_element = score_elements[0]
+            vote_element = RATING_COUNT_XPATH(tr_element)[0]
 
             if score_element.text:
                 cache_object.score = float(score_element.text)
@@ -185,18 +190,14 @@ def handle_detail(response: Response):
             logger.debug('rating analysis successfully')
     logger.debug('base information analysis successfully')
 
-    cache_object.date = datetime.now(tz=DEFAULT_TZ).date()
+    cache_object.date = response_date(response)
 
     cache_object.web = 3
     cache_object.webId = ANIME_PATTERN.match(response.url.path).group(1)
 
-    cache_object.picture = root.xpath(r'//meta[@property="og:image"]')[0].get('content')
-
-    cache: Cache = cache_object.to_orm()
+    cache_object.picture = values['picture']
 
-    with SessionFactory() as session:
-        session.add(cache)
-        session.commit()
+    await add_caches([cache_object])
     logger.info(f'{cache_object.name} add successfully')
 
 
@@ -5,18 +5,25 @@ from datetime import date, datetime
 from logging import getLogger
 
 from httpx import Request, Response
-from lxml import etree
 from re import compile
 
 from frame.handle import Spider
-from database.model import Cache, SessionFactory
-from database.data import CacheData, Season, DEFAULT_TZ
+from frame.parse import parse_html
+from frame.stream import iterparse_children
+from database.session import add_caches
+from database.data import CacheData, Season, current_season, response_date
+from summarize.recrawl import RecrawlPolicy
+from summarize.refresh import ScoreRefresh
+from summarize.titles import TitleIndex
 
 
 logger = getLogger(__name__)
 ANIME_ID_PATTERN = compile(r'/anime/(\d+)')
 ANIME_QUERY_ID_PATTERN = compile(r'[&?]aid=(\d+)')
 
+#: 详情接口中需要读取的子元素
+DETAIL_ELEMENTS = ('titles', 'startdate', 'description', 'ratings', 'picture', 'tags')
+
 AniDBAPISpider = Spider()
 
 AniDBAPISpider.config.REQUEST.USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36'
@@ -37,48 +44,72 @@ AniDBAPISpider.config.REQUEST.DEFAULT_REQUEST_HEADERS = {
 AniDBAPISpider.config.REQUEST.DOWNLOAD_DELAY = 300
 
 def init_request() -> list[Request]:
-    today: date = datetime.now(DEFAULT_TZ).date()
-
-    season: str = ''
-    if 1 <= today.month <= 3:
-        season = 'winter'
-    elif 4 <= today.month <= 6:
-        season = 'spring'
-    elif 7 <= today.month <= 9:
-        season = 'summer'
-    elif 10 <= today.month <= 12:
-        season = 'autumn'
+    year, season = current_season()
 
-    return [Request('GET', f'https://anidb.net/anime/season/{today.year}/{season}/?do=calendar&h=1')]
+    return [Request('GET', f'https://anidb.net/anime/season/{year}/{season.value}/?do=calendar&h=1')]
 
 AniDBAPISpider.config.HANDLE.INIT_URL_FUNCTION = init_request
 
+# 仅评分模式：从季度列表页读取评分更新已收录动画，只对新动画调用HTTP API
+AniDBAPIScoreSpider = Spider()
+AniDBAPIScoreSpider.config = AniDBAPISpider.config
+
 
 @AniDBAPISpider.route('anidb.net/anime/season/\d+/.+/$', regex=True)
 def handle_season(response: Response)  -> list[Request]:
-    root = etree.HTML(response.text)
+    root = parse_html(response)
 
-    following: list[str] = []
+    following: list[tuple[int, int]] = []
     for a_element in root.xpath(r'//div[@class="g_bubblewrap g_bubble container"]/div/div/a'):
-        following.append(a_element.get('href'))
+        aid: int = int(ANIME_ID_PATTERN.match(a_element.get('href')).group(1))
+        following.append((aid, aid))
+
+    url_template: str = 'http://api.anidb.net:9001/httpapi?client=animescrapy&clientver=1&protover=1&request=anime&aid={}'
+    return [Request('GET', url_template.format(aid)) for aid in RecrawlPolicy(3).filter(following)]
 
+@AniDBAPIScoreSpider.route(r'anidb.net/anime/season/\d+/.+/$', regex=True)
+def handle_season_score(response: Response) -> list[Request]:
+    root = parse_html(response)
+
+    ratings: dict[int, tuple[float, int] | None] = {}
+    for a_element in root.xpath(r'//div[@class="g_bubblewrap g_bubble container"]/div/div/a'):
+        aid: int = int(ANIME_ID_PATTERN.match(a_element.get('href')).group(1))
+
+        # 列表页的条目可能不包含评分，此时已收录的动画本次不更新
+        bubble = a_element.getparent().getparent()
+        score_element = bubble.xpath(r'.//*[@itemprop="ratingValue"]')
+        vote_element = bubble.xpath(r'.//*[@itemprop="ratingCount"]')
+        if score_element and vote_element:
+            score: str = score_element[0].get('content') or score_element[0].text
+            vote: str = vote_element[0].get('content') or vote_element[0].text
+            ratings[aid] = (float(score), int(vote))
+        else:
+            ratings[aid] = None
+
+    # 通过本地名称索引识别来源为其他网站的已收录动画，只对真正的新动画调用API
     url_template: str = 'http://api.anidb.net:9001/httpapi?client=animescrapy&clientver=1&protover=1&request=anime&aid={}'
-    return [Request('GET', url_template.format(ANIME_ID_PATTERN.match(url).group(1))) for url in following]
+    return [Request('GET', url_template.format(aid)) for aid in ScoreRefresh(3, TitleIndex().details).apply(ratings, response_date(response))]
+
 
+@AniDBAPIScoreSpider.route('api.anidb.net/httpapi')
 @AniDBAPISpider.route('api.anidb.net/httpapi')
-def handle_detail(response: Response):
+async def handle_detail(response: Response):
     cache_object: CacheData = CacheData()
 
-    root = etree.fromstring(response.content)
+    # 只读取需要的子元素，剧集、角色等其余子树解析后立即清理，需要的元素全部出现后停止解析
+    root, elements = iterparse_children(response.content, DETAIL_ELEMENTS)
+    if root.tag == 'error':
+        logger.error(f'AniDB API error {root.text} for {response.url}')
+        return
 
     title_dict: dict[str, str] = {}
-    for title in root.xpath(r'./titles/title'):
+    for title in elements['titles'].iterfind('title'):
         title_dict[title.get('{http://www.w3.org/XML/1998/namespace}lang')] = title.text.strip()
 
     if 'ja' in title_dict.keys():
         cache_object.name = title_dict['ja']
     else:
-        cache_object.name = root.xpath('./titles/title[@type="main"]')[0].text.strip()
+        cache_object.name = elements['titles'].find('title[@type="main"]').text.strip()
 
     cache_object.translation = None
     for language in ('zh-Hans', 'zh-Hant', 'en'):
@@ -89,7 +120,7 @@ def handle_detail(response: Response):
     cache_object.all_data = list(title_dict.values())
     logger.debug('name analysis successfully')
 
-    time: str = root.xpath('./startdate')[0].text.strip()
+    time: str = elements['startdate'].text.strip()
     key: int = len(time.split('-'))
     if key == 3:
         release_date: date = datetime.strptime(time, '%Y-%m-%d').date()
@@ -101,53 +132,41 @@ def handle_detail(response: Response):
         raise ValueError(f'Invalid date: {time}')
 
     cache_object.year = release_date.year
-    if 1 <= release_date.month <= 3:
-        cache_object.season = Season.WINTER
-    elif 4 <= release_date.month <= 6:
-        cache_object.season = Season.SPRING
-    elif 7 <= release_date.month <= 9:
-        cache_object.season = Season.SUMMER
-    elif 10 <= release_date.month <= 12:
-        cache_object.season = Season.AUTUMN
-    else:
-        raise ValueError(f'Invalid date: {release_date}')
+    cache_object.season = Season.from_month(release_date.month)
 
     cache_object.time = release_date
     logger.debug('time analysis successfully')
 
-    description = root.xpath('./description')
-    if description:
-        cache_object.description = description[0].text.strip()
+    description = elements.get('description')
+    if description is not None:
+        cache_object.description = description.text.strip()
     else:
         cache_object.description = ''
     cache_object.tag = []
-    for tag in root.xpath('./tags/tag/name'):
-        cache_object.tag.append(tag.text.strip())
+    if 'tags' in elements:
+        for tag in elements['tags'].iterfind('tag/name'):
+            cache_object.tag.append(tag.text.strip())
     logger.debug('base information analysis successfully')
 
-    rating = root.xpath('./ratings/permanent')
-    if rating:
-        cache_object.score = float(rating[0].text.strip())
-        cache_object.vote = int(rating[0].get('count').strip())
+    rating = elements['ratings'].find('permanent') if 'ratings' in elements else None
+    if rating is not None:
+        cache_object.score = float(rating.text.strip())
+        cache_object.vote = int(rating.get('count').strip())
         logger.debug('rating analysis successfully')
     else:
         cache_object.score = 0
         cache_object.vote = 0
         logger.debug('no rating data found')
 
-    cache_object.date = datetime.now(tz=DEFAULT_TZ).date()
+    cache_object.date = response_date(response)
 
     cache_object.web = 3
     cache_object.webId = ANIME_QUERY_ID_PATTERN.search(response.url.query.decode('utf-8')).group(1)
 
-    picture = root.xpath(r'./picture')[0].text.strip()
+    picture = elements['picture'].text.strip()
     cache_object.picture = f'https://cdn-eu.anidb.net/images/main/{picture}'
 
-    cache: Cache = cache_object.to_orm()
-
-    with SessionFactory() as session:
-        session.add(cache)
-        session.commit()
+    await add_caches([cache_object])
     logger.info(f'{cache_object.name} add successfully')
 
 
@@ -9,8 +9,10 @@ from lxml import etree
 from re import compile
 
 from frame.handle import Spider
-from database.model import SessionFactory
-from database.data import CacheData, Season, DEFAULT_TZ
+from frame.parse import parse_html
+from frame.extract import Extractor, Field, strip
+from database.session import add_caches
+from database.data import CacheData, Season, current_season, response_date
 
 logger = getLogger(__name__)
 TEST_DATE_FORMATE = compile(r'\d+年\d+月\d+日')
@@ -40,124 +42,104 @@ AnikoreSpider.config.REQUEST.DOWNLOAD_DELAY = 300
 
 
 def init_request() -> list[Request]:
-    today: date = datetime.now(DEFAULT_TZ).date()
+    year, season = current_season()
 
-    season: str = ''
-    if 1 <= today.month <= 3:
-        season = 'winter'
-    elif 4 <= today.month <= 6:
-        season = 'spring'
-    elif 7 <= today.month <= 9:
-        season = 'summer'
-    elif 10 <= today.month <= 12:
-        season = 'autumn'
-
-    return [Request('GET', f'https://www.anikore.jp/chronicle/{today.year}/{season}/')]
+    return [Request('GET', f'https://www.anikore.jp/chronicle/{year}/{season.value}/')]
 
 AnikoreSpider.config.HANDLE.INIT_URL_FUNCTION = init_request
 
 
-def handle_anime(anime_element) -> CacheData:
-    cache_object = CacheData()
-
-    name_string: str = anime_element.xpath(r'.//span[@class="l-searchPageRanking_unit_title_rankName"]/following-sibling::text()')[0].strip()
+def parse_name(name_string: str) -> str:
+    name_string = name_string.strip()
     if NAME_PATTERN.match(name_string):
-        cache_object.name = NAME_PATTERN.match(name_string).groups(1)[0]
-    else:
-        cache_object.name = name_string
-    cache_object.translation = None
-    cache_object.all_data = [cache_object.name]
-    logger.debug('name analysis successfully')
+        return NAME_PATTERN.match(name_string).groups(1)[0]
+
+    return name_string
 
-    time_string: str = anime_element.xpath(r'.//div[@class="l-searchPageRanking_unit_mainBlock_chronicle"]')[
-        0].text.strip()
+
+def parse_release_date(time_element) -> date:
+    time_string: str = time_element.text.strip()
     if TEST_DATE_FORMATE.match(time_string):
-        release_date: date = datetime.strptime(time_string, '%Y年%m月%d日').date()
-    else:
-        year: int = int(time_string[:4])
-        month: int = 0
-
-        if time_string[5:6] == '冬':
-            month = 1
-        elif time_string[5:6] == '春':
-            month = 4
-        elif time_string[5:6] == '夏':
-            month = 7
-        elif time_string[5:6] == '秋':
-            month = 10
-
-        release_date: date = date(year, month, 1)
-
-    cache_object.year = release_date.year
-    if 1 <= release_date.month <= 3:
-        cache_object.season = Season.WINTER
-    elif 4 <= release_date.month <= 6:
-        cache_object.season = Season.SPRING
-    elif 7 <= release_date.month <= 9:
-        cache_object.season = Season.SUMMER
-    elif 10 <= release_date.month <= 12:
-        cache_object.season = Season.AUTUMN
-    else:
-        raise ValueError(f'Invalid date: {release_date}')
-    logger.debug('time analysis successfully')
-
-    cache_object.time = release_date
-    cache_object.tag = []
-    cache_object.description = anime_element.xpath(r'string(.//div[@class="l-searchPageRanking_unit_excerpt"])').strip()
+        return datetime.strptime(time_string, '%Y年%m月%d日').date()
+
+    year: int = int(time_string[:4])
+    month: int = 0
+
+    if time_string[5:6] == '冬':
+        month = 1
+    elif time_string[5:6] == '春':
+        month = 4
+    elif time_string[5:6] == '夏':
+        month = 7
+    elif time_string[5:6] == '秋':
+        month = 10
 
-    cache_object.score = float(
-        anime_element.xpath(r'.//div[@class="l-searchPageRanking_unit_mainBlock_starPoint"]/strong')[0].text)
-    cache_object.vote = int(
-        anime_element.xpath(r'.//div[@class="l-searchPageRanking_unit_mainBlock_starPoint"]/span')[0].text)
-    cache_object.date = datetime.now(DEFAULT_TZ).date()
-    logger.debug('rating analysis successfully')
+    return date(year, month, 1)
 
-    cache_object.web = 2
-    href = anime_element.xpath(r'./h2/a')[0].get('href')
-    cache_object.webId = int(ANIME_PATTERN.match(href).group(1))
 
-    cache_object.picture = anime_element.xpath(r'.//a/img')[0].get('src')
+def parse_anime_id(href: str) -> int:
+    return int(ANIME_PATTERN.match(href).group(1))
+
+
+# 列表页中每部动画的字段，表达式在导入时编译一次
+ANIME_EXTRACTOR = Extractor(
+    Field('name', r'.//span[@class="l-searchPageRanking_unit_title_rankName"]/following-sibling::text()', convert=parse_name, required=True),
+    Field('time', r'.//div[@class="l-searchPageRanking_unit_mainBlock_chronicle"]', convert=parse_release_date, required=True),
+    Field('description', r'string(.//div[@class="l-searchPageRanking_unit_excerpt"])', convert=strip),
+    Field('score', r'.//div[@class="l-searchPageRanking_unit_mainBlock_starPoint"]/strong/text()', convert=float, required=True),
+    Field('vote', r'.//div[@class="l-searchPageRanking_unit_mainBlock_starPoint"]/span/text()', convert=int, required=True),
+    Field('webId', r'./h2/a/@href', convert=parse_anime_id, required=True),
+    Field('picture', r'.//a/img/@src', required=True),
+    web=2,
+    translation=None,
+)
+ANIME_LIST_XPATH = etree.XPath(r'//div[@class="l-searchPageRanking_list"]/div[@class="l-searchPageRanking_unit"]')
+PAGINATE_XPATH = etree.XPath(r'//section[@class="l-searchPaginate"]/span[preceding-sibling::span[@class="current"] and position() < last()]/a/@href', smart_strings=False)
+
+
+def handle_anime(anime_element, today: date) -> CacheData:
+    cache_object: CacheData = ANIME_EXTRACTOR.extract(anime_element)
+
+    cache_object.all_data = [cache_object.name]
+    cache_object.year = cache_object.time.year
+    cache_object.season = Season.from_month(cache_object.time.month)
+    cache_object.tag = []
+    cache_object.date = today
+    logger.debug('anime analysis successfully')
 
     return cache_object
 
 
-def handle_anime_list(root) -> list[CacheData]:
+def handle_anime_list(root, today: date) -> list[CacheData]:
     cache_list: list[CacheData] = []
 
-    for anime_element in root.xpath(r'//div[@class="l-searchPageRanking_list"]/div[@class="l-searchPageRanking_unit"]'):
-        cache_list.append(handle_anime(anime_element))
+    for anime_element in ANIME_LIST_XPATH(root):
+        cache_list.append(handle_anime(anime_element, today))
 
     return cache_list
 
 
 @AnikoreSpider.route(r'www.anikore.jp/chronicle/\d+/.+/$', regex=True)
-def handle_chronicle(response: Response) -> list[Request]:
-    root = etree.HTML(response.text)
+async def handle_chronicle(response: Response) -> list[Request]:
+    root = parse_html(response)
 
-    cache_list: list[CacheData] = handle_anime_list(root)
+    cache_list: list[CacheData] = handle_anime_list(root, response_date(response))
 
-    with SessionFactory() as session:
-        session.add_all([cache_object.to_orm() for cache_object in cache_list])
-        session.commit()
+    await add_caches(cache_list)
     logger.info(f'{len(cache_list)} add successfully')
 
-    url_list: list[str] = []
-    url_list_element: list = root.xpath(r'//section[@class="l-searchPaginate"]/span[preceding-sibling::span[@class="current"] and position() < last()]')
-    for url_element in url_list_element:
-        url_list.append(url_element.xpath(r'./a')[0].get('href'))
+    url_list: list[str] = PAGINATE_XPATH(root)
 
     return [Request('GET', 'https://www.anikore.jp' + url) for url in url_list]
 
 
 @AnikoreSpider.route(r'www.anikore.jp/chronicle/\d+/.+/page:\d+', regex=True)
-def handle_following_chronicle(response: Response):
-    root = etree.HTML(response.text)
+async def handle_following_chronicle(response: Response):
+    root = parse_html(response)
 
-    cache_list: list[CacheData] = handle_anime_list(root)
+    cache_list: list[CacheData] = handle_anime_list(root, response_date(response))
 
-    with SessionFactory() as session:
-        session.add_all([cache_object.to_orm() for cache_object in cache_list])
-        session.commit()
+    await add_caches(cache_list)
     logger.info(f'{len(cache_list)} add successfully')
 
 
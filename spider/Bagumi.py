@@ -2,17 +2,24 @@
 # AUTHOR: Sun
 
 from json import loads
-from datetime import date, datetime
+from datetime import date
 from logging import getLogger
 
 from httpx import Request, Response
 
 from frame.handle import Spider
-from database.model import Cache, SessionFactory
-from database.data import CacheData, Season, DEFAULT_TZ
+from frame.stream import iter_json
+from database.session import add_caches
+from database.data import CacheData, Season, response_date
+from summarize.recrawl import RecrawlPolicy
+from summarize.refresh import ScoreRefresh
 
 
 logger = getLogger(__name__)
+
+#: 每日放送接口中每部动画所在的路径
+CALENDAR_ITEMS = 'item.items.item'
+
 BagumiSpider = Spider()
 
 BagumiSpider.config.REQUEST.USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36'
@@ -34,21 +41,38 @@ BagumiSpider.config.REQUEST.DOWNLOAD_DELAY = 300
 
 BagumiSpider.config.HANDLE.INIT_URL = Request('GET', 'https://api.bgm.tv/calendar')
 
+# 仅评分模式：从每日放送接口更新已收录动画的评分，只抓取新动画的详情
+BagumiScoreSpider = Spider()
+BagumiScoreSpider.config = BagumiSpider.config
+
 
 @BagumiSpider.route('api.bgm.tv/calendar')
 def handle_calender(response: Response) -> list[Request]:
-    data = loads(response.content)
-    uid: list[int] = []
+    uid: list[tuple[int, int]] = []
+
+    for item in iter_json(response.content, CALENDAR_ITEMS):
+        uid.append((item['id'], item['id']))
 
-    for week_item in data:
-        for item in week_item['items']:
-            uid.append(item['id'])
+    return [Request('GET', f'https://api.bgm.tv/v0/subjects/{i}') for i in RecrawlPolicy(1).filter(uid)]
 
-    return [Request('GET', f'https://api.bgm.tv/v0/subjects/{i}') for i in uid]
 
+@BagumiScoreSpider.route('api.bgm.tv/calendar')
+def handle_calender_score(response: Response) -> list[Request]:
+    ratings: dict[int, tuple[float, int] | None] = {}
 
+    for item in iter_json(response.content, CALENDAR_ITEMS):
+        rating = item.get('rating')
+        if rating and rating.get('score') is not None:
+            ratings[item['id']] = (rating['score'], rating['total'])
+        else:
+            ratings[item['id']] = None
+
+    return [Request('GET', f'https://api.bgm.tv/v0/subjects/{i}') for i in ScoreRefresh(1).apply(ratings, response_date(response))]
+
+
+@BagumiScoreSpider.route(r'api.bgm.tv/v0/subjects/\d+', regex=True)
 @BagumiSpider.route(r'api.bgm.tv/v0/subjects/\d+', regex=True)
-def handle_subject(response: Response):
+async def handle_subject(response: Response):
     cache_object = CacheData()
 
     data = loads(response.content)
@@ -71,16 +95,7 @@ def handle_subject(response: Response):
 
     release_date: tuple[int, ...] = tuple(int(i) for i in data['date'].split('-'))
     cache_object.year = release_date[0]
-    if 1 <= release_date[1] <= 3:
-        cache_object.season = Season.WINTER
-    elif 4 <= release_date[1] <= 6:
-        cache_object.season = Season.SPRING
-    elif 7 <= release_date[1] <= 9:
-        cache_object.season = Season.SUMMER
-    elif 10 <= release_date[1] <= 12:
-        cache_object.season = Season.AUTUMN
-    else:
-        raise ValueError(f'Invalid date: {release_date}')
+    cache_object.season = Season.from_month(release_date[1])
     logger.debug('time analysis successfully')
 
     cache_object.time = date(*release_date)
@@ -91,7 +106,7 @@ def handle_subject(response: Response):
     rating = data['rating']
     cache_object.score = rating['score']
     cache_object.vote = rating['total']
-    cache_object.date = datetime.now(DEFAULT_TZ).date()
+    cache_object.date = response_date(response)
     logger.debug('rating analysis successfully')
 
     cache_object.web = 1
@@ -99,11 +114,7 @@ def handle_subject(response: Response):
 
     cache_object.picture = data['images']['common']
 
-    cache: Cache = cache_object.to_orm()
-
-    with SessionFactory() as session:
-        session.add(cache)
-        session.commit()
+    await add_caches([cache_object])
     logger.info(f'{cache_object.name} add successfully')
 
 if __name__ == '__main__':
@@ -0,0 +1,188 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file Bagumi_Archive.py
+@brief Bangumi数据包导入模块
+@details 流式读取Bangumi定期发布的条目数据包（subject.jsonlines，可以是zip、gzip或未压缩文件），
+         把动画条目直接写入cache表，由Collect按正常流程合并。历史数据的回填不再受接口请求间隔限制，
+         BagumiSpider只需要抓取每日放送中的增量
+"""
+
+from typing import IO, Iterator
+from datetime import date, datetime
+from pathlib import Path
+from gzip import GzipFile
+from zipfile import ZipFile
+from io import TextIOWrapper
+from json import loads
+from re import compile, DOTALL
+from logging import getLogger
+
+from database.model import SessionFactory
+from database.data import CacheData, Season, DEFAULT_TZ, insert_caches
+
+logger = getLogger(__name__)
+
+#: 数据包中条目文件的名称
+SUBJECT_FILE = 'subject.jsonlines'
+
+#: 动画条目的类型
+ANIME_TYPE = 2
+
+#: 每个事务写入数据库的条目数量
+INSERT_BATCH = 1000
+
+#: 数据包中没有封面地址，使用接口的封面跳转地址
+PICTURE_URL = 'https://api.bgm.tv/v0/subjects/{}/image?type=common'
+
+ALIAS_BLOCK_PATTERN = compile(r'\|别名\s*=\s*\{(.*?)\}', DOTALL)
+ALIAS_LINE_PATTERN = compile(r'\|别名\s*=\s*([^\n{]+)')
+ALIAS_ITEM_PATTERN = compile(r'\[(?:[^|\]]*\|)?([^\]]+)\]')
+
+
+def open_dump(path: str | Path) -> Iterator[IO[str]]:
+    """
+    @brief 按文件内容识别数据包格式并打开条目文件
+    @details 以文件头判断：zip数据包读取其中的subject.jsonlines，gzip文件直接解压，其余按未压缩文件处理
+    @param path 数据包路径
+    @return 条目文件的文本流
+    @exception FileNotFoundError zip数据包中没有条目文件时抛出
+    """
+    path = Path(path)
+    with path.open('rb') as raw:
+        magic: bytes = raw.read(4)
+
+    if magic == b'PK\x03\x04':
+        with ZipFile(path) as archive:
+            names: list[str] = [name for name in archive.namelist() if name.endswith(SUBJECT_FILE)]
+            if not names:
+                raise FileNotFoundError(f'{SUBJECT_FILE} not found in {path}')
+
+            with archive.open(names[0]) as member:
+                yield TextIOWrapper(member, encoding='utf-8')
+    elif magic[:2] == b'\x1f\x8b':
+        with GzipFile(path) as member:
+            yield TextIOWrapper(member, encoding='utf-8')
+    else:
+        with path.open('r', encoding='utf-8') as member:
+            yield member
+
+
+def iter_subjects(path: str | Path, types: tuple[int, ...] = (ANIME_TYPE,)) -> Iterator[dict]:
+    """
+    @brief 逐行读取数据包中的条目
+    @param path 数据包路径
+    @param types 需要的条目类型
+    @return 条目字典迭代器
+    """
+    for stream in open_dump(path):
+        for line in stream:
+            if not line.strip():
+                continue
+
+            subject: dict = loads(line)
+            if subject.get('type') in types:
+                yield subject
+
+
+def parse_aliases(infobox: str) -> list[str]:
+    """
+    @brief 从wiki格式的信息框中解析别名
+    @param infobox 信息框文本
+    @return 别名列表
+    """
+    block = ALIAS_BLOCK_PATTERN.search(infobox)
+    if block:
+        return [i.strip() for i in ALIAS_ITEM_PATTERN.findall(block.group(1)) if i.strip()]
+
+    line = ALIAS_LINE_PATTERN.search(infobox)
+    return [line.group(1).strip()] if line and line.group(1).strip() else []
+
+
+def parse_subject(subject: dict, today: date) -> CacheData | None:
+    """
+    @brief 将数据包中的条目转换为缓存数据
+    @details 字段含义与接口 /v0/subjects/{id} 一致，没有放送日期的条目与接口抓取时一样被丢弃
+    @param subject 条目字典
+    @param today 缓存日期
+    @return 缓存数据对象，条目无效时返回None
+    """
+    cache_object = CacheData()
+
+    cache_object.name = subject['name']
+    cache_object.translation = subject.get('name_cn')
+    cache_object.all_data = [cache_object.name, cache_object.translation]
+    cache_object.all_data.extend(parse_aliases(subject.get('infobox') or ''))
+    cache_object.all_data = [i for i in cache_object.all_data if i]
+
+    if not subject.get('date'):
+        logger.debug(f'{cache_object.name} has no release date, dropped')
+        return None
+
+    release_date: tuple[int, ...] = tuple(int(i) for i in subject['date'].split('-'))
+    cache_object.year = release_date[0]
+    cache_object.season = Season.from_month(release_date[1])
+    cache_object.time = date(*release_date)
+
+    cache_object.tag = subject.get('meta_tags') or []
+    cache_object.description = subject.get('summary')
+
+    cache_object.score = subject.get('score') or 0
+    cache_object.vote = sum((subject.get('score_details') or {}).values())
+    cache_object.date = today
+
+    cache_object.web = 1
+    cache_object.webId = subject['id']
+
+    cache_object.picture = PICTURE_URL.format(subject['id'])
+
+    return cache_object
+
+
+def import_dump(path: str | Path, since: date | None = None) -> int:
+    """
+    @brief 将数据包中的动画条目导入cache表
+    @param path 数据包路径
+    @param since 只导入放送日期不早于该日期的条目，为None时导入全部
+    @return 导入的条目数量
+    @retval int 条目数量
+    """
+    today: date = datetime.now(DEFAULT_TZ).date()
+
+    number: int = 0
+    dropped: int = 0
+    with SessionFactory() as session:
+        batch: list[CacheData] = []
+        for subject in iter_subjects(path):
+            try:
+                cache_object: CacheData | None = parse_subject(subject, today)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f'subject {subject.get("id")} is invalid: {e}')
+                cache_object = None
+
+            if cache_object is None or (since is not None and cache_object.time < since):
+                dropped += 1
+                continue
+
+            batch.append(cache_object)
+            if len(batch) >= INSERT_BATCH:
+                number += insert_caches(session, batch)
+                session.commit()
+                batch = []
+
+        if batch:
+            number += insert_caches(session, batch)
+            session.commit()
+
+    logger.info(f'Import {number} subjects from {path}, {dropped} dropped')
+    return number
+
+
+if __name__ == '__main__':
+    import logging
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+
+    import_dump(sys.argv[1], date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -9,14 +9,23 @@ from httpx import Request, Response
 from lxml import etree
 
 from frame.handle import Spider
-from database.model import Cache, SessionFactory
-from database.data import CacheData, Season, DEFAULT_TZ
+from frame.parse import Fragment, parse_html
+from frame.extract import Extractor, Field, text
+from database.session import add_caches
+from database.data import CacheData, Season, current_season, response_date
+from summarize.recrawl import RecrawlPolicy
+from summarize.refresh import ScoreRefresh
 
 
 logger = getLogger(__name__)
 TEST_DATE_FORMATE = compile(r'.+\s+\d{1,2},\s+\d{4}')
 ANIME_PATTERN = compile(r'/anime/(\d+)/.*')
 
+SEASON_ANIME_XPATH = etree.XPath(r'//div[contains(@class, " seasonal-anime ")]')
+SEASON_LINK_XPATH = etree.XPath(r'//div[contains(@class, " seasonal-anime ")]//h2/a')
+LINK_XPATH = etree.XPath(r'.//h2/a')
+SCORE_XPATH = etree.XPath(r'string(.//div[contains(@class, "scormem-item") and contains(@class, "score")])', smart_strings=False)
+
 MALSpider = Spider()
 
 MALSpider.config.REQUEST.USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36'
@@ -37,72 +46,112 @@ MALSpider.config.REQUEST.DEFAULT_REQUEST_HEADERS = headers = {
 MALSpider.config.REQUEST.DOWNLOAD_DELAY = 300
 
 def init_request() -> list[Request]:
-    today: date = datetime.now(DEFAULT_TZ).date()
-
-    season: str = ''
-    if 1 <= today.month <= 3:
-        season = 'winter'
-    elif 4 <= today.month <= 6:
-        season = 'spring'
-    elif 7 <= today.month <= 9:
-        season = 'summer'
-    elif 10 <= today.month <= 12:
-        season = 'autumn'
+    year, season = current_season()
 
-    return [Request('GET', f'https://myanimelist.net/anime/season/{today.year}/{season}')]
+    return [Request('GET', f'https://myanimelist.net/anime/season/{year}/{season.value}')]
 
 MALSpider.config.HANDLE.INIT_URL_FUNCTION = init_request
 
+# 仅评分模式：从季度列表页更新已收录动画的评分，只抓取新动画的详情页
+MALScoreSpider = Spider()
+MALScoreSpider.config = MALSpider.config
+
 
 @MALSpider.route(r'myanimelist.net/anime/season')
 @MALSpider.route('myanimelist.net/anime/season/\d+/.+$', regex=True)
 def handle_season(response: Response) -> list[Request]:
-    root = etree.HTML(response.text)
-
-    following: list[str] = []
-    for a_element in root.xpath(r'//div[contains(@class, " seasonal-anime ")]//h2/a'):
-        following.append(a_element.get('href'))
-
-    return  [Request('GET', url) for url in following]
-
-
+    root = parse_html(response)
+
+    following: list[tuple[int, str]] = []
+    for a_element in SEASON_LINK_XPATH(root):
+        url: str = a_element.get('href')
+        following.append((int(ANIME_PATTERN.search(url).group(1)), url))
+
+    return  [Request('GET', url) for url in RecrawlPolicy(4).filter(following)]
+
+
+@MALScoreSpider.route(r'myanimelist.net/anime/season')
+@MALScoreSpider.route(r'myanimelist.net/anime/season/\d+/.+$', regex=True)
+def handle_season_score(response: Response) -> list[Request]:
+    root = parse_html(response)
+
+    ratings: dict[int, tuple[float, int | None] | None] = {}
+    urls: dict[int, str] = {}
+    for anime_element in SEASON_ANIME_XPATH(root):
+        links = LINK_XPATH(anime_element)
+        match = ANIME_PATTERN.search(links[0].get('href', '')) if links else None
+        if match is None:
+            continue
+
+        web_id: int = int(match.group(1))
+        urls[web_id] = links[0].get('href')
+
+        # 列表页只提供成员数而不是评分人数，投票人数沿用详情页抓取到的值，避免改变MAL在总评分中的权重
+        try:
+            ratings[web_id] = (float(SCORE_XPATH(anime_element).strip()), None)
+        except ValueError:
+            ratings[web_id] = None
+
+    return [Request('GET', urls[web_id]) for web_id in ScoreRefresh(4).apply(ratings, response_date(response))]
+
+
+# 详情页字段，表达式在导入时编译一次
+DETAIL_EXTRACTOR = Extractor(
+    Field('title', r'(//div[@itemprop="name"])[1]//strong', convert=text, required=True),
+    Field('translation', r'(//div[@itemprop="name"])[1]/p', convert=text),
+    Field('alternative', r'(//div[@class="leftside"])[1]/div[preceding-sibling::h2[text()="Alternative Titles"] and following-sibling::h2[text()="Information"]]', many=True),
+    Field('information', r'(//div[@class="leftside"])[1]/div[preceding-sibling::h2[text()="Information"] and following-sibling::h2[text()="Statistics"]]', many=True),
+    Field('description', r'string((//p[@itemprop="description"])[1])'),
+    Field('rated', r'boolean((//div[@class="leftside"])[1]/div[@itemprop="aggregateRating"])'),
+    Field('score', r'(//div[@class="leftside"])[1]/div[@itemprop="aggregateRating"]/span[@itemprop="ratingValue"]/text()', convert=float, default=0),
+    Field('vote', r'(//div[@class="leftside"])[1]/div[@itemprop="aggregateRating"]/span[@itemprop="ratingCount"]/text()', convert=int, default=0),
+    Field('picture', r'//img[@itemprop="image"]/@data-src', required=True),
+)
+# 详情页只解析名称栏、左侧信息栏、封面和简介，封面通常位于左侧信息栏中，此时不会重复截取；
+# 左侧信息栏中找不到Statistics标题时说明片段被截断
+DETAIL_FRAGMENTS = (
+    Fragment('div', 'itemprop="name"'),
+    Fragment('div', 'class="leftside"', expect=r'(//div[@class="leftside"])[1]/h2[text()="Statistics"]'),
+    Fragment('img', 'itemprop="image"'),
+    Fragment('p', 'itemprop="description"'),
+)
+SUB_DIV_XPATH = etree.XPath(r'./div')
+KEY_XPATH = etree.XPath(r'./span')
+VALUE_XPATH = etree.XPath(r'./span/following-sibling::text()', smart_strings=False)
+
+
+@MALScoreSpider.route(r'myanimelist.net/anime/\d+/.+', regex=True)
 @MALSpider.route(r'myanimelist.net/anime/\d+/.+', regex=True)
-def handle_detail(response: Response):
+async def handle_detail(response: Response):
     cache_object: CacheData = CacheData()
 
-    root = etree.HTML(response.text)
-
-    name_bar = root.xpath(r'//div[@itemprop="name"]')[0]
-    info_list = root.xpath(r'//div[@class="leftside"]')[0]
-
-    name_title: str = name_bar.xpath(r'.//strong')[0].text.strip()
-    name_translation: str = name_bar.xpath(r'./p')[0].text.strip() if name_bar.xpath(r'./p') else None
+    root = parse_html(response, DETAIL_FRAGMENTS)
+    values: dict = DETAIL_EXTRACTOR.values(root)
 
     name_list: list[str] = []
-    name_element_list: list = info_list.xpath(r'./div[preceding-sibling::h2[text()="Alternative Titles"] and following-sibling::h2[text()="Information"]]')
+    name_element_list: list = values['alternative']
     if name_element_list and name_element_list[-1].get('class') == 'js-alternative-titles hide':
         last_name_element = name_element_list.pop()
-        name_element_list.extend(last_name_element.xpath(r'./div'))
+        name_element_list.extend(SUB_DIV_XPATH(last_name_element))
     for name_element in name_element_list:
-        language: str = name_element.xpath(r'./span')[0].text.strip()
-        name: str = name_element.xpath('./span/following-sibling::text()')[0].strip()
+        language: str = KEY_XPATH(name_element)[0].text.strip()
+        name: str = VALUE_XPATH(name_element)[0].strip()
 
         if 'Japanese' in language:
             cache_object.name = name
 
         name_list.append(name)
 
-    cache_object.name = cache_object.name if cache_object.name else name_title
-    cache_object.translation = name_translation
+    cache_object.name = cache_object.name if cache_object.name else values['title']
+    cache_object.translation = values['translation']
     cache_object.all_data = [cache_object.name, cache_object.translation]
     cache_object.all_data.extend(name_list)
     cache_object.all_data = list(set(i for i in cache_object.all_data if i))
     logger.debug('name analysis successfully')
 
-    information_element_list: list = info_list.xpath(r'./div[preceding-sibling::h2[text()="Information"] and following-sibling::h2[text()="Statistics"]]')
-    for information_element in information_element_list:
-        key: str = information_element.xpath('./span')[0].text.strip()
-        value: str = information_element.xpath('./span/following-sibling::text()')[0].strip()
+    for information_element in values['information']:
+        key: str = KEY_XPATH(information_element)[0].text.strip()
+        value: str = VALUE_XPATH(information_element)[0].strip()
 
         if 'Aired' in key:
             time_string: str = value.split(' to ')[0].strip()
@@ -113,50 +162,30 @@ def handle_detail(response: Response):
                 release_date: date = datetime.strptime(time_string, '%b %Y').date()
 
             cache_object.year = release_date.year
-            if 1 <= release_date.month <= 3:
-                cache_object.season = Season.WINTER
-            elif 4 <= release_date.month <= 6:
-                cache_object.season = Season.SPRING
-            elif 7 <= release_date.month <= 9:
-                cache_object.season = Season.SUMMER
-            elif 10 <= release_date.month <= 12:
-                cache_object.season = Season.AUTUMN
-            else:
-                raise ValueError(f'Invalid date: {release_date}')
-
+            cache_object.season = Season.from_month(release_date.month)
             cache_object.time = release_date
 
             break
     logger.debug('time analysis successfully')
 
     cache_object.tag = []
-
-    description_element = root.xpath(r'//p[@itemprop="description"]')[0]
-    cache_object.description = description_element.xpath('string(.)')
+    cache_object.description = values['description']
     logger.debug('base information analysis successfully')
 
-    rating_element = info_list.xpath(r'./div[@itemprop="aggregateRating"]')
-    if rating_element:
-        rating_element = rating_element[0]
-        cache_object.score = float(rating_element.xpath(r'./span[@itemprop="ratingValue"]/text()')[0])
-        cache_object.vote = int(rating_element.xpath(r'./span[@itemprop="ratingCount"]/text()')[0])
+    cache_object.score = values['score']
+    cache_object.vote = values['vote']
+    if values['rated']:
         logger.debug('rating analysis successfully')
     else:
-        cache_object.score = 0
-        cache_object.vote = 0
         logger.info(f'{cache_object.name} has no rating')
-    cache_object.date = datetime.now(DEFAULT_TZ).date()
+    cache_object.date = response_date(response)
 
     cache_object.web = 4
     cache_object.webId = int(ANIME_PATTERN.match(response.url.path).group(1))
 
-    cache_object.picture = root.xpath(r'//img[@itemprop="image"]')[0].get('data-src')
-
-    cache: Cache = cache_object.to_orm()
+    cache_object.picture = values['picture']
 
-    with SessionFactory() as session:
-        session.add(cache)
-        session.commit()
+    await add_caches([cache_object])
     logger.info(f'{cache_object.name} add successfully')
 
 
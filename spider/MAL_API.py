@@ -0,0 +1,134 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+from datetime import date, datetime
+from logging import getLogger
+from json import loads
+
+from httpx import Request, Response
+
+from frame.handle import Spider
+from database.session import add_caches
+from database.data import CacheData, Season, current_season, response_date
+from constant import MAL_CLIENT_ID
+
+
+logger = getLogger(__name__)
+
+API_URL = 'https://api.myanimelist.net/v2'
+
+# 只请求名称、日期、评分和人数，封面（main_picture）为默认返回字段
+FIELDS = ('alternative_titles', 'start_date', 'mean', 'num_scoring_users')
+PAGE_LIMIT = 100
+# API中秋季的名称为fall
+SEASON_NAMES = {Season.AUTUMN: 'fall'}
+
+MALAPISpider = Spider()
+
+MALAPISpider.config.REQUEST.USER_AGENT = 'animescrapy'
+MALAPISpider.config.REQUEST.DEFAULT_REQUEST_HEADERS = {'accept': 'application/json'}
+if MAL_CLIENT_ID:
+    MALAPISpider.config.REQUEST.DEFAULT_REQUEST_HEADERS['X-MAL-CLIENT-ID'] = MAL_CLIENT_ID
+MALAPISpider.config.REQUEST.DOWNLOAD_DELAY = 5
+
+def init_request() -> list[Request]:
+    # 没有client id时API拒绝所有请求，不发送请求
+    if not MAL_CLIENT_ID:
+        logger.warning('MAL_CLIENT_ID is not set, MAL API spider skipped')
+        return []
+
+    year, season = current_season()
+
+    return [Request('GET', f'{API_URL}/anime/season/{year}/{SEASON_NAMES.get(season, season.value)}', params={
+        'fields': ','.join(FIELDS),
+        'limit': PAGE_LIMIT,
+        'offset': 0,
+        'nsfw': 'true',
+    })]
+
+MALAPISpider.config.HANDLE.INIT_URL_FUNCTION = init_request
+
+
+def parse_date(time: str) -> date:
+    key: int = len(time.split('-'))
+    if key == 3:
+        return datetime.strptime(time, '%Y-%m-%d').date()
+    elif key == 2:
+        return datetime.strptime(time, '%Y-%m').date()
+    elif key == 1:
+        return datetime.strptime(time, '%Y').date()
+
+    raise ValueError(f'Invalid date: {time}')
+
+
+def handle_anime(node: dict, today: date) -> CacheData | None:
+    cache_object: CacheData = CacheData()
+
+    alternative: dict = node.get('alternative_titles') or {}
+    cache_object.name = alternative.get('ja') or node['title']
+    cache_object.translation = alternative.get('en') or None
+    cache_object.all_data = [node['title'], alternative.get('ja'), alternative.get('en')]
+    cache_object.all_data.extend(alternative.get('synonyms') or [])
+    cache_object.all_data = list(dict.fromkeys(i for i in cache_object.all_data if i))
+
+    if not node.get('start_date'):
+        logger.debug(f'{cache_object.name} has no start date, dropped')
+        return None
+
+    release_date: date = parse_date(node['start_date'])
+    cache_object.year = release_date.year
+    cache_object.season = Season.from_month(release_date.month)
+    cache_object.time = release_date
+
+    cache_object.tag = []
+    cache_object.description = None
+
+    if node.get('mean') is not None:
+        cache_object.score = node['mean']
+        cache_object.vote = node.get('num_scoring_users') or 0
+    else:
+        cache_object.score = 0
+        cache_object.vote = 0
+    cache_object.date = today
+
+    cache_object.web = 4
+    cache_object.webId = node['id']
+
+    picture: dict = node.get('main_picture') or {}
+    cache_object.picture = picture.get('large') or picture.get('medium')
+
+    return cache_object
+
+
+@MALAPISpider.route(r'[^/]+/v2/anime/season/\d+/\w+$', regex=True)
+async def handle_season(response: Response) -> list[Request]:
+    data: dict = loads(response.content)
+
+    today: date = response_date(response)
+    cache_list: list[CacheData] = []
+    for item in data.get('data', []):
+        cache_object: CacheData | None = handle_anime(item['node'], today)
+        if cache_object is not None:
+            cache_list.append(cache_object)
+
+    await add_caches(cache_list)
+    logger.info(f'{len(cache_list)} add successfully')
+
+    following: str | None = data.get('paging', {}).get('next')
+    return [Request('GET', following)] if following else []
+
+
+if __name__ == '__main__':
+    import logging
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    logging.getLogger('httpcore').setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    from frame.control import Control
+
+    control = Control()
+    control.add(MALAPISpider)
+
+    control.start()
@@ -1,5 +1,50 @@
 # -*- coding:utf-8 -*-
 # AUTHOR: Sun
 
+"""
+@file __init__.py
+@brief 爬虫注册表
+@details 按名称登记爬虫所在的模块和对象，只有在按名称取用时才导入对应模块，
+         只运行单个爬虫的进程不需要导入其他爬虫及其依赖
+"""
+
+from importlib import import_module
+
+#: 爬虫名称到 模块:对象 的映射
+SPIDERS: dict[str, str] = {
+    'bangumi': 'spider.Bagumi:BagumiSpider',
+    'bangumi_score': 'spider.Bagumi:BagumiScoreSpider',
+    'mal': 'spider.MAL:MALSpider',
+    'mal_score': 'spider.MAL:MALScoreSpider',
+    'mal_api': 'spider.MAL_API:MALAPISpider',
+    'anidb': 'spider.AniDB:AniDBSpider',
+    'anidb_api': 'spider.AniDB_API:AniDBAPISpider',
+    'anidb_api_score': 'spider.AniDB_API:AniDBAPIScoreSpider',
+    'anikore': 'spider.Anikore:AnikoreSpider',
+}
+
+
+def available() -> list[str]:
+    """
+    @brief 获取所有已登记的爬虫名称
+    @return 爬虫名称列表
+    """
+    return sorted(SPIDERS)
+
+
+def get_spider(spider_name: str):
+    """
+    @brief 按名称导入并获取爬虫
+    @param spider_name 爬虫名称
+    @return 爬虫对象
+    @exception KeyError 名称未登记时抛出
+    """
+    if spider_name not in SPIDERS:
+        raise KeyError(f'Unknown spider {spider_name}, available: {", ".join(available())}')
+
+    module_name, attribute = SPIDERS[spider_name].split(':')
+    return getattr(import_module(module_name), attribute)
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,48 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file __main__.py
+@brief 单独运行指定的爬虫
+
+用法：python -m spider NAME [NAME ...]
+      python -m spider NAME --reparse PATH  不访问网络，把归档中的响应重新送入爬虫的处理函数
+"""
+
+from argparse import ArgumentParser
+import logging
+
+from spider import available, get_spider
+
+
+def main(argv: list[str] | None = None):
+    """
+    @brief 命令行入口，只导入并运行指定名称的爬虫，或者用指定的爬虫重解析归档
+    @param argv 命令行参数
+    """
+    parser: ArgumentParser = ArgumentParser(prog='python -m spider', description='Run the named spiders once')
+    parser.add_argument('names', nargs='+', choices=available(), metavar='NAME', help=', '.join(available()))
+    parser.add_argument('--reparse', metavar='PATH', help='replay an archive segment or directory instead of crawling')
+    args = parser.parse_args(argv)
+
+    if args.reparse:
+        if len(args.names) != 1:
+            parser.error('--reparse takes exactly one spider name')
+
+        from frame.archive import reparse
+
+        reparse(get_spider(args.names[0]), args.reparse)
+        return
+
+    from frame.control import Control
+
+    control: Control = Control()
+    for spider_name in args.names:
+        control.add(get_spider(spider_name))
+
+    control.start()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -2,16 +2,23 @@
 # AUTHOR: Sun
 
 from logging import getLogger
-from typing import Iterable
+from datetime import date, datetime
 
+from sqlalchemy import select, delete
 from sqlalchemy.orm import Session
-from sqlalchemy.orm.attributes import flag_modified
 
-from database.model import Cache, Detail, Score, NameMap, SessionFactory
+from database.model import Cache, Detail, Score, CollectMark, SessionFactory
 from summarize.priority import WebPriority
+from summarize.merge import Merger, merge_score
+from summarize.titles import TitleIndex
+from summarize.names import NameIndex
+from summarize.rollup import maintain
 
 logger = getLogger(__name__)
 
+#: 每次提交合并的缓存数量
+COMMIT_CHUNK = 1000
+
 
 class Collect(object):
     """
@@ -19,13 +26,23 @@ class Collect(object):
 
     该类负责从缓存中收集动漫数据，处理并存储到详细信息表和评分表中
     """
-    def __init__(self):
+    def __init__(self, chunk_size: int = COMMIT_CHUNK):
         """
         @brief 初始化Collect对象
 
-        创建WebPriority对象用于处理不同网站的数据优先级
+        创建WebPriority对象用于处理不同网站的数据优先级，创建TitleIndex对象用于离线名称匹配，
+        创建NameIndex对象用于规范化名称匹配
+
+        @param chunk_size 每次提交合并的缓存数量
         """
+        self.chunk_size: int = chunk_size
+        #: 最近一次运行中内容有变化的详细信息数量
+        self.updated: int = 0
+        #: 最近一次运行中有评分的动画ID，以评分日期为键
+        self._scored: dict[date, set[int]] = {}
         self._web_priority: WebPriority = WebPriority()
+        self._title_index: TitleIndex = TitleIndex()
+        self._name_index: NameIndex = NameIndex()
 
     def main(self) -> list[tuple[str, str]]:
         """
@@ -38,7 +55,11 @@ class Collect(object):
         """
         logger.info('Start to collect data')
         pictures: list[tuple[str, str]] = []
+        self.updated = 0
+        self._scored = {}
         with SessionFactory() as session:
+            self._name_index.load(session)
+
             while True:
                 urls: list[tuple[str, str]] = self.cycle(self._web_priority.current_web_id, self._web_priority.web_list, session)
                 pictures.extend(urls)
@@ -47,13 +68,22 @@ class Collect(object):
                 if not condition:
                     logger.info('All data has been collected')
                     break
+
+            maintain(self._scored, session)
+
+        logger.info(f'{self.updated} details updated')
+        logger.info(f'Name index hit {self._name_index.hits} of {self._name_index.lookups} lookups')
         return pictures
 
     def cycle(self, web_id: int, web_list: list[int], session: Session) -> list[tuple[str, str]]:
         """
         @brief 处理单个网站的数据收集周期
 
-        查询指定网站的缓存数据，检查是否已存在对应的详细信息，如果不存在则创建，否则更新
+        按ID顺序流式读取指定网站的缓存数据，每chunk_size条交给Merger匹配和合并后提交一次，
+        同一事务中记录已经合并的最大缓存ID。中途退出后重新运行时从该ID之后继续，已经提交的缓存不会重复合并。
+        全部合并后使用一条范围DELETE语句删除这些缓存并清除记录
+
+        MySQL的流式结果集占用连接直到读取完毕，因此缓存使用单独的会话读取
 
         @param web_id 网站ID
         @param web_list 所有网站ID列表
@@ -62,48 +92,43 @@ class Collect(object):
         @retval list[tuple[str, str]] 包含(detail_id, picture_url)的元组列表
         """
         logger.debug(f'Start to collect data from {self._web_priority.current_web_name}')
-        caches: list[Cache] = session.query(Cache).filter(Cache.web == web_id).all()  # type: ignore
+        mark: CollectMark | None = session.get(CollectMark, web_id)
+        last_id: int = mark.cacheId if mark is not None else 0
+        if last_id:
+            logger.info(f'Resume collecting {self._web_priority.current_web_name} after cache {last_id}')
 
+        merger: Merger = Merger(web_id, web_list, session, self._title_index, self._name_index)
         pictures: list[tuple[str, str]] = []
-        for cache in caches:
-            session.commit()
-            session.delete(cache)
-
-            detail: Detail | None = session.query(Detail).join(
-                NameMap, Detail.id == NameMap.detailId
-            ).filter(
-                NameMap.name.in_([i for i in cache.all if i])
-            ).first()
-
-            if detail is None:
-                logger.debug(f'detail {cache.name} is None, create detail')
-                detail, _ = self.create_detail(cache, session)
-                self.create_map(detail.all, detail, session)
-                pictures.append((str(detail.id), detail.picture))
-                continue
-
-            logger.debug(f'detail {cache.name} exists, update detail')
-
-            if web_list.index(detail.web) > web_list.index(web_id):
-                logger.debug(f'detail {cache.name} is newer, update detail')
-                self.update_detail(cache, detail)
-            else:
-                detail.all = list(set(detail.all + cache.all))
-                flag_modified(detail, 'all')
-
-            self.create_map(detail.all, detail, session)
-
-            score: Score = session.query(Score).filter(Score.detailId == detail.id, Score.date == cache.date).first()  # type: ignore
 
-            if score is None:
-                logger.debug(f'score {detail.id} is None, create score')
-                self.create_score(cache, detail, session)
-                continue
-
-            logger.debug(f'score {detail.id} exists, update score')
-            self.update_score(cache, score)
-
-        session.commit()
+        with SessionFactory() as reader:
+            rows = reader.scalars(
+                select(Cache).where(Cache.web == web_id, Cache.id > last_id).order_by(Cache.id)
+                .execution_options(yield_per=self.chunk_size)
+            )
+            for caches in rows.partitions():
+                pictures.extend(merger.merge(caches))
+
+                last_id = caches[-1].id
+                if mark is None:
+                    mark = CollectMark(web=web_id)
+                    session.add(mark)
+                mark.cacheId = last_id
+                mark.updated = datetime.now()
+                session.commit()
+
+                # 提交后释放这一批载入的对象，读取会话的标识映射只保存弱引用，内存占用与缓存总数无关
+                merger.clear()
+
+        self.updated += merger.updated
+        for day, detail_ids in merger.scored.items():
+            self._scored.setdefault(day, set()).update(detail_ids)
+
+        if mark is not None:
+            session.execute(
+                delete(Cache).where(Cache.web == web_id, Cache.id <= last_id).execution_options(synchronize_session=False)
+            )
+            session.delete(mark)
+            session.commit()
 
         return pictures
 
@@ -117,53 +142,7 @@ class Collect(object):
         @param cache 缓存数据对象
         @param score 评分对象
         """
-        score.detailScore[str(cache.web)] = [float(cache.score), cache.vote]
-        flag_modified(score, 'detailScore')
-        score.vote = 0
-
-        summarize: float = 0
-        for i in score.detailScore.values():
-            score.vote += i[1]
-            summarize += i[0] * i[1]
-        score.score = summarize / score.vote if score.vote else 0
-
-    @staticmethod
-    def update_detail(cache: Cache, detail: Detail):
-        """
-        @brief 更新已存在的动漫条目的详细信息
-
-        根据缓存中的数据更新详细信息表
-
-        @param cache 缓存数据对象
-        @param detail 详细信息对象
-        """
-        detail.name = cache.name
-        detail.translation = cache.translation
-        detail.all = list(set(detail.all + cache.all))
-        detail.year = cache.year
-        detail.season = cache.season
-        detail.time = cache.time
-        detail.tag = cache.tag
-        detail.description = cache.description
-        detail.web = cache.web
-        detail.webId = cache.webId
-        detail.picture = cache.picture
-
-        # 标记JSON字段为已修改，以便SQLAlchemy能正确更新
-        flag_modified(detail, 'all')
-        flag_modified(detail, 'tag')
-
-    def create_detail(self, cache: Cache, session: Session) -> tuple[Detail, Score]:
-        """
-        @brief 为新的动漫条目创建详细信息和评分记录
-
-        @param cache 缓存数据对象
-        @param session 数据库会话对象
-        @return 返回新创建的详细信息对象和评分对象
-        @retval tuple[Detail, Score] 包含详细信息对象和评分对象的元组
-        """
-        detail, score = self.split_cache_to_detail_and_score(cache, session)
-        return detail, score
+        merge_score(cache, score)
 
     @staticmethod
     def create_score(cache: Cache, detail: Detail, session: Session) -> Score:
@@ -192,64 +171,6 @@ class Collect(object):
 
         return score
 
-    @staticmethod
-    def create_map(names: Iterable[str], detail: Detail, session: Session) -> list[NameMap]:
-        """
-        @brief 为新的动漫条目创建名称映射记录
-
-        @param names 映射名称列表
-        @param detail 详细信息对象，与新创建的映射相关联
-        @param session 数据库会话对象，用于添加新的映射记录
-
-        @return 创建的映射对象列表
-        @retval list[NameMap] 新创建的映射对象列表
-        """
-        name_objects = []
-
-        for name in names:
-            # 检查记录是否已存在
-            name_object = session.query(NameMap).filter(NameMap.name == name).first()
-
-            if not name_object:
-                name_object = NameMap(name=name, detailId=detail.id)
-                session.add(name_object)
-
-            name_objects.append(name_object)
-
-        return name_objects
-
-    def split_cache_to_detail_and_score(self, cache: Cache, session: Session) -> tuple[Detail, Score]:
-        """
-        @brief 将缓存数据分割为详细信息和评分两个对象
-
-        @param cache 缓存数据对象
-        @param session 数据库会话对象
-        @return 返回详细信息对象和评分对象
-        @retval tuple[Detail, Score] 包含详细信息对象和评分对象的元组
-        """
-        # 创建Detail对象并填充相应字段
-        detail = Detail(
-            name=cache.name,
-            translation=cache.translation,
-            all=list(set(cache.all)),
-            year=cache.year,
-            season=cache.season,
-            time=cache.time,
-            tag=cache.tag,
-            description=cache.description,
-            web=cache.web,
-            webId=cache.webId,
-            picture=cache.picture
-        )
-
-        session.add(detail)
-        session.flush()
-
-        # 创建Score对象并填充相应字段
-        score = self.create_score(cache, detail, session)
-
-        return detail, score
-
 
 if __name__ == '__main__':
     from logging import basicConfig, DEBUG
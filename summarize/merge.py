@@ -0,0 +1,691 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file merge.py
+@brief 集合式合并模块
+@details 按批处理缓存数据：先用少量IN查询载入这一批涉及的来源映射、名称映射、详细信息、抓取状态和评分，
+         在内存中按缓存的顺序完成匹配和合并，最后一次flush更新已有记录，新的名称映射和评分使用多行INSERT写入。
+         已经收录的(web, webId)直接通过来源映射找到动画，只有新的来源ID才按名称匹配，
+         同一批中先出现的缓存创建的动画可以被后面的缓存匹配到
+"""
+
+from typing import Iterable
+from datetime import date
+from logging import getLogger
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+from database.model import Cache, Detail, Score, NameMap, CrawlState, SourceLink
+from database.data import chunked
+from summarize.recrawl import merge_state
+from summarize.titles import TitleIndex
+from summarize.names import NameIndex, normalize
+from summarize.series import DELTA, get_storage, score_changed, previous_scores
+
+logger = getLogger(__name__)
+
+#: 优先级更高的网站覆盖详细信息时比较和复制的字段，名称列表单独合并
+DETAIL_FIELDS: tuple[str, ...] = (
+    'name', 'translation', 'year', 'season', 'time', 'tag', 'description', 'web', 'webId', 'picture'
+)
+
+
+def merge_score(cache: Cache, score: Score):
+    """
+    @brief 将缓存中的评分合并到评分记录
+
+    按网站记录详细评分，总评分为各网站评分按投票人数加权的平均值
+
+    @param cache 缓存数据对象
+    @param score 评分对象
+    """
+    score.detailScore[str(cache.web)] = [float(cache.score), cache.vote]
+    flag_modified(score, 'detailScore')
+    weigh_score(score)
+
+
+def weigh_score(score: Score):
+    """
+    @brief 按详细评分计算总评分和总投票人数
+
+    @param score 评分对象
+    """
+    score.vote = 0
+
+    summarize: float = 0
+    for i in score.detailScore.values():
+        score.vote += i[1]
+        summarize += i[0] * i[1]
+    score.score = summarize / score.vote if score.vote else 0
+
+
+def carry_score(cache: Cache, previous: Score) -> Score | None:
+    """
+    @brief 在上一个变化点的基础上创建评分对象
+
+    其他网站的评分沿用上一个变化点，与上一个变化点相比没有足够大的变化时不需要保存
+
+    @param cache 缓存数据对象
+    @param previous 上一个变化点的评分对象
+    @return 尚未关联详细信息的评分对象，不需要保存时返回None
+    """
+    score: Score = new_score(cache)
+    score.detailScore = {**previous.detailScore, **score.detailScore}
+    if not score_changed(previous.detailScore, score.detailScore):
+        return None
+
+    weigh_score(score)
+    return score
+
+
+def merge_names(names: Iterable[str], detail: Detail) -> bool:
+    """
+    @brief 将缓存中的名称并入详细信息的名称列表
+
+    已有的名称保持原来的顺序，新名称追加在后面，没有新名称时不修改
+
+    @param names 缓存中的名称列表
+    @param detail 详细信息对象
+    @return 是否有新的名称
+    """
+    added: list[str] = [name for name in dict.fromkeys(names) if name not in detail.all]
+    if not added:
+        return False
+
+    detail.all = detail.all + added
+    return True
+
+
+def merge_detail(cache: Cache, detail: Detail) -> bool:
+    """
+    @brief 使用优先级更高的网站的缓存数据覆盖详细信息
+
+    逐个字段与当前值比较，只修改不同的字段，flush时只更新这些列，所有字段都相同时不产生UPDATE语句
+
+    @param cache 缓存数据对象
+    @param detail 详细信息对象
+    @return 是否有字段被修改
+    """
+    changed: bool = merge_names(cache.all, detail)
+
+    for field in DETAIL_FIELDS:
+        value = getattr(cache, field)
+        if getattr(detail, field) != value:
+            setattr(detail, field, value)
+            changed = True
+
+    return changed
+
+
+def new_detail(cache: Cache) -> Detail:
+    """
+    @brief 使用缓存数据创建详细信息对象
+
+    @param cache 缓存数据对象
+    @return 尚未写入数据库的详细信息对象
+    """
+    return Detail(
+        name=cache.name,
+        translation=cache.translation,
+        all=list(set(cache.all)),
+        year=cache.year,
+        season=cache.season,
+        time=cache.time,
+        tag=cache.tag,
+        description=cache.description,
+        web=cache.web,
+        webId=cache.webId,
+        picture=cache.picture
+    )
+
+
+def new_score(cache: Cache) -> Score:
+    """
+    @brief 使用缓存数据创建评分对象
+
+    详细评分的键与从数据库读出的JSON一致，使用字符串形式的网站ID
+
+    @param cache 缓存数据对象
+    @return 尚未关联详细信息的评分对象
+    """
+    return Score(
+        detailScore={str(cache.web): [float(cache.score), cache.vote]},
+        score=cache.score,
+        vote=cache.vote,
+        date=cache.date
+    )
+
+
+def source_links(web: int, web_ids: Iterable[int], session: Session) -> dict[int, int]:
+    """
+    @brief 在来源映射表中查找来源ID对应的动画ID
+
+    @param web 网站ID
+    @param web_ids 在该网站的ID列表
+    @param session 数据库会话对象
+    @return 以webId为键，动画ID为值的字典
+    """
+    found: dict[int, int] = {}
+    for chunk in chunked(set(web_ids)):
+        found.update(session.execute(
+            select(SourceLink.webId, SourceLink.detailId).where(SourceLink.web == web, SourceLink.webId.in_(chunk))
+        ).tuples().all())
+
+    return found
+
+
+def source_details(web: int, web_ids: Iterable[int], session: Session) -> dict[int, int]:
+    """
+    @brief 查找来源为该网站的动画ID
+
+    来源映射表建立之前收录的动画没有映射，详细信息中记录的来源同样可以确定动画，
+    多个详细信息来源相同时取ID最小的一个
+
+    @param web 网站ID
+    @param web_ids 在该网站的ID列表
+    @param session 数据库会话对象
+    @return 以webId为键，动画ID为值的字典
+    """
+    found: dict[int, int] = {}
+    for chunk in chunked(set(web_ids)):
+        for web_id, detail_id in session.execute(
+            select(Detail.webId, Detail.id).where(Detail.web == web, Detail.webId.in_(chunk)).order_by(Detail.id)
+        ):
+            found.setdefault(web_id, detail_id)
+
+    return found
+
+
+class Merger(object):
+    """
+    @brief 集合式合并引擎
+
+    一个Merger对应一个网站的一次合并，可以多次调用merge处理多批缓存，已经载入的数据在批之间保留，调用clear后释放
+    """
+
+    def __init__(self, web_id: int, web_list: list[int], session: Session,
+                 title_index: TitleIndex | None = None, name_index: NameIndex | None = None):
+        """
+        @brief 初始化Merger对象
+
+        @param web_id 缓存数据的网站ID
+        @param web_list 按优先级排列的网站ID列表
+        @param session 数据库会话对象
+        @param title_index 可选的AniDB名称索引，名称映射和规范化名称都没有匹配时使用
+        @param name_index 可选的规范化名称索引，名称映射没有精确匹配时使用
+        """
+        self.web_id: int = web_id
+        self.web_list: list[int] = web_list
+        self.session: Session = session
+        self.title_index: TitleIndex | None = title_index
+        self.name_index: NameIndex | None = name_index
+        #: 评分保存方式，delta时只保存变化点
+        self.storage: str = get_storage()
+
+        #: 以webId为键的来源对应的详细信息
+        self._links: dict[int, Detail] = {}
+        #: 来源映射表中已有的映射
+        self._link_ids: dict[int, int] = {}
+        self._link_checked: set[int] = set()
+        #: 名称到详细信息的映射，值为None表示名称已存在但对应的详细信息不存在
+        self._names: dict[str, Detail | None] = {}
+        #: 已经从数据库查询过映射的名称
+        self._checked: set[str] = set()
+        #: 以ID为键的已载入详细信息
+        self._details: dict[int, Detail] = {}
+        #: 以aid为键的来源为AniDB的详细信息
+        self._anidb: dict[int, Detail] = {}
+        self._anidb_checked: set[int] = set()
+        #: 名称对应的aid和aid对应的全部名称
+        self._title_aids: dict[str, set[int]] = {}
+        self._aid_titles: dict[int, list[str]] = {}
+        #: 以webId为键的抓取状态
+        self._states: dict[int, CrawlState] = {}
+        #: 以(详细信息, 日期)为键的评分
+        self._scores: dict[tuple[Detail, date], Score] = {}
+        self._score_checked: set[tuple[int, date]] = set()
+        #: 以(详细信息ID, 日期)为键的该日期之前最近的评分，以及本批新建的每个详细信息日期最晚的评分
+        self._previous: dict[tuple[int, date], Score | None] = {}
+        self._recent: dict[int, Score] = {}
+        #: 本批新登记、尚未写入名称索引的规范化名称
+        self._unsaved: dict[str, Detail] = {}
+
+        #: 以评分日期为键的有评分的详细信息ID，用于更新评分汇总，clear时保留
+        self.scored: dict[date, set[int]] = {}
+
+        #: 通过来源映射和规范化名称匹配到的缓存数量
+        self.linked: int = 0
+        self.normalized: int = 0
+        #: 内容有变化、需要UPDATE的详细信息数量
+        self.updated: int = 0
+        #: 变化没有超过阈值、没有保存的评分数量
+        self.skipped: int = 0
+
+    def merge(self, caches: list[Cache]) -> list[tuple[str, str]]:
+        """
+        @brief 合并一批缓存数据
+
+        不提交事务，也不删除缓存，由调用方处理
+
+        @param caches 缓存数据对象列表
+        @return 新创建的动画的(detail_id, picture_url)列表
+        @retval list[tuple[str, str]] 图片URL列表
+        """
+        self.load(caches)
+
+        created: list[Detail] = []
+        updated: set[int] = set()
+        pending_names: dict[str, Detail] = {}
+        matched: list[tuple[Cache, Detail]] = []
+
+        for cache in caches:
+            self.merge_state(cache)
+
+            detail: Detail | None = self.match(cache)
+            if detail is None:
+                logger.debug(f'detail {cache.name} is None, create detail')
+                detail = new_detail(cache)
+                created.append(detail)
+                if detail.web == 3:
+                    self._anidb.setdefault(int(detail.webId), detail)
+            else:
+                logger.debug(f'detail {cache.name} exists, update detail')
+                if self.web_list.index(detail.web) > self.web_list.index(self.web_id):
+                    logger.debug(f'detail {cache.name} is newer, update detail')
+                    changed: bool = merge_detail(cache, detail)
+                else:
+                    changed = merge_names(cache.all, detail)
+
+                # 同一批中新创建的详细信息还没有ID，随INSERT一起写入
+                if changed and detail.id is not None:
+                    updated.add(detail.id)
+
+            self._links[int(cache.webId)] = detail
+            self.map_names(detail.all, detail, pending_names)
+            matched.append((cache, detail))
+
+        # 新的详细信息需要先写入以获得ID，已载入记录的修改在同一次flush中按表批量更新
+        self.session.add_all(created)
+        self.session.flush()
+        for detail in created:
+            self._details[detail.id] = detail
+
+        self.load_scores(matched)
+        new_scores: list[Score] = []
+        skipped: int = 0
+        for cache, detail in matched:
+            self.scored.setdefault(cache.date, set()).add(detail.id)
+            score: Score | None = self._scores.get((detail, cache.date))
+            if score is None:
+                logger.debug(f'score {detail.id} is None, create score')
+                previous: Score | None = self.previous_score(detail, cache.date)
+                score = new_score(cache) if previous is None else carry_score(cache, previous)
+                if score is None:
+                    logger.debug(f'score {detail.id} is not changed, skip score')
+                    skipped += 1
+                    continue
+
+                score.detailId = detail.id
+                self._scores[(detail, cache.date)] = score
+                new_scores.append(score)
+                if self.storage == DELTA and (detail.id not in self._recent or self._recent[detail.id].date < score.date):
+                    self._recent[detail.id] = score
+            else:
+                logger.debug(f'score {detail.id} exists, update score')
+                merge_score(cache, score)
+
+        self.insert_links()
+        self.insert_names(pending_names)
+        self.insert_scores(new_scores)
+        self.session.flush()
+
+        # 新评分没有加入会话，之后的批次需要修改时重新从数据库载入
+        for score in new_scores:
+            del self._scores[(self._details[score.detailId], score.date)]
+            self._score_checked.discard((score.detailId, score.date))
+        if self._previous and new_scores:
+            inserted: set[int] = {score.detailId for score in new_scores}
+            for key in [key for key in self._previous if key[0] in inserted]:
+                del self._previous[key]
+
+        self.updated += len(updated)
+        self.skipped += skipped
+        self._recent.clear()
+        logger.info(f'Merge {len(caches)} caches: {len(created)} details created, {len(updated)} details updated, '
+                    f'{len(new_scores)} scores created, {skipped} scores unchanged, '
+                    f'{self.linked} matched by source, {self.normalized} matched by normalized name')
+        return [(str(detail.id), detail.picture) for detail in created]
+
+    def clear(self):
+        """
+        @brief 清空在批之间保留的数据
+
+        提交后调用，之后的批次重新从数据库载入，内存占用不随缓存数量增长
+        """
+        self._links.clear()
+        self._link_ids.clear()
+        self._link_checked.clear()
+        self._names.clear()
+        self._checked.clear()
+        self._details.clear()
+        self._anidb.clear()
+        self._anidb_checked.clear()
+        self._title_aids.clear()
+        self._aid_titles.clear()
+        self._states.clear()
+        self._scores.clear()
+        self._score_checked.clear()
+        self._previous.clear()
+        self._recent.clear()
+        self._unsaved.clear()
+
+    def load(self, caches: list[Cache]):
+        """
+        @brief 载入一批缓存涉及的来源映射、名称映射、详细信息和抓取状态
+
+        已经有来源映射的缓存不需要按名称匹配，只为其余缓存载入名称
+
+        @param caches 缓存数据对象列表
+        """
+        self.load_links(caches)
+        self.load_states(caches)
+        caches = [cache for cache in caches if int(cache.webId) not in self._links]
+
+        names: set[str] = {name for cache in caches for name in cache.all if name}
+        self.load_names(names)
+
+        if self.name_index is not None:
+            # 精确匹配失败的缓存按规范化名称在索引中查找，一次性载入命中的详细信息
+            self.load_details({
+                detail_id for cache in caches if all(self._names.get(i) is None for i in cache.all if i)
+                for detail_id in map(self.name_index.peek, cache.all) if detail_id is not None
+            })
+
+        if self.title_index is not None:
+            # 名称映射没有匹配的缓存才需要名称索引，一次性载入其名称对应的aid和这些aid的全部名称
+            unmatched: set[str] = {
+                name for cache in caches if all(self._names.get(i) is None for i in cache.all if i)
+                for name in cache.all if name and name not in self._title_aids
+            }
+            self._title_aids.update(self.title_index.title_aids(unmatched, self.session))
+            aids: set[int] = {aid for name in unmatched for aid in self._title_aids.get(name, ())}
+
+            self._aid_titles.update(self.title_index.aid_titles(aids - self._aid_titles.keys(), self.session))
+            self.load_names({title for aid in aids for title in self._aid_titles.get(aid, ())})
+            self.load_anidb(aids)
+
+    def load_links(self, caches: list[Cache]):
+        """
+        @brief 批量载入缓存来源对应的详细信息
+
+        @param caches 缓存数据对象列表
+        """
+        web_ids: set[int] = {int(cache.webId) for cache in caches} - self._link_checked
+        found: dict[int, int] = source_links(self.web_id, web_ids, self.session)
+        self._link_ids.update(found)
+        found.update(source_details(self.web_id, web_ids - found.keys(), self.session))
+
+        self.load_details(found.values())
+        for web_id, detail_id in found.items():
+            detail: Detail | None = self._details.get(detail_id)
+            if detail is not None:
+                self._links[web_id] = detail
+
+        self._link_checked.update(web_ids)
+
+    def load_names(self, names: Iterable[str]):
+        """
+        @brief 批量载入名称映射以及其对应的详细信息
+
+        @param names 名称列表
+        """
+        names = [name for name in names if name not in self._checked]
+        found: dict[str, int] = {}
+        for chunk in chunked(names):
+            found.update(self.session.execute(select(NameMap.name, NameMap.detailId).where(NameMap.name.in_(chunk))).tuples().all())
+
+        self.load_details(found.values())
+
+        self._checked.update(names)
+        for name, detail_id in found.items():
+            self._names[name] = self._details.get(detail_id)
+
+    def load_details(self, ids: Iterable[int]):
+        """
+        @brief 批量载入详细信息
+
+        @param ids 详细信息ID列表
+        """
+        for chunk in chunked(set(ids) - self._details.keys()):
+            for detail in self.session.scalars(select(Detail).where(Detail.id.in_(chunk))):
+                self._details[detail.id] = detail
+
+    def load_anidb(self, aids: Iterable[int]):
+        """
+        @brief 批量载入来源为AniDB的详细信息
+
+        @param aids aid列表
+        """
+        aids = [aid for aid in aids if aid not in self._anidb_checked]
+        for chunk in chunked(aids):
+            for detail in self.session.scalars(select(Detail).where(Detail.web == 3, Detail.webId.in_(chunk))):
+                detail = self._details.setdefault(detail.id, detail)
+                self._anidb.setdefault(int(detail.webId), detail)
+
+        self._anidb_checked.update(aids)
+
+    def load_states(self, caches: list[Cache]):
+        """
+        @brief 批量载入抓取状态
+
+        @param caches 缓存数据对象列表
+        """
+        web_ids: set[int] = {int(cache.webId) for cache in caches} - self._states.keys()
+        for chunk in chunked(web_ids):
+            for state in self.session.scalars(select(CrawlState).where(CrawlState.web == self.web_id, CrawlState.webId.in_(chunk))):
+                self._states[state.webId] = state
+
+    def load_scores(self, matched: list[tuple[Cache, Detail]]):
+        """
+        @brief 批量载入已有详细信息在缓存日期的评分
+
+        @param matched (缓存, 详细信息)列表
+        """
+        keys: set[tuple[int, date]] = {(detail.id, cache.date) for cache, detail in matched} - self._score_checked
+        if not keys:
+            return
+
+        dates: set[date] = {day for _, day in keys}
+        for chunk in chunked({detail_id for detail_id, _ in keys}):
+            for score in self.session.scalars(select(Score).where(Score.detailId.in_(chunk), Score.date.in_(dates))):
+                detail: Detail | None = self._details.get(score.detailId)
+                if detail is not None and (score.detailId, score.date) in keys:
+                    self._scores.setdefault((detail, score.date), score)
+
+        self._score_checked.update(keys)
+
+        if self.storage == DELTA:
+            self.load_previous({key for key in keys if (self._details.get(key[0]), key[1]) not in self._scores})
+
+    def load_previous(self, keys: set[tuple[int, date]]):
+        """
+        @brief 批量载入没有当天评分的详细信息在该日期之前最近的评分
+
+        @param keys (详细信息ID, 日期)集合
+        """
+        keys = keys - self._previous.keys()
+        for day in {day for _, day in keys}:
+            detail_ids: set[int] = {detail_id for detail_id, key_day in keys if key_day == day}
+            found: dict[int, Score] = previous_scores(detail_ids, day, self.session)
+            for detail_id in detail_ids:
+                self._previous[(detail_id, day)] = found.get(detail_id)
+
+    def previous_score(self, detail: Detail, day: date) -> Score | None:
+        """
+        @brief 获取详细信息在指定日期之前最近的评分
+
+        只在保存变化点时使用，本批新建的更晚的评分优先于数据库中的评分
+
+        @param detail 详细信息对象
+        @param day 日期
+        @return 评分对象，每天保存评分或没有更早的评分时返回None
+        """
+        if self.storage != DELTA:
+            return None
+
+        previous: Score | None = self._previous.get((detail.id, day))
+        recent: Score | None = self._recent.get(detail.id)
+        if recent is not None and recent.date < day and (previous is None or recent.date > previous.date):
+            return recent
+
+        return previous
+
+    def merge_state(self, cache: Cache) -> CrawlState:
+        """
+        @brief 将缓存数据合并到对应的抓取状态
+
+        @param cache 缓存数据对象
+        @return 抓取状态对象
+        """
+        state: CrawlState | None = self._states.get(int(cache.webId))
+        if state is None:
+            state = CrawlState(web=cache.web, webId=int(cache.webId), volatility=0)
+            self.session.add(state)
+            self._states[int(cache.webId)] = state
+
+        return merge_state(state, cache)
+
+    def match(self, cache: Cache) -> Detail | None:
+        """
+        @brief 在已载入的数据中查找缓存对应的详细信息
+
+        先按来源映射匹配，再按名称映射匹配，最后使用名称索引：名称唯一对应一个aid时，
+        按该aid的全部名称匹配名称映射，或匹配来源为AniDB的详细信息
+
+        @param cache 缓存数据对象
+        @return 匹配到的详细信息对象，没有匹配时返回None
+        """
+        detail: Detail | None = self._links.get(int(cache.webId))
+        if detail is not None:
+            self.linked += 1
+            return detail
+
+        # 多个名称对应不同的动画时取名称最小的一个，与按名称索引查找映射时返回的第一条记录一致
+        names: list[str] = sorted(name for name in cache.all if name)
+        for name in names:
+            detail = self._names.get(name)
+            if detail is not None:
+                return detail
+
+        if self.name_index is not None:
+            for name in names:
+                detail = self._unsaved.get(normalize(name))
+                if detail is None:
+                    detail = self._details.get(self.name_index.get(name))
+                if detail is not None:
+                    logger.debug(f'detail {cache.name} matched by normalized name {name}')
+                    self.normalized += 1
+                    return detail
+
+        if self.title_index is None:
+            return None
+
+        aids: set[int] = set()
+        for name in names:
+            aids.update(self._title_aids.get(name, ()))
+        if len(aids) != 1:
+            return None
+
+        aid: int = aids.pop()
+        for title in sorted(self._aid_titles.get(aid, ())):
+            detail = self._names.get(title)
+            if detail is not None:
+                return detail
+
+        return self._anidb.get(aid)
+
+    def map_names(self, names: Iterable[str], detail: Detail, pending: dict[str, Detail]):
+        """
+        @brief 为尚未映射的名称登记到详细信息的映射
+
+        @param names 名称列表
+        @param detail 详细信息对象
+        @param pending 待写入的名称映射
+        """
+        for name in names:
+            if name not in self._names:
+                self._names[name] = detail
+                pending[name] = detail
+                self._unsaved.setdefault(normalize(name), detail)
+
+    def insert_names(self, pending: dict[str, Detail]):
+        """
+        @brief 写入新的名称映射
+
+        没有查询过的名称可能已经存在，写入前统一查询一次并跳过已存在的名称
+
+        @param pending 待写入的名称映射
+        """
+        unchecked: list[str] = [name for name in pending if name not in self._checked]
+        for chunk in chunked(unchecked):
+            for name, detail_id in self.session.execute(select(NameMap.name, NameMap.detailId).where(NameMap.name.in_(chunk))):
+                # 已存在的名称保持原来的映射
+                self._names[name] = self._details.get(detail_id)
+                del pending[name]
+        self._checked.update(unchecked)
+
+        rows: list[dict] = [{'name': name, 'detailId': detail.id} for name, detail in pending.items()]
+        for chunk in chunked(rows):
+            self.session.execute(insert(NameMap.__table__), chunk)
+
+        # 与名称映射表保持同步，之后的批次和网站可以通过规范化名称匹配到这些名称
+        if self.name_index is not None:
+            for name, detail in pending.items():
+                self.name_index.add(name, detail.id)
+        self._unsaved.clear()
+
+    def insert_links(self):
+        """
+        @brief 写入新的来源映射
+
+        映射的详细信息已经不存在时改为指向新匹配到的详细信息
+        """
+        rows: list[dict] = []
+        for web_id, detail in self._links.items():
+            detail_id: int | None = self._link_ids.get(web_id)
+            if detail_id == detail.id:
+                continue
+
+            if detail_id is None:
+                rows.append({'web': self.web_id, 'webId': web_id, 'detailId': detail.id})
+            else:
+                self.session.execute(
+                    update(SourceLink).where(SourceLink.web == self.web_id, SourceLink.webId == web_id)
+                    .values(detailId=detail.id).execution_options(synchronize_session=False)
+                )
+            self._link_ids[web_id] = detail.id
+
+        for chunk in chunked(rows):
+            self.session.execute(insert(SourceLink.__table__), chunk)
+
+    def insert_scores(self, scores: list[Score]):
+        """
+        @brief 写入新的评分
+
+        评分写入后不再作为ORM对象使用，直接使用多行INSERT
+
+        @param scores 评分对象列表
+        """
+        rows: list[dict] = [
+            {'detailId': score.detailId, 'detailScore': score.detailScore, 'score': score.score, 'vote': score.vote, 'date': score.date}
+            for score in scores
+        ]
+        for chunk in chunked(rows):
+            self.session.execute(insert(Score.__table__), chunk)
+
+
+if __name__ == '__main__':
+    pass
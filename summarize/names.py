@@ -0,0 +1,137 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file names.py
+@brief 规范化名称索引模块
+@details 在进程内保存规范化名称到动画ID的映射。名称经过NFKC、casefold和空白折叠后比较，
+         全角字符、大小写和空白不同的同一名称可以匹配到已收录的动画。索引按LRU淘汰，
+         在常驻进程中内存占用有上限；被淘汰的名称只是失去规范化匹配，精确匹配仍由名称映射表完成
+"""
+
+from collections import OrderedDict
+from unicodedata import normalize as unicode_normalize
+from logging import getLogger
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database.model import NameMap
+
+logger = getLogger(__name__)
+
+#: 索引最多保存的规范化名称数量
+NAME_INDEX_CAPACITY = 200000
+
+#: 载入名称映射时每次从数据库读取的行数
+LOAD_BATCH = 10000
+
+
+def normalize(name: str) -> str:
+    """
+    @brief 规范化名称
+
+    NFKC把全角字母、数字和符号转换为半角，casefold忽略大小写，连续空白折叠为一个空格
+
+    @param name 名称
+    @return 规范化后的名称
+    """
+    return ' '.join(unicode_normalize('NFKC', name).casefold().split())
+
+
+class NameIndex(object):
+    """
+    @brief 规范化名称索引
+
+    规范化后相同的名称对应多个动画时保留最先登记的一个
+    """
+
+    def __init__(self, capacity: int = NAME_INDEX_CAPACITY):
+        """
+        @brief 初始化NameIndex对象
+
+        @param capacity 最多保存的规范化名称数量
+        """
+        self.capacity: int = capacity
+        self._index: OrderedDict[str, int] = OrderedDict()
+
+        #: 查找次数和命中次数，用于统计命中率
+        self.lookups: int = 0
+        self.hits: int = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def load(self, session: Session) -> int:
+        """
+        @brief 从名称映射表重新载入索引
+
+        @param session 数据库会话对象
+        @return 载入的名称数量
+        @retval int 名称数量
+        """
+        self._index.clear()
+
+        number: int = 0
+        rows = session.execute(
+            select(NameMap.name, NameMap.detailId).order_by(NameMap.id).execution_options(yield_per=LOAD_BATCH)
+        )
+        for name, detail_id in rows:
+            self.add(name, detail_id)
+            number += 1
+
+        logger.info(f'Load {number} names into name index, {len(self._index)} kept')
+        return number
+
+    def add(self, name: str, detail_id: int):
+        """
+        @brief 登记名称
+
+        @param name 名称
+        @param detail_id 动画ID
+        """
+        if not name:
+            return
+
+        key: str = normalize(name)
+        if key in self._index:
+            self._index.move_to_end(key)
+            return
+
+        self._index[key] = detail_id
+        if len(self._index) > self.capacity:
+            self._index.popitem(last=False)
+
+    def get(self, name: str) -> int | None:
+        """
+        @brief 查找名称对应的动画ID
+
+        @param name 名称
+        @return 动画ID，没有匹配时返回None
+        """
+        if not name:
+            return None
+
+        self.lookups += 1
+        key: str = normalize(name)
+        detail_id: int | None = self._index.get(key)
+        if detail_id is not None:
+            self._index.move_to_end(key)
+            self.hits += 1
+
+        return detail_id
+
+    def peek(self, name: str) -> int | None:
+        """
+        @brief 查找名称对应的动画ID，不计入命中率，也不更新LRU顺序
+
+        用于匹配之前预先载入详细信息，之后的匹配仍然使用get
+
+        @param name 名称
+        @return 动画ID，没有匹配时返回None
+        """
+        return self._index.get(normalize(name)) if name else None
+
+
+if __name__ == '__main__':
+    pass
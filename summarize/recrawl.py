@@ -0,0 +1,149 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file recrawl.py
+@brief 增量重抓策略模块
+@details 根据上次抓取时间、放送状态和近期评分波动，决定每个(web, webId)的详情页是否需要重新抓取
+"""
+
+from datetime import date, datetime
+from logging import getLogger
+
+from sqlalchemy.orm import Session
+
+from database.model import Cache, CrawlState, SessionFactory
+from database.data import DEFAULT_TZ
+
+logger = getLogger(__name__)
+
+#: 放送中（放送日期前后该天数内）的动画重抓间隔（天）
+AIRING_DAYS = 90
+AIRING_INTERVAL = 1
+
+#: 放送结束一年内的动画重抓间隔（天）
+RECENT_DAYS = 365
+RECENT_INTERVAL = 7
+
+#: 更早的动画重抓间隔（天）
+ARCHIVE_INTERVAL = 30
+
+#: 评分波动超过该值时视为不稳定，重抓间隔缩短为原来的四分之一
+VOLATILE_THRESHOLD = 0.05
+
+#: 评分波动指数移动平均的平滑系数
+VOLATILITY_ALPHA = 0.3
+
+
+class RecrawlPolicy(object):
+    """
+    @brief 增量重抓策略
+
+    一次性加载指定网站的全部抓取状态，之后在内存中判断每个详情页是否到期
+    """
+
+    def __init__(self, web: int, today: date | None = None):
+        """
+        @brief 初始化重抓策略
+
+        @param web 网站ID
+        @param today 判断到期使用的日期，默认为当前日期
+        """
+        self.web: int = web
+        self.today: date = today if today else datetime.now(DEFAULT_TZ).date()
+
+        with SessionFactory() as session:
+            states: list[CrawlState] = session.query(CrawlState).filter(CrawlState.web == web).all()  # type: ignore
+            self._states: dict[int, CrawlState] = {state.webId: state for state in states}
+
+        logger.debug(f'Load {len(self._states)} crawl states of web {web}')
+
+    def interval(self, state: CrawlState) -> int:
+        """
+        @brief 计算详情页的重抓间隔
+
+        @param state 抓取状态
+        @return 重抓间隔天数
+        @retval int 间隔天数
+        """
+        if state.airDate is None or (self.today - state.airDate).days <= AIRING_DAYS:
+            interval: int = AIRING_INTERVAL
+        elif (self.today - state.airDate).days <= RECENT_DAYS:
+            interval: int = RECENT_INTERVAL
+        else:
+            interval: int = ARCHIVE_INTERVAL
+
+        if state.volatility > VOLATILE_THRESHOLD:
+            interval = max(AIRING_INTERVAL, interval // 4)
+
+        return interval
+
+    def due(self, web_id: int) -> bool:
+        """
+        @brief 判断详情页是否需要重新抓取
+
+        没有抓取记录的详情页总是需要抓取
+
+        @param web_id 在来源网站的ID
+        @return 需要抓取返回True
+        @retval bool 是否到期
+        """
+        state: CrawlState | None = self._states.get(int(web_id))
+        if state is None:
+            return True
+
+        return (self.today - state.lastFetch).days >= self.interval(state)
+
+    def filter[T](self, items: list[tuple[int, T]]) -> list[T]:
+        """
+        @brief 过滤出需要重新抓取的条目
+
+        @param items (webId, 条目)元组列表
+        @return 到期的条目列表
+        @retval list 到期的条目
+        """
+        result: list[T] = [item for web_id, item in items if self.due(web_id)]
+        logger.info(f'{len(result)}/{len(items)} detail pages of web {self.web} are due')
+        return result
+
+
+def update_state(cache: Cache, session: Session) -> CrawlState:
+    """
+    @brief 根据缓存数据更新抓取状态
+
+    @param cache 缓存数据对象
+    @param session 数据库会话对象
+    @return 更新后的抓取状态
+    @retval CrawlState 抓取状态对象
+    """
+    state: CrawlState | None = session.get(CrawlState, (cache.web, int(cache.webId)))
+
+    if state is None:
+        state = CrawlState(web=cache.web, webId=int(cache.webId), volatility=0)
+        session.add(state)
+
+    return merge_state(state, cache)
+
+
+def merge_state(state: CrawlState, cache: Cache) -> CrawlState:
+    """
+    @brief 将缓存数据合并到抓取状态
+
+    @param state 抓取状态对象，新建的状态的score为None
+    @param cache 缓存数据对象
+    @return 合并后的抓取状态
+    @retval CrawlState 抓取状态对象
+    """
+    if state.score is not None and cache.score is not None:
+        change: float = abs(float(cache.score) - float(state.score))
+        state.volatility = (1 - VOLATILITY_ALPHA) * state.volatility + VOLATILITY_ALPHA * change
+
+    state.lastFetch = cache.date
+    state.airDate = cache.time
+    state.score = cache.score
+
+    return state
+
+
+if __name__ == '__main__':
+    pass
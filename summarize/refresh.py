@@ -0,0 +1,142 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file refresh.py
+@brief 仅评分刷新模块
+@details 使用列表页或轻量接口中的评分直接更新已知动画的评分记录，
+         只有尚未收录的动画才需要抓取详情页
+"""
+
+from typing import Callable, Iterable
+from datetime import date, datetime
+from logging import getLogger
+
+from sqlalchemy.orm import Session
+
+from database.model import Cache, Detail, Score, SessionFactory
+from database.data import DEFAULT_TZ
+from summarize.collect import Collect
+from summarize.merge import source_links, source_details, carry_score
+from summarize.series import DELTA, get_storage, previous_scores
+from summarize.rollup import refresh
+
+logger = getLogger(__name__)
+
+
+class ScoreRefresh(object):
+    """
+    @brief 仅评分刷新类
+
+    根据来源映射查找已收录的动画，按与Collect相同的规则合并当天的评分
+    """
+
+    def __init__(self, web: int, resolve: Callable[[Iterable[int], Session], dict[int, Detail]] | None = None):
+        """
+        @brief 初始化ScoreRefresh对象
+
+        @param web 网站ID
+        @param resolve 可选的补充查找函数，用于查找来源不是该网站但已收录的动画
+        """
+        self.web: int = web
+        self._resolve: Callable[[Iterable[int], Session], dict[int, Detail]] | None = resolve
+
+    def apply(self, ratings: dict[int, tuple[float, int | None] | None], today: date | None = None) -> list[int]:
+        """
+        @brief 更新已收录动画的评分
+
+        列表页没有评分的已收录动画会被跳过。列表页没有投票人数时沿用该网站最近一次的投票人数，
+        总评分中各网站的权重不变，没有记录过投票人数的动画同样跳过
+
+        @param ratings 以webId为键，(评分, 投票人数)为值的字典，没有评分时值为None，没有投票人数时投票人数为None
+        @param today 评分日期，重解析归档时为抓取日期，为None时使用默认时区的当前日期
+        @return 尚未收录的webId列表，需要抓取详情页
+        @retval list[int] 未收录的webId列表
+        """
+        today = today if today else datetime.now(DEFAULT_TZ).date()
+
+        with SessionFactory() as session:
+            found: dict[int, int] = source_links(self.web, ratings.keys(), session)
+            found.update(source_details(self.web, ratings.keys() - found.keys(), session))
+
+            details: dict[int, Detail] = {
+                detail.id: detail for detail in session.query(Detail).filter(Detail.id.in_(set(found.values())))
+            }
+            known: dict[int, Detail] = {
+                web_id: details[detail_id] for web_id, detail_id in found.items() if detail_id in details
+            }
+
+            if self._resolve is not None:
+                missing: list[int] = [web_id for web_id in ratings if web_id not in known]
+                for web_id, detail in self._resolve(missing, session).items():
+                    known.setdefault(web_id, detail)
+
+            scores: list[Score] = session.query(Score).filter(
+                Score.detailId.in_([detail.id for detail in known.values()]),
+                Score.date == today
+            ).all()  # type: ignore
+            exists: dict[int, Score] = {score.detailId: score for score in scores}
+
+            # 只保存变化点时，没有当天评分的动画与之前最近的评分比较；没有投票人数时从之前的评分中沿用
+            delta: bool = get_storage() == DELTA
+            previous: dict[int, Score] = {}
+            if delta or any(rating is not None and rating[1] is None for rating in ratings.values()):
+                previous = previous_scores(
+                    [detail.id for detail in known.values() if detail.id not in exists], today, session
+                )
+
+            updated: int = 0
+            skipped: int = 0
+            for web_id, detail in known.items():
+                rating: tuple[float, int | None] | None = ratings[web_id]
+                if rating is None:
+                    continue
+
+                vote: int | None = rating[1]
+                if vote is None:
+                    vote = self.last_vote(exists.get(detail.id) or previous.get(detail.id))
+                    if vote is None:
+                        continue
+
+                cache: Cache = Cache(web=self.web, webId=web_id, score=rating[0], vote=vote, date=today)
+                if detail.id in exists:
+                    Collect.update_score(cache, exists[detail.id])
+                elif delta and detail.id in previous:
+                    score: Score | None = carry_score(cache, previous[detail.id])
+                    if score is None:
+                        skipped += 1
+                        continue
+
+                    score.detailId = detail.id
+                    session.add(score)
+                    exists[detail.id] = score
+                else:
+                    Collect.create_score(cache, detail, session)
+                updated += 1
+
+            session.commit()
+
+            refresh({today: {detail.id for web_id, detail in known.items() if ratings[web_id] is not None}}, session)
+            session.commit()
+
+        unknown: list[int] = [web_id for web_id in ratings if web_id not in known]
+        logger.info(f'Refresh {updated} scores of web {self.web}, {skipped} scores unchanged, '
+                    f'{len(unknown)} anime are not collected yet')
+        return unknown
+
+    def last_vote(self, score: Score | None) -> int | None:
+        """
+        @brief 获取评分记录中该网站的投票人数
+
+        @param score 评分对象
+        @return 投票人数，没有该网站的评分时返回None
+        """
+        if score is None:
+            return None
+
+        rating: list | None = score.detailScore.get(str(self.web))
+        return rating[1] if rating else None
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,354 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file rollup.py
+@brief 评分汇总和保留模块
+@details 按周和按月汇总逐日评分，长时间范围的趋势和排名查询读取汇总表，不需要扫描评分表。
+         每次Collect之后只重新计算这次涉及的动画和周期；配置了保留天数时，过期的逐日评分在汇总之后删除。
+         MySQL的评分表按季度分区（见create.sql），过期的分区整个删除，同时预先创建之后的分区
+"""
+
+from typing import Callable
+from datetime import date, datetime, timedelta
+from logging import getLogger
+
+from sqlalchemy import select, delete, insert, func, and_, text, literal, exists
+from sqlalchemy.orm import Session, aliased
+
+import constant
+from database.model import Score, ScoreWeek, ScoreMonth
+from database.data import ScoreData, DEFAULT_TZ, chunked
+from summarize.series import daily_scores
+
+logger = getLogger(__name__)
+
+#: 预先创建的季度分区数量
+PARTITIONS_AHEAD = 4
+
+
+def week_start(day: date) -> date:
+    """
+    @brief 获取日期所在周的周一
+    """
+    return day - timedelta(days=day.weekday())
+
+
+def week_end(start: date) -> date:
+    """
+    @brief 获取周一所在周的周日
+    """
+    return start + timedelta(days=6)
+
+
+def month_start(day: date) -> date:
+    """
+    @brief 获取日期所在月的一日
+    """
+    return day.replace(day=1)
+
+
+def month_end(start: date) -> date:
+    """
+    @brief 获取一日所在月的最后一天
+    """
+    return (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+#: 汇总表及其周期的开始和结束日期函数
+ROLLUPS: dict[type, tuple[Callable[[date], date], Callable[[date], date]]] = {
+    ScoreWeek: (week_start, week_end),
+    ScoreMonth: (month_start, month_end),
+}
+
+
+def get_retention() -> int | None:
+    """
+    @brief 获取逐日评分的保留天数
+    @return 天数，未配置时返回None，不删除逐日评分
+    """
+    days: str | None = constant.SCORE_RETENTION_DAYS
+    return int(days) if days else None
+
+
+def aggregate(days: list[ScoreData]) -> dict:
+    """
+    @brief 汇总一个周期的逐日评分
+
+    @param days 按日期排列的逐日评分
+    @return 汇总表的一行，不包含动画ID和周期
+    """
+    scores: list[float] = [day.score for day in days if day.score is not None]
+    return {
+        'score': sum(scores) / len(scores) if scores else None,
+        'scoreMin': min(scores, default=None),
+        'scoreMax': max(scores, default=None),
+        'vote': days[-1].vote,
+        'days': len(days),
+    }
+
+
+def refresh(touched: dict[date, set[int]], session: Session) -> int:
+    """
+    @brief 重新计算涉及的动画在涉及的周期的汇总
+
+    每个动画只统计到这次涉及的最晚日期，之后的日期在以后的Collect中补上
+
+    @param touched 以评分日期为键、这一天有评分的动画ID集合为值的字典
+    @param session 数据库会话对象
+    @return 写入的汇总行数
+    """
+    number: int = 0
+    for model, (start_of, _) in ROLLUPS.items():
+        periods: dict[date, dict[int, date]] = {}
+        for day, detail_ids in touched.items():
+            ends: dict[int, date] = periods.setdefault(start_of(day), {})
+            for detail_id in detail_ids:
+                ends[detail_id] = max(ends.get(detail_id, day), day)
+
+        for start, ends in periods.items():
+            number += rollup(model, start, ends, session)
+
+    logger.info(f'Refresh {number} score rollups')
+    return number
+
+
+def rollup(model: type, start: date, ends: dict[int, date], session: Session) -> int:
+    """
+    @brief 计算动画在一个周期的汇总并替换已有的汇总
+
+    @param model 汇总表
+    @param start 周期的开始日期
+    @param ends 以动画ID为键、统计的结束日期为值的字典，结束日期不能超过周期的最后一天
+    @param session 数据库会话对象
+    @return 写入的汇总行数
+    """
+    number: int = 0
+    for chunk in chunked(ends):
+        series: dict[int, list[ScoreData]] = daily_scores(chunk, start, max(ends[i] for i in chunk), session)
+        session.execute(
+            delete(model).where(model.detailId.in_(chunk), model.start == start).execution_options(synchronize_session=False)
+        )
+
+        rows: list[dict] = []
+        for detail_id, days in series.items():
+            days = [day for day in days if day.date <= ends[detail_id]]
+            if days:
+                rows.append({'detailId': detail_id, 'start': start, **aggregate(days)})
+        if rows:
+            session.execute(insert(model.__table__), rows)
+        number += len(rows)
+
+    return number
+
+
+def rebuild(start: date, end: date, session: Session, missing: bool = False) -> int:
+    """
+    @brief 按评分表重新计算日期范围内的汇总
+
+    用于补齐汇总表建立之前的历史数据。周期内有评分记录的动画统计到其最后一条记录的日期，
+    只保存变化点时，最后一个变化点之后没有变化的日期不计入
+
+    @param start 开始日期
+    @param end 结束日期，包含当天
+    @param session 数据库会话对象
+    @param missing 为True时跳过已经有汇总的周期
+    @return 写入的汇总行数
+    """
+    number: int = 0
+    for model, (start_of, end_of) in ROLLUPS.items():
+        period: date = start_of(start)
+        while period <= end:
+            last: date = min(end_of(period), end)
+            if not missing or session.scalar(select(model.detailId).where(model.start == period).limit(1)) is None:
+                ends: dict[int, date] = dict(session.execute(
+                    select(Score.detailId, func.max(Score.date))
+                    .where(Score.date >= period, Score.date <= last)
+                    .group_by(Score.detailId)
+                ).tuples().all())
+                number += rollup(model, period, ends, session)
+            period = end_of(period) + timedelta(days=1)
+
+    logger.info(f'Rebuild {number} score rollups from {start} to {end}')
+    return number
+
+
+def quarter_key(day: date) -> int:
+    """
+    @brief 计算日期的分区键，与create.sql中的 YEAR(date) * 10 + QUARTER(date) 相同
+    """
+    return day.year * 10 + (day.month - 1) // 3 + 1
+
+
+def key_date(key: int) -> date:
+    """
+    @brief 计算分区键对应季度的第一天
+    """
+    return date(key // 10, (key % 10 - 1) * 3 + 1, 1)
+
+
+def next_key(key: int) -> int:
+    """
+    @brief 计算下一个季度的分区键
+    """
+    return key + 1 if key % 10 < 4 else (key // 10 + 1) * 10 + 1
+
+
+def partitions(session: Session) -> dict[str, int | None]:
+    """
+    @brief 查询MySQL中评分表的分区
+
+    @param session 数据库会话对象
+    @return 以分区名为键、分区上界为值的字典，MAXVALUE为None，没有分区或不是MySQL时为空
+    """
+    if session.get_bind().dialect.name != 'mysql':
+        return {}
+
+    rows = session.execute(text(
+        'SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL '
+        'ORDER BY PARTITION_ORDINAL_POSITION'
+    ), {'table': Score.__tablename__})
+    return {name: None if bound == 'MAXVALUE' else int(bound) for name, bound in rows}
+
+
+def extend_partitions(session: Session, today: date) -> int:
+    """
+    @brief 从MAXVALUE分区中拆分出之后的季度分区
+
+    MAXVALUE分区中已经有数据时拆分需要移动数据，因此预先拆分，保持其为空
+
+    @param session 数据库会话对象
+    @param today 当前日期
+    @return 新建的分区数量
+    """
+    found: dict[str, int | None] = partitions(session)
+    bounds: list[int] = [bound for bound in found.values() if bound is not None]
+    future: list[str] = [name for name, bound in found.items() if bound is None]
+    if not bounds or not future:
+        return 0
+
+    target: int = quarter_key(today)
+    for _ in range(PARTITIONS_AHEAD):
+        target = next_key(target)
+
+    keys: list[int] = []
+    key: int = max(bounds)
+    while key <= target:
+        keys.append(key)
+        key = next_key(key)
+    if not keys:
+        return 0
+
+    # 分区p2027q3保存上界20274之前的数据
+    definitions: list[str] = [
+        f'PARTITION p{key // 10}q{key % 10} VALUES LESS THAN ({next_key(key)})' for key in keys
+    ] + [f'PARTITION {future[0]} VALUES LESS THAN MAXVALUE']
+    session.execute(text(
+        f'ALTER TABLE {Score.__tablename__} REORGANIZE PARTITION {future[0]} INTO ({", ".join(definitions)})'
+    ))
+    logger.info(f'Add {len(keys)} score partitions')
+    return len(keys)
+
+
+def rebase(cutoff: date, session: Session) -> int:
+    """
+    @brief 把截止日期之后没有评分的动画在截止日期之前最近的评分复制到截止日期
+
+    这些动画的评分会全部被删除，复制之后截止日期之后的逐日评分仍然可以还原。截止日期之后已有评分的动画不复制，
+    不为仍在更新的动画制造额外的记录，截止日期到其第一条评分之间的日期只保留在汇总中
+
+    @param cutoff 截止日期
+    @param session 数据库会话对象
+    @return 复制的评分数量
+    """
+    latest = (
+        select(Score.detailId, func.max(Score.date).label('date'))
+        .where(Score.date < cutoff)
+        .group_by(Score.detailId)
+        .subquery()
+    )
+    current = aliased(Score)
+    rows = (
+        select(Score.detailId, Score.detailScore, Score.score, Score.vote, literal(cutoff, Score.date.type))
+        .join(latest, and_(Score.detailId == latest.c.detailId, Score.date == latest.c.date))
+        .where(~exists().where(current.detailId == Score.detailId, current.date >= cutoff))
+    )
+    result = session.execute(
+        insert(Score).from_select(['detailId', 'detailScore', 'score', 'vote', 'date'], rows)
+    )
+    return result.rowcount
+
+
+def prune(session: Session, today: date, days: int) -> date | None:
+    """
+    @brief 删除超过保留天数的逐日评分
+
+    先补齐截止日期之前的汇总，再把截止日期之后没有评分的动画最近的评分复制到截止日期。评分表有分区时只删除整个过期的分区，
+    截止日期对齐到分区边界；没有分区时截止日期对齐到月初，每月只删除和复制一次，然后分批删除。
+    跨越截止日期的周期之后重新汇总时只统计截止日期之后的评分
+
+    @param session 数据库会话对象
+    @param today 当前日期
+    @param days 保留天数
+    @return 实际的截止日期，没有需要删除的评分时返回None
+    """
+    cutoff: date = today - timedelta(days=days)
+
+    expired: list[str] = []
+    found: dict[str, int | None] = partitions(session)
+    if found:
+        expired = [name for name, bound in found.items() if bound is not None and key_date(bound) <= cutoff]
+        if not expired:
+            return None
+        cutoff = max(key_date(found[name]) for name in expired)
+    else:
+        # 截止日期每天变化时，不再更新的动画每天都要重新复制一次评分
+        cutoff = month_start(cutoff)
+
+    oldest: date | None = session.scalar(select(func.min(Score.date)))
+    if oldest is None or oldest >= cutoff:
+        return None
+
+    rebuild(oldest, cutoff - timedelta(days=1), session, missing=True)
+    rebase(cutoff, session)
+    session.commit()
+
+    if expired:
+        session.execute(text(f'ALTER TABLE {Score.__tablename__} DROP PARTITION {", ".join(expired)}'))
+        logger.info(f'Drop score partitions {", ".join(expired)}')
+    else:
+        while True:
+            ids: list[int] = list(session.scalars(select(Score.id).where(Score.date < cutoff).limit(10000)))
+            if not ids:
+                break
+            for chunk in chunked(ids):
+                session.execute(delete(Score).where(Score.id.in_(chunk)).execution_options(synchronize_session=False))
+            session.commit()
+        logger.info(f'Delete scores before {cutoff}')
+
+    return cutoff
+
+
+def maintain(touched: dict[date, set[int]], session: Session):
+    """
+    @brief Collect之后维护评分汇总、分区和保留期
+
+    @param touched 以评分日期为键、这一天有评分的动画ID集合为值的字典
+    @param session 数据库会话对象
+    """
+    today: date = datetime.now(DEFAULT_TZ).date()
+
+    refresh(touched, session)
+    session.commit()
+
+    extend_partitions(session, today)
+
+    days: int | None = get_retention()
+    if days is not None:
+        prune(session, today, days)
+    session.commit()
+
+
+if __name__ == '__main__':
+    pass
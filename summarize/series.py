@@ -0,0 +1,134 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file series.py
+@brief 评分时间序列模块
+@details 评分可以每天保存一条，也可以只在变化超过阈值时保存一条（变化点）。每条评分记录都是当天各网站评分的完整快照，
+         某一天的评分等于该日期及之前最近的一条记录，因此两种保存方式可以使用同一个函数还原逐日序列
+"""
+
+from typing import Iterable
+from datetime import date, timedelta
+from dataclasses import replace
+
+from sqlalchemy import select, func, and_
+from sqlalchemy.orm import Session
+
+import constant
+from database.model import Score
+from database.data import ScoreData, chunked
+
+#: 评分保存方式，每天保存一条
+DAILY = 'daily'
+#: 评分保存方式，只保存变化点
+DELTA = 'delta'
+
+#: 网站评分的变化达到该值时保存新的变化点
+SCORE_THRESHOLD = 0.01
+#: 网站投票人数的相对变化达到该比例时保存新的变化点
+VOTE_THRESHOLD = 0.01
+
+
+def get_storage() -> str:
+    """
+    @brief 获取配置的评分保存方式
+    @return daily 或 delta，未配置时为daily
+    """
+    storage: str = (constant.SCORE_STORAGE or DAILY).lower()
+    if storage not in (DAILY, DELTA):
+        raise ValueError(f'Unsupported score storage: {storage}')
+
+    return storage
+
+
+def score_changed(previous: dict[str, list], current: dict[str, list]) -> bool:
+    """
+    @brief 判断详细评分相对上一个变化点是否有足够大的变化
+
+    出现新的网站、某个网站的评分变化达到SCORE_THRESHOLD或投票人数的相对变化达到VOTE_THRESHOLD时视为变化
+
+    @param previous 上一个变化点的详细评分
+    @param current 当前的详细评分
+    @return 是否需要保存新的变化点
+    """
+    for web, (score, vote) in current.items():
+        if web not in previous:
+            return True
+
+        last_score, last_vote = previous[web]
+        if abs(score - last_score) >= SCORE_THRESHOLD:
+            return True
+        if abs(vote - last_vote) >= VOTE_THRESHOLD * max(last_vote, 1):
+            return True
+
+    return False
+
+
+def previous_scores(detail_ids: Iterable[int], day: date, session: Session) -> dict[int, Score]:
+    """
+    @brief 批量查询每个动画在指定日期之前最近的一条评分
+
+    @param detail_ids 动画ID列表
+    @param day 日期，不包含当天
+    @param session 数据库会话对象
+    @return 以动画ID为键的评分对象字典，没有更早评分的动画不在其中
+    """
+    found: dict[int, Score] = {}
+    for chunk in chunked(set(detail_ids)):
+        latest = (
+            select(Score.detailId, func.max(Score.date).label('date'))
+            .where(Score.detailId.in_(chunk), Score.date < day)
+            .group_by(Score.detailId)
+            .subquery()
+        )
+        for score in session.scalars(
+            select(Score).join(latest, and_(Score.detailId == latest.c.detailId, Score.date == latest.c.date))
+        ):
+            found.setdefault(score.detailId, score)
+
+    return found
+
+
+def daily_scores(detail_ids: Iterable[int], start: date, end: date, session: Session) -> dict[int, list[ScoreData]]:
+    """
+    @brief 还原动画在日期范围内的逐日评分
+
+    每一天使用该日期及之前最近的一条评分，第一条评分之前的日期没有数据。
+    还原出的评分不对应数据库中的记录，id为None
+
+    @param detail_ids 动画ID列表
+    @param start 开始日期，包含当天
+    @param end 结束日期，包含当天
+    @param session 数据库会话对象
+    @return 以动画ID为键，按日期排列的评分列表
+    """
+    detail_ids = set(detail_ids)
+    points: dict[int, list[Score]] = {
+        detail_id: [score] for detail_id, score in previous_scores(detail_ids, start + timedelta(days=1), session).items()
+    }
+    for chunk in chunked(detail_ids):
+        for score in session.scalars(
+            select(Score)
+            .where(Score.detailId.in_(chunk), Score.date > start, Score.date <= end)
+            .order_by(Score.detailId, Score.date)
+        ):
+            points.setdefault(score.detailId, []).append(score)
+
+    series: dict[int, list[ScoreData]] = {}
+    for detail_id, changes in points.items():
+        days: list[ScoreData] = []
+        index: int = 0
+        day: date = max(start, changes[0].date)
+        while day <= end:
+            while index + 1 < len(changes) and changes[index + 1].date <= day:
+                index += 1
+            days.append(replace(ScoreData.from_orm(changes[index]), id=None, date=day))
+            day += timedelta(days=1)
+        series[detail_id] = days
+
+    return series
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,220 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file titles.py
+@brief AniDB名称数据导入模块
+@details 流式读取AniDB每日发布的 anime-titles.xml.gz，建立本地的aid与名称索引，
+         使Collect和爬虫可以离线解析动画名称和aid，减少对AniDB HTTP API的调用
+"""
+
+from typing import IO, Iterable, Iterator
+from datetime import datetime, timedelta
+from pathlib import Path
+from gzip import GzipFile
+from logging import getLogger
+
+from httpx import Client, HTTPError
+from lxml import etree
+from sqlalchemy import select, insert, delete
+from sqlalchemy.orm import Session
+
+from database.model import AniDBTitle, Detail, NameMap, SessionFactory
+from database.data import chunked
+
+logger = getLogger(__name__)
+
+TITLES_URL = 'https://anidb.net/api/anime-titles.xml.gz'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+#: AniDB要求名称数据每天最多下载一次
+DOWNLOAD_INTERVAL = timedelta(days=1)
+
+#: 每批写入数据库的名称数量
+INSERT_BATCH = 5000
+
+
+def iter_titles(source: IO[bytes]) -> Iterator[tuple[int, list[tuple[str, str, str]]]]:
+    """
+    @brief 流式解析名称数据
+
+    每解析完一个anime元素就立即清理，内存占用与文件大小无关
+
+    @param source 未压缩的XML字节流
+    @return (aid, [(类型, 语言, 名称), ...]) 迭代器
+    """
+    for _, element in etree.iterparse(source, events=('end',), tag='anime'):
+        titles: list[tuple[str, str, str]] = []
+        for title in element.iterchildren('title'):
+            if title.text:
+                titles.append((title.get('type'), title.get(XML_LANG), title.text.strip()))
+
+        yield int(element.get('aid')), titles
+
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+class TitleIndex(object):
+    """
+    @brief AniDB名称索引
+
+    负责下载和导入名称数据，并提供按aid和按名称的离线查询
+    """
+
+    def __init__(self, path: str = './anime-titles.xml.gz'):
+        """
+        @brief 初始化名称索引
+
+        @param path 名称数据文件的本地路径
+        """
+        self.path: Path = Path(path)
+
+    def download(self, user_agent: str = 'animescrapy') -> bool:
+        """
+        @brief 下载名称数据
+
+        本地文件不足一天时不会重新下载
+
+        @param user_agent 请求使用的User-Agent
+        @return 是否下载了新文件
+        @retval bool 下载成功返回True
+        """
+        if self.path.exists():
+            modified: datetime = datetime.fromtimestamp(self.path.stat().st_mtime)
+            if datetime.now() - modified < DOWNLOAD_INTERVAL:
+                logger.debug(f'{self.path} is up to date, skip download')
+                return False
+
+        temporary: Path = self.path.with_suffix(self.path.suffix + '.part')
+        try:
+            with Client(headers={'user-agent': user_agent}, timeout=60, follow_redirects=True) as client:
+                with client.stream('GET', TITLES_URL) as response:
+                    response.raise_for_status()
+                    with temporary.open('wb') as f:
+                        for chunk in response.iter_bytes():
+                            f.write(chunk)
+        except HTTPError as e:
+            logger.error(f'Download {TITLES_URL} failed: {e}', exc_info=True)
+            temporary.unlink(missing_ok=True)
+            return False
+
+        temporary.replace(self.path)
+        logger.info(f'Download {TITLES_URL} to {self.path} successfully')
+        return True
+
+    def ingest(self, path: str | None = None) -> int:
+        """
+        @brief 导入名称数据
+
+        清空原有索引后分批写入，支持gzip压缩或未压缩的文件
+
+        @param path 名称数据文件路径，默认为初始化时指定的路径
+        @return 导入的名称数量
+        @retval int 名称数量
+        """
+        source: Path = Path(path) if path else self.path
+
+        with source.open('rb') as raw:
+            gzipped: bool = raw.read(2) == b'\x1f\x8b'
+            raw.seek(0)
+            stream: IO[bytes] = GzipFile(fileobj=raw) if gzipped else raw
+
+            number: int = 0
+            with SessionFactory() as session:
+                session.execute(delete(AniDBTitle))
+
+                rows: list[dict] = []
+                for aid, titles in iter_titles(stream):
+                    rows.extend({'aid': aid, 'type': type_, 'lang': lang, 'title': title} for type_, lang, title in titles)
+
+                    if len(rows) >= INSERT_BATCH:
+                        session.execute(insert(AniDBTitle), rows)
+                        number += len(rows)
+                        rows = []
+
+                if rows:
+                    session.execute(insert(AniDBTitle), rows)
+                    number += len(rows)
+
+                session.commit()
+
+        logger.info(f'Ingest {number} titles from {source}')
+        return number
+
+    def update(self) -> int:
+        """
+        @brief 下载并导入最新的名称数据
+
+        @return 导入的名称数量，没有新文件时返回0
+        @retval int 名称数量
+        """
+        if not self.download():
+            return 0
+
+        return self.ingest()
+
+    @staticmethod
+    def title_aids(names: Iterable[str], session: Session) -> dict[str, set[int]]:
+        """
+        @brief 批量查询名称对应的aid
+
+        @param names 名称列表
+        @param session 数据库会话对象
+        @return 以名称为键的aid集合字典，没有对应aid的名称不在字典中
+        @retval dict[str, set[int]] aid集合字典
+        """
+        result: dict[str, set[int]] = {}
+        for chunk in chunked({name for name in names if name}):
+            for title, aid in session.execute(select(AniDBTitle.title, AniDBTitle.aid).where(AniDBTitle.title.in_(chunk))):
+                result.setdefault(title, set()).add(aid)
+
+        return result
+
+    @staticmethod
+    def aid_titles(aids: Iterable[int], session: Session) -> dict[int, list[str]]:
+        """
+        @brief 批量查询aid对应的全部名称
+
+        @param aids aid列表
+        @param session 数据库会话对象
+        @return 以aid为键的名称列表字典
+        @retval dict[int, list[str]] 名称列表字典
+        """
+        result: dict[int, list[str]] = {}
+        for chunk in chunked(set(aids)):
+            for aid, title in session.execute(select(AniDBTitle.aid, AniDBTitle.title).where(AniDBTitle.aid.in_(chunk))):
+                result.setdefault(aid, []).append(title)
+
+        return result
+
+    def details(self, aids: Iterable[int], session: Session) -> dict[int, Detail]:
+        """
+        @brief 批量查询aid对应的已收录动画
+
+        @param aids aid列表
+        @param session 数据库会话对象
+        @return 以aid为键的详细信息字典
+        @retval dict[int, Detail] 详细信息字典
+        """
+        result: dict[int, Detail] = {}
+        for chunk in chunked(set(aids)):
+            rows = session.query(AniDBTitle.aid, Detail).join(
+                NameMap, NameMap.name == AniDBTitle.title
+            ).join(
+                Detail, Detail.id == NameMap.detailId
+            ).filter(
+                AniDBTitle.aid.in_(chunk)
+            ).all()
+            result.update({aid: detail for aid, detail in rows})
+
+        return result
+
+
+if __name__ == '__main__':
+    from logging import basicConfig, DEBUG
+
+    basicConfig(level=DEBUG)
+
+    TitleIndex().update()
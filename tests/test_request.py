@@ -0,0 +1,76 @@
+# -*- coding:utf-8 -*-
+# AUTHOR: Sun
+
+"""
+@file test_request.py
+@brief 请求模块测试
+@details 使用httpx的MockTransport模拟服务器，不访问网络
+"""
+
+from unittest import IsolatedAsyncioTestCase, main
+
+from httpx import AsyncClient, AsyncByteStream, ByteStream, MockTransport, ReadTimeout, Request, Response
+
+from frame.config import Config
+from frame.request import Requester
+
+
+class FailingStream(AsyncByteStream):
+    """
+    @brief 读取到一半时超时的响应体
+    """
+
+    async def __aiter__(self):
+        yield b'<html>'
+        raise ReadTimeout('read timed out')
+
+    async def aclose(self):
+        pass
+
+
+class HandleRequestTest(IsolatedAsyncioTestCase):
+
+    def create_requester(self) -> Requester:
+        config: Config = Config()
+        config.REQUEST.STREAM = True
+        config.REQUEST.MAX_RETRY = 3
+        config.REQUEST.DOWNLOAD_DELAY = 0
+        return Requester(None, config, None)
+
+    async def test_body_read_error_is_retried(self):
+        """
+        @brief 流式读取响应体失败时按请求失败重试，全部失败后返回None
+        """
+        calls: list[Request] = []
+
+        def handler(request: Request) -> Response:
+            calls.append(request)
+            return Response(200, headers={'content-type': 'text/html'}, stream=FailingStream())
+
+        async with AsyncClient(transport=MockTransport(handler)) as client:
+            response = await self.create_requester().handle_request(Request('GET', 'https://example.com/'), client)
+
+        self.assertIsNone(response)
+        self.assertEqual(len(calls), 3)
+
+    async def test_body_read_error_then_success(self):
+        """
+        @brief 读取失败之后重试成功时返回完整的响应体
+        """
+        calls: list[Request] = []
+
+        def handler(request: Request) -> Response:
+            calls.append(request)
+            if len(calls) == 1:
+                return Response(200, headers={'content-type': 'text/html'}, stream=FailingStream())
+            return Response(200, headers={'content-type': 'text/html'}, stream=ByteStream(b'<html></html>'))
+
+        async with AsyncClient(transport=MockTransport(handler)) as client:
+            response = await self.create_requester().handle_request(Request('GET', 'https://example.com/'), client)
+
+        self.assertEqual(response.content, b'<html></html>')
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    main()